@@ -1,16 +1,25 @@
-import re
 import os
 import psycopg2
 import json
-from dotenv import load_dotenv
-from slang_common import extract_agent_lines, SLANG_WORDS, SLANG_ALTERNATIVES, VERIFIED_SLANG_WORDS
+from slang_common import (extract_agent_lines, find_slang_in_transcript, SLANG_WORDS, SLANG_ALTERNATIVES,
+                          VERIFIED_SLANG_WORDS)
 from slang_helper import get_db_connection
+from slang_env import load_environment
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.pool import ThreadedConnectionPool
+from verification_sink import (VerificationSink, read_resume_state, STATUS_CONFIRMED,
+                               STATUS_FALSE_POSITIVE, STATUS_NO_WHISPER)
+from slang_profile import NullProfiler, add_profile_arguments, create_profiler
+from slang_alignment import VERIFICATION_MODES, ALIGNMENT_TOLERANCE, align_matches
 
-# Load environment variables
-load_dotenv()
+# Shared pool of Senna connections, see get_senna_db_pool()
+_senna_pool = None
 
 def get_senna_db_connection():
     """Create a connection to the Senna PostgreSQL database"""
+    load_environment()
     conn = psycopg2.connect(
         host=os.getenv('PRODUCTION_DB_HOST'),
         user=os.getenv('PRODUCTION_DB_USER'),
@@ -36,9 +45,48 @@ def get_gemini_transcription(call_id):
         cursor.close()
         conn.close()
 
-def get_whisper_transcription(call_id):
-    """Get final_transcript from the senna-database for a specific call_id"""
-    conn = get_senna_db_connection()
+def get_senna_db_pool(maxconn):
+    """Get a thread-safe pool of connections to the Senna PostgreSQL database
+    
+    The pool is created on first use and shared afterwards; close it with close_senna_db_pool().
+    
+    Raises:
+        ValueError: If the shared pool is already open with a different maxconn. Closing it here
+            would break the connections its other users hold, so close it first to resize it.
+    """
+    global _senna_pool
+    if _senna_pool is not None and _senna_pool.maxconn != maxconn:
+        raise ValueError(f"Senna pool already open with {_senna_pool.maxconn} connections, not {maxconn}; "
+                         f"close it with close_senna_db_pool() first")
+    if _senna_pool is None:
+        load_environment()
+        _senna_pool = ThreadedConnectionPool(
+            1, maxconn,
+            host=os.getenv('PRODUCTION_DB_HOST'),
+            user=os.getenv('PRODUCTION_DB_USER'),
+            password=os.getenv('PRODUCTION_DB_PASS'),
+            port=os.getenv('PRODUCTION_DB_PORT'),
+            dbname=os.getenv('PRODUCTION_DB_NAME')
+        )
+    return _senna_pool
+
+def close_senna_db_pool():
+    """Close every connection of the shared Senna pool"""
+    global _senna_pool
+    if _senna_pool is not None:
+        _senna_pool.closeall()
+        _senna_pool = None
+
+def get_whisper_transcription(call_id, conn=None):
+    """Get final_transcript from the senna-database for a specific call_id
+    
+    Args:
+        call_id (int): The call ID to look up
+        conn (optional): Open Senna connection to use. Default is a new connection, closed afterwards.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_senna_db_connection()
     cursor = conn.cursor()
     
     try:
@@ -47,102 +95,128 @@ def get_whisper_transcription(call_id):
         return result[0] if result else None
     except Exception as e:
         print(f"Error getting whisper transcription for call_id {call_id}: {e}")
+        if not own_conn:
+            conn.rollback()
         return None
     finally:
         cursor.close()
-        conn.close()
+        if own_conn:
+            conn.close()
+
+def get_pooled_whisper_transcription(call_id, pool):
+    """Get final_transcript for a call_id using a connection borrowed from a pool"""
+    conn = pool.getconn()
+    try:
+        return get_whisper_transcription(call_id, conn=conn)
+    finally:
+        pool.putconn(conn)
 
-def check_slang_in_transcript(transcript, slang_word, last_lines_only=True):
+def find_gemini_words(transcript, slang_words, mode='call'):
     """
-    Check if specific slang word appears in AGENT lines of the transcript
+    Find several slang words in the agent lines of a gemini transcript in one pass
     
-    Args:
-        transcript (str): The transcript text
-        slang_word (str): The slang word to check for
-        last_lines_only (bool): If True, only check the last few lines of the transcript
-        
     Returns:
-        tuple: (bool, list of matching lines)
+        dict: word -> list of (timestamp, context) matches ('bye-bye' only in the last lines in call mode)
     """
-    if not transcript:
-        return False, []
-    
-    agent_lines = extract_agent_lines(transcript)
-    
-    # If last_lines_only is True and the slang word is typically used at the end (like bye-bye),
-    # only use the last 5 agent lines (or all if less than 5)
-    if last_lines_only and slang_word == 'bye-bye' and len(agent_lines) > 5:
-        agent_lines = agent_lines[-5:]
+    return find_slang_in_transcript(transcript, slang_words, last_lines_only=(mode == 'call'))
+
+def check_whisper_words(whisper_transcript, gemini_matches, mode='call', tolerance=ALIGNMENT_TOLERANCE):
+    """
+    Check the gemini matches of several slang words against the whisper transcript in one pass
     
-    matches = []
-    found = False
+    In call mode a word only has to appear in the whisper transcript (in its last lines
+    for 'bye-bye'). In occurrence mode each gemini match needs a whisper match within
+    tolerance seconds of its timestamp (see slang_alignment.align_matches).
     
-    for line in agent_lines:
-        # Extract timestamp and text
-        parts = line.split('AGENT:', 1)
-        if len(parts) < 2:
-            continue
-            
-        timestamp = parts[0].strip()
-        agent_text = parts[1].strip()
-        agent_text_lower = agent_text.lower()
-        
-        # Check for slang word as a whole word
-        pattern = r'\b' + re.escape(slang_word) + r'\b'
+    Args:
+        whisper_transcript (str): The whisper transcription
+        gemini_matches (dict): word -> gemini matches, e.g. from find_gemini_words()
         
-        if re.search(pattern, agent_text_lower):
-            found = True
-            # Extract context (10 chars before and after if available)
-            for match in re.finditer(pattern, agent_text_lower):
-                start_pos = match.start()
-                end_pos = match.end()
-                
-                start_context = max(0, start_pos - 10)
-                end_context = min(len(agent_text_lower), end_pos + 10)
-                
-                context_text = agent_text_lower[start_context:end_context]
-                matches.append((timestamp, context_text))
-    
-    return found, matches
+    Returns:
+        dict: word -> (whisper_has_slang, whisper_matches). In occurrence mode whisper_matches has
+            one entry per gemini match: the whisper match confirming it, or None.
+    """
+    found = find_slang_in_transcript(whisper_transcript, list(gemini_matches), last_lines_only=(mode != 'occurrence'))
+    if mode != 'occurrence':
+        return {word: (bool(matches), matches) for word, matches in found.items()}
+    
+    checks = {}
+    for word, matches in found.items():
+        aligned = [whisper_match for _, whisper_match in align_matches(word, gemini_matches[word], matches, tolerance)]
+        checks[word] = (any(match is not None for match in aligned), aligned)
+    return checks
 
-def verify_slang_word_in_call(call_id, slang_word):
+def print_aligned_matches(gemini_matches, whisper_matches, indent="  "):
+    """Print each gemini match with the whisper match confirming it (occurrence mode)"""
+    for (timestamp, context), whisper_match in zip(gemini_matches, whisper_matches):
+        if whisper_match is None:
+            print(f"{indent}- REJECTED Gemini: {timestamp} - '{context}' (no whisper match in time)")
+        else:
+            print(f"{indent}- CONFIRMED Gemini: {timestamp} - '{context}' / Whisper: {whisper_match[0]} - '{whisper_match[1]}'")
+
+def verify_slang_words_in_call(call_id, slang_words, gemini_transcript=None, whisper_lookup=None,
+                               mode='call', tolerance=ALIGNMENT_TOLERANCE):
     """
-    Verify if a specific slang word appears in both gemini and whisper transcriptions
+    Verify several slang words in both gemini and whisper transcriptions of a call
+    
+    Each transcript is fetched and parsed once for all the words, and whisper is only
+    looked up if gemini has at least one of them.
     
     Args:
         call_id (int): The call ID to check
-        slang_word (str): The slang word to verify
+        slang_words (list): The slang words to verify
+        gemini_transcript (str, optional): The gemini transcription, if already fetched
+        whisper_lookup (callable, optional): call_id -> whisper transcription. Default is the source
+            selected by WHISPER_SOURCE (see whisper_sync.default_whisper_lookup).
+        mode (str, optional): 'call' (the word anywhere in whisper) or 'occurrence' (each gemini
+            match needs a whisper match close in time). Default is 'call'.
+        tolerance (float, optional): In occurrence mode, seconds a whisper match may be away
         
     Returns:
-        tuple: (appears_in_gemini, appears_in_whisper, gemini_matches, whisper_matches)
+        dict: word -> (appears_in_gemini, appears_in_whisper, gemini_matches, whisper_matches). In
+            occurrence mode appears_in_whisper is True if any gemini match is confirmed, and
+            whisper_matches has the confirming whisper match (or None) per gemini match.
     """
+    results = {word: (False, False, [], []) for word in slang_words}
+    
     # Check gemini transcription
-    gemini_transcript = get_gemini_transcription(call_id)
+    if gemini_transcript is None:
+        gemini_transcript = get_gemini_transcription(call_id)
     if not gemini_transcript:
-        return False, False, [], []
-        
-    gemini_has_slang, gemini_matches = check_slang_in_transcript(
-        gemini_transcript, 
-        slang_word,
-        last_lines_only=(slang_word == 'bye-bye')  # Only use last lines for bye-bye
-    )
+        return results
+    
+    gemini_matches = {word: matches for word, matches in find_gemini_words(gemini_transcript, slang_words, mode).items()
+                      if matches}
     
-    # If not found in gemini, no need to check whisper
-    if not gemini_has_slang:
-        return False, False, [], []
+    # If none is in gemini, no need to check whisper
+    if not gemini_matches:
+        return results
     
     # Check whisper transcription
-    whisper_transcript = get_whisper_transcription(call_id)
+    if whisper_lookup is None:
+        from whisper_sync import default_whisper_lookup
+        whisper_lookup = default_whisper_lookup()
+    whisper_transcript = whisper_lookup(call_id)
     if not whisper_transcript:
-        return gemini_has_slang, False, gemini_matches, []
+        results.update({word: (True, False, matches, []) for word, matches in gemini_matches.items()})
+        return results
     
-    whisper_has_slang, whisper_matches = check_slang_in_transcript(
-        whisper_transcript, 
-        slang_word,
-        last_lines_only=(slang_word == 'bye-bye')  # Only use last lines for bye-bye
-    )
+    for word, (whisper_has_slang, whisper_matches) in check_whisper_words(whisper_transcript, gemini_matches,
+                                                                          mode, tolerance).items():
+        results[word] = (True, whisper_has_slang, gemini_matches[word], whisper_matches)
+    return results
+
+def verify_slang_word_in_call(call_id, slang_word, gemini_transcript=None, whisper_lookup=None,
+                              mode='call', tolerance=ALIGNMENT_TOLERANCE):
+    """
+    Verify if a specific slang word appears in both gemini and whisper transcriptions
     
-    return gemini_has_slang, whisper_has_slang, gemini_matches, whisper_matches
+    Returns:
+        tuple: (appears_in_gemini, appears_in_whisper, gemini_matches, whisper_matches),
+            see verify_slang_words_in_call()
+    """
+    return verify_slang_words_in_call(call_id, [slang_word], gemini_transcript, whisper_lookup,
+                                      mode, tolerance)[slang_word]
 
 def should_count_slang(call_id, slang_word):
     """
@@ -171,7 +245,86 @@ def should_count_slang(call_id, slang_word):
     
     return should_count
 
-def cross_verify_slang_words(limit=None, specific_slang=None):
+def report_call_checks(results, call_id, gemini_transcript, gemini_matches, whisper_transcript, sink=None,
+                       mode='call', tolerance=ALIGNMENT_TOLERANCE, checked=None):
+    """Check every slang word gemini has in a call against the whisper transcription (parsed once) and report each
+    
+    Args:
+        gemini_matches (dict): word -> gemini matches, for the words found in gemini, in report order
+        checked (int, optional): Calls scanned up to and including this one, recorded in the sink
+    """
+    checks = check_whisper_words(whisper_transcript, gemini_matches, mode, tolerance) if whisper_transcript else {}
+    for slang_word, matches in gemini_matches.items():
+        report_whisper_check(results, call_id, slang_word, gemini_transcript, matches, checks.get(slang_word),
+                             sink=sink, mode=mode, checked=checked)
+
+def report_whisper_check(results, call_id, slang_word, gemini_transcript, gemini_matches, whisper_check, sink=None,
+                         mode='call', checked=None):
+    """Record and print the outcome of checking one gemini hit against the whisper transcription
+    
+    whisper_check is (whisper_has_slang, whisper_matches) from check_whisper_words(), or None
+    if the call has no whisper transcription. With a sink, the result is streamed to it and
+    only the counters are kept in results. In occurrence mode a call is confirmed if any of
+    its gemini matches is, and the whisper matches recorded are aligned with the gemini ones
+    (None where rejected).
+    """
+    print(f"\n{'='*60}")
+    print(f"Call ID {call_id} has '{slang_word}' in gemini transcription")
+    
+    if whisper_check is not None:
+        whisper_has_slang, whisper_matches = whisper_check
+        
+        if whisper_has_slang:
+            results[slang_word]['in_both'] += 1
+            if sink is not None:
+                sink.write(call_id, slang_word, STATUS_CONFIRMED, gemini_matches, whisper_matches, checked=checked)
+            else:
+                results[slang_word]['confirmed_matches'].append({
+                    'call_id': call_id,
+                    'gemini_matches': gemini_matches,
+                    'whisper_matches': whisper_matches
+                })
+            print(f"CONFIRMED: '{slang_word}' also found in whisper transcription for call_id {call_id}")
+            if mode == 'occurrence':
+                print_aligned_matches(gemini_matches, whisper_matches)
+            else:
+                for timestamp, context in gemini_matches:
+                    print(f"  - Gemini: {timestamp} - '{context}'")
+                for timestamp, context in whisper_matches:
+                    print(f"  - Whisper: {timestamp} - '{context}'")
+        else:
+            results[slang_word]['only_in_gemini'] += 1
+            if sink is not None:
+                sink.write(call_id, slang_word, STATUS_FALSE_POSITIVE, gemini_matches, checked=checked)
+            else:
+                results[slang_word]['false_positives'].append({
+                    'call_id': call_id,
+                    'gemini_matches': gemini_matches
+                })
+            print(f"FALSE POSITIVE: '{slang_word}' NOT found in whisper transcription for call_id {call_id}")
+            for timestamp, context in gemini_matches:
+                print(f"  - Gemini: {timestamp} - '{context}'")
+            
+            # Print the surrounding lines for comparison
+            print("\nGemini transcript context:")
+            agent_lines = extract_agent_lines(gemini_transcript)
+            for i, line in enumerate(agent_lines):
+                for timestamp, _ in gemini_matches:
+                    if timestamp in line:
+                        # Print a few lines before and after
+                        start_idx = max(0, i - 2)
+                        end_idx = min(len(agent_lines), i + 3)
+                        for j in range(start_idx, end_idx):
+                            print(f"  {agent_lines[j]}")
+    else:
+        print(f"WARNING: No whisper transcript found for call_id {call_id}")
+        if sink is not None:
+            sink.write(call_id, slang_word, STATUS_NO_WHISPER, gemini_matches, checked=checked)
+    
+    print(f"{'='*60}")
+
+def cross_verify_slang_words(limit=None, specific_slang=None, workers=1, output=None, resume=False, profiler=None,
+                             mode='call', tolerance=ALIGNMENT_TOLERANCE):
     """
     Find call_ids in gemini-db that have specific slang words in the AGENT lines,
     then verify them against whisper transcriptions
@@ -179,111 +332,142 @@ def cross_verify_slang_words(limit=None, specific_slang=None):
     Args:
         limit (int, optional): Maximum number of call_ids to check
         specific_slang (str, optional): Specific slang word to check, or None for all VERIFIED_SLANG_WORDS
+        workers (int, optional): Number of whisper lookups kept in flight. Default is 1 (one at a time).
+            Results are still reported in call_id order.
+        output (str, optional): JSONL or CSV file each per-call result is streamed to. When given,
+            only counters are kept in memory and the returned lists stay empty.
+        resume (bool, optional): Continue an interrupted run after the last call_id in output
+        profiler (optional): StageProfiler charged with the fetch/match/whisper/write stages. Default is no profiling.
+        mode (str, optional): 'call' or 'occurrence' verification, see verify_slang_word_in_call
+        tolerance (float, optional): In occurrence mode, seconds a whisper match may be away
         
     Returns:
         dict: Results statistics and details
     """
+    profiler = profiler or NullProfiler()
+    
     # Define which words to check
     slang_words_to_check = [specific_slang] if specific_slang else VERIFIED_SLANG_WORDS
     
-    # Connect to gemini-db to get call_ids
+    # Results tracking
+    results = {word: {
+        'in_gemini': 0,
+        'in_both': 0,
+        'only_in_gemini': 0,
+        'false_positives': [],
+        'confirmed_matches': []
+    } for word in slang_words_to_check}
+    
+    # Pick up the counters and position of an interrupted run
+    last_call_id = None
+    last_call_words = set()
+    checked_before = 0
+    if output and resume:
+        last_call_id, last_call_words, counters, checked_before = read_resume_state(output, slang_words_to_check)
+        for word, word_counters in counters.items():
+            results[word].update(word_counters)
+        if checked_before is None:
+            print(f"WARNING: {output} does not record how many calls were checked; the total only counts this run")
+            checked_before = 0
+        if last_call_id is not None:
+            print(f"Resuming after call_id {last_call_id} from {output}")
+    
+    # Connect to gemini-db to get call_ids, streaming them through a server-side cursor
     gemini_conn = get_db_connection()
-    gemini_cursor = gemini_conn.cursor()
+    gemini_cursor = gemini_conn.cursor(name='cross_verify_cursor')
+    gemini_cursor.itersize = 500
     
     query = """
     SELECT call_id, transcription 
     FROM slang.transcriptions_gemini 
-    ORDER BY call_id
     """
+    params = ()
+    
+    if last_call_id is not None:
+        # The last call may have been interrupted between two slang words
+        query += "WHERE call_id >= %s "
+        params = (last_call_id,)
+    
+    query += "ORDER BY call_id"
     
     if limit:
         query += f" LIMIT {limit}"
     
-    gemini_cursor.execute(query)
+    gemini_cursor.execute(query, params)
     
-    # Results tracking
-    results = {word: {
-        'in_gemini': 0,
-        'in_both': 0,
-        'only_in_gemini': 0,
-        'false_positives': [],
-        'confirmed_matches': []
-    } for word in slang_words_to_check}
+    sink = VerificationSink(output, resume=resume) if output else None
+    
+    # Overall tracking, continuing the count of an interrupted run
+    total_checked = checked_before
     
-    # Overall tracking
-    total_checked = 0
+    # With WHISPER_SOURCE=local, whisper transcriptions are read from the synced copy in the dev database
+    from whisper_sync import get_whisper_source, default_whisper_lookup
+    whisper_lookup = default_whisper_lookup()
+    if workers > 1 and get_whisper_source() == 'local':
+        print("INFO: Whisper transcriptions come from the local copy, looking them up one at a time")
+        workers = 1
+    
+    # In concurrent mode, lookups run on a bounded thread pool with pooled connections.
+    # Pending hits are reported oldest first, which keeps the report in call_id order.
+    executor = None
+    pending = deque()
+    max_pending = workers * 2
+    if workers > 1:
+        pool = get_senna_db_pool(workers)
+        executor = ThreadPoolExecutor(max_workers=workers)
+    
+    def report(call_id, gemini_transcript, gemini_matches, whisper_transcript, checked):
+        with profiler.stage('write'):
+            report_call_checks(results, call_id, gemini_transcript, gemini_matches, whisper_transcript, sink=sink,
+                               mode=mode, tolerance=tolerance, checked=checked)
+    
+    def report_oldest():
+        call_id, gemini_transcript, gemini_matches, future, checked = pending.popleft()
+        with profiler.stage('whisper'):
+            whisper_transcript = future.result()
+        report(call_id, gemini_transcript, gemini_matches, whisper_transcript, checked)
     
     try:
-        for call_id, gemini_transcript in gemini_cursor:
+        for call_id, gemini_transcript in profiler.iterate('fetch', gemini_cursor):
             total_checked += 1
             
-            # Check each slang word
-            for slang_word in slang_words_to_check:
-                # Check if word appears in gemini transcript
-                gemini_has_slang, gemini_matches = check_slang_in_transcript(
-                    gemini_transcript, 
-                    slang_word,
-                    last_lines_only=(slang_word == 'bye-bye')
-                )
-                
-                if gemini_has_slang:
-                    results[slang_word]['in_gemini'] += 1
-                    print(f"\n{'='*60}")
-                    print(f"Call ID {call_id} has '{slang_word}' in gemini transcription")
-                    
-                    # Check the whisper database
-                    whisper_transcript = get_whisper_transcription(call_id)
-                    
-                    if whisper_transcript:
-                        whisper_has_slang, whisper_matches = check_slang_in_transcript(
-                            whisper_transcript, 
-                            slang_word,
-                            last_lines_only=(slang_word == 'bye-bye')
-                        )
-                        
-                        if whisper_has_slang:
-                            results[slang_word]['in_both'] += 1
-                            results[slang_word]['confirmed_matches'].append({
-                                'call_id': call_id,
-                                'gemini_matches': gemini_matches,
-                                'whisper_matches': whisper_matches
-                            })
-                            print(f"CONFIRMED: '{slang_word}' also found in whisper transcription for call_id {call_id}")
-                            for timestamp, context in gemini_matches:
-                                print(f"  - Gemini: {timestamp} - '{context}'")
-                            for timestamp, context in whisper_matches:
-                                print(f"  - Whisper: {timestamp} - '{context}'")
-                        else:
-                            results[slang_word]['only_in_gemini'] += 1
-                            results[slang_word]['false_positives'].append({
-                                'call_id': call_id,
-                                'gemini_matches': gemini_matches
-                            })
-                            print(f"FALSE POSITIVE: '{slang_word}' NOT found in whisper transcription for call_id {call_id}")
-                            for timestamp, context in gemini_matches:
-                                print(f"  - Gemini: {timestamp} - '{context}'")
-                            
-                            # Print the surrounding lines for comparison
-                            print("\nGemini transcript context:")
-                            agent_lines = extract_agent_lines(gemini_transcript)
-                            for i, line in enumerate(agent_lines):
-                                for timestamp, _ in gemini_matches:
-                                    if timestamp in line:
-                                        # Print a few lines before and after
-                                        start_idx = max(0, i - 2)
-                                        end_idx = min(len(agent_lines), i + 3)
-                                        for j in range(start_idx, end_idx):
-                                            print(f"  {agent_lines[j]}")
-                    else:
-                        print(f"WARNING: No whisper transcript found for call_id {call_id}")
-                    
-                    print(f"{'='*60}")
+            # Every slang word in one pass over the gemini transcript
+            with profiler.stage('match'):
+                found = find_gemini_words(gemini_transcript, slang_words_to_check, mode)
+            
+            # Skip what an interrupted run already wrote for its last call
+            gemini_matches = {word: matches for word, matches in found.items()
+                              if matches and not (call_id == last_call_id and word in last_call_words)}
+            if not gemini_matches:
+                continue
+            for slang_word in gemini_matches:
+                results[slang_word]['in_gemini'] += 1
+            
+            # One whisper lookup per call, whatever the number of words found
+            if executor is None:
+                with profiler.stage('whisper'):
+                    whisper_transcript = whisper_lookup(call_id)
+                report(call_id, gemini_transcript, gemini_matches, whisper_transcript, total_checked)
+            else:
+                future = executor.submit(get_pooled_whisper_transcription, call_id, pool)
+                pending.append((call_id, gemini_transcript, gemini_matches, future, total_checked))
+                while len(pending) >= max_pending:
+                    report_oldest()
             
             # Progress update every 20 records
             if total_checked % 20 == 0:
                 print(f"Processed {total_checked} records...")
+        
+        # Report the lookups still in flight
+        while pending:
+            report_oldest()
     
     finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            close_senna_db_pool()
+        if sink is not None:
+            sink.close()
         gemini_cursor.close()
         gemini_conn.close()
     
@@ -298,6 +482,8 @@ def cross_verify_slang_words(limit=None, specific_slang=None):
         print(f"  - Found in both transcription types: {results[slang_word]['in_both']}")
         print(f"  - Found ONLY in gemini (false positives): {results[slang_word]['only_in_gemini']}")
     
+    if output:
+        print(f"Per-call results written to {output}")
     print("="*60)
     
     # Add total_checked to results
@@ -312,26 +498,44 @@ if __name__ == "__main__":
     parser.add_argument('--limit', type=int, help='Limit the number of call_ids to check')
     parser.add_argument('--call-id', type=int, help='Check a specific call_id')
     parser.add_argument('--slang-word', choices=VERIFIED_SLANG_WORDS, help='Specific slang word to verify')
+    parser.add_argument('--workers', type=int, default=1, help='Number of whisper lookups to keep in flight (default: 1)')
+    parser.add_argument('--output', help='Stream per-call results to this .jsonl or .csv file instead of keeping them in memory')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted run after the last call_id in --output')
+    parser.add_argument('--verification-mode', choices=VERIFICATION_MODES, default='call', help='Confirm a word if whisper has it anywhere (call), or each gemini match against whisper matches close in time (occurrence) (default: call)')
+    parser.add_argument('--alignment-tolerance', type=float, default=ALIGNMENT_TOLERANCE, help=f'With --verification-mode occurrence, seconds a whisper match may be away from a gemini one (default: {ALIGNMENT_TOLERANCE:g})')
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
     
+    profiler = create_profiler(args)
+    profiler.start()
+    
     if args.call_id:
         # Check a specific call_id
         call_id = args.call_id
         print(f"Checking specific call_id: {call_id}")
         
+        # One connection per database: gemini is fetched once, whisper at most once for all words
+        from whisper_sync import default_whisper_lookup
+        gemini_transcript = get_gemini_transcription(call_id) or ''
+        whisper_lookup = profiler.wrap('whisper', lru_cache(maxsize=1)(default_whisper_lookup()))
+        
         if args.slang_word:
             # Check for specific slang word
             slang_word = args.slang_word
-            gemini_has_slang, whisper_has_slang, gemini_matches, whisper_matches = verify_slang_word_in_call(call_id, slang_word)
+            gemini_has_slang, whisper_has_slang, gemini_matches, whisper_matches = verify_slang_word_in_call(
+                call_id, slang_word, gemini_transcript, whisper_lookup, mode=args.verification_mode, tolerance=args.alignment_tolerance)
             
             print(f"Gemini transcript {'has' if gemini_has_slang else 'does NOT have'} '{slang_word}'")
-            if gemini_has_slang:
+            if gemini_has_slang and args.verification_mode == 'occurrence':
+                # Each gemini match with the whisper match confirming it, if any
+                print_aligned_matches(gemini_matches, whisper_matches, indent="  ")
+            elif gemini_has_slang:
                 for timestamp, context in gemini_matches:
                     print(f"  - Gemini: {timestamp} - '{context}'")
             
             print(f"Whisper transcript {'has' if whisper_has_slang else 'does NOT have'} '{slang_word}'")
-            if whisper_has_slang:
+            if whisper_has_slang and args.verification_mode != 'occurrence':
                 for timestamp, context in whisper_matches:
                     print(f"  - Whisper: {timestamp} - '{context}'")
             
@@ -343,18 +547,23 @@ if __name__ == "__main__":
             else:
                 print(f"NOT FOUND: '{slang_word}' not detected in gemini transcription")
         else:
-            # Check all verified slang words
+            # Check all verified slang words, parsing each transcript once
+            checks = verify_slang_words_in_call(call_id, VERIFIED_SLANG_WORDS, gemini_transcript, whisper_lookup,
+                                                mode=args.verification_mode, tolerance=args.alignment_tolerance)
             for slang_word in VERIFIED_SLANG_WORDS:
                 print(f"\nChecking for '{slang_word}':")
-                gemini_has_slang, whisper_has_slang, gemini_matches, whisper_matches = verify_slang_word_in_call(call_id, slang_word)
+                gemini_has_slang, whisper_has_slang, gemini_matches, whisper_matches = checks[slang_word]
                 
                 print(f"  Gemini transcript {'has' if gemini_has_slang else 'does NOT have'} '{slang_word}'")
-                if gemini_has_slang:
+                if gemini_has_slang and args.verification_mode == 'occurrence':
+                    # Each gemini match with the whisper match confirming it, if any
+                    print_aligned_matches(gemini_matches, whisper_matches, indent="    ")
+                elif gemini_has_slang:
                     for timestamp, context in gemini_matches:
                         print(f"    - Gemini: {timestamp} - '{context}'")
                 
                 print(f"  Whisper transcript {'has' if whisper_has_slang else 'does NOT have'} '{slang_word}'")
-                if whisper_has_slang:
+                if whisper_has_slang and args.verification_mode != 'occurrence':
                     for timestamp, context in whisper_matches:
                         print(f"    - Whisper: {timestamp} - '{context}'")
                 
@@ -365,6 +574,15 @@ if __name__ == "__main__":
                     print(f"  NOT VERIFIED: '{slang_word}' only appears in gemini - should NOT count as slang")
                 else:
                     print(f"  NOT FOUND: '{slang_word}' not detected in gemini transcription")
+        
+        profiler.stop()
     else:
         # Run the full cross-verification
-        cross_verify_slang_words(limit=args.limit, specific_slang=args.slang_word)
+        if args.resume and not args.output:
+            parser.error('--resume requires --output')
+        try:
+            cross_verify_slang_words(limit=args.limit, specific_slang=args.slang_word, workers=args.workers,
+                                     output=args.output, resume=args.resume, profiler=profiler,
+                                     mode=args.verification_mode, tolerance=args.alignment_tolerance)
+        finally:
+            profiler.stop()
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 import json
 import os
+import sys
 import psycopg2
 from dotenv import load_dotenv
 from datetime import datetime
 
+# The evaluator's modules (slang_lines) live in the repository root, one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # Load environment variables
 load_dotenv()
 
@@ -17,6 +21,32 @@ DB_NAME = os.getenv("DEV_DB_NAME")
 # JSON file path
 JSON_FILE_PATH = "Validated_slang_dataset.json"
 
+def get_agent_projection(cursor):
+    """Get the function computing agent_transcription, or None if it cannot be stored
+
+    The projection is only stored when the table has the column (added by
+    `python slang_schema.py --apply`). Rows stored without it are evaluated from the
+    full transcription and can be filled later with
+    `python slang_schema.py --backfill-agent-transcriptions`. If the column exists but
+    the evaluator's line splitting cannot be imported, the import stops instead of
+    storing rows with a NULL projection.
+    """
+    cursor.execute("""
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'slang' AND table_name = 'transcriptions_gemini' AND column_name = 'agent_transcription'
+    """)
+    if not cursor.fetchone():
+        print("WARNING: slang.transcriptions_gemini has no agent_transcription column, storing transcriptions only")
+        return None
+    
+    try:
+        from slang_lines import agent_only_transcription
+    except ImportError as e:
+        print(f"Error importing slang_lines ({e}): slang.transcriptions_gemini has an agent_transcription "
+              "column, refusing to store rows without it")
+        sys.exit(1)
+    return agent_only_transcription
+
 def main():
     # Read JSON data
     with open(JSON_FILE_PATH, 'r') as file:
@@ -33,6 +63,7 @@ def main():
             password=DB_PASS
         )
         cursor = conn.cursor()
+        agent_projection = get_agent_projection(cursor)
         
         # Insert data into the database
         records_inserted = 0
@@ -41,18 +72,33 @@ def main():
             transcription = record.get('transcription')
             human_grade = record.get('human_grade')
             
-            # Insert the record
-            cursor.execute(
-                """
-                INSERT INTO slang.transcriptions_gemini 
-                (call_id, transcription, human_grade)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (call_id) DO UPDATE 
-                SET transcription = EXCLUDED.transcription,
-                    human_grade = EXCLUDED.human_grade
-                """,
-                (call_id, transcription, human_grade)
-            )
+            if agent_projection is None:
+                # Insert the record
+                cursor.execute(
+                    """
+                    INSERT INTO slang.transcriptions_gemini 
+                    (call_id, transcription, human_grade)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (call_id) DO UPDATE 
+                    SET transcription = EXCLUDED.transcription,
+                        human_grade = EXCLUDED.human_grade
+                    """,
+                    (call_id, transcription, human_grade)
+                )
+            else:
+                # Insert the record, with its agent lines for the evaluator
+                cursor.execute(
+                    """
+                    INSERT INTO slang.transcriptions_gemini 
+                    (call_id, transcription, human_grade, agent_transcription)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (call_id) DO UPDATE 
+                    SET transcription = EXCLUDED.transcription,
+                        human_grade = EXCLUDED.human_grade,
+                        agent_transcription = EXCLUDED.agent_transcription
+                    """,
+                    (call_id, transcription, human_grade, agent_projection(transcription))
+                )
             records_inserted += 1
         
         # Commit the transaction
@@ -0,0 +1,312 @@
+import sys
+import json
+import time
+import argparse
+from multiprocessing import Pool
+from slang_common import SLANG_WORDS, RULESET_VERSION
+from slang_criteria import evaluate_criteria
+
+# Whisper settings of this worker process, set by init_worker()
+_worker = {'verify': True, 'whisper_lookup': None}
+
+def normalize_grade(grade):
+    """
+    Turn a human_grade value into a pass/fail verdict
+
+    Accepts the same forms as intern_ai_grade ('Yes'/'No'), booleans and scores
+    (0 fails, anything above passes, like the evaluation score).
+
+    Returns:
+        bool or None: True if passed, False if failed, None if the grade is not recognized
+    """
+    if grade is None:
+        return None
+    if isinstance(grade, bool):
+        return grade
+    if isinstance(grade, (int, float)):
+        return grade > 0
+
+    value = str(grade).strip().lower()
+    if value in ('yes', 'y', 'pass', 'passed', 'true', 't'):
+        return True
+    if value in ('no', 'n', 'fail', 'failed', 'false', 'f'):
+        return False
+    try:
+        return float(value) > 0
+    except ValueError:
+        return None
+
+def get_labeled_records_from_db(limit=None):
+    """Stream (call_id, transcription, human_grade) for every graded transcription"""
+    from slang_helper import get_db_connection
+
+    conn = get_db_connection()
+    cursor = conn.cursor(name='labeled_cursor')
+
+    query = """
+    SELECT call_id, transcription, human_grade
+    FROM slang.transcriptions_gemini
+    WHERE human_grade IS NOT NULL
+    ORDER BY call_id
+    """
+
+    if limit is not None:
+        query += f" LIMIT {limit}"
+
+    try:
+        cursor.execute(query)
+        for record in cursor:
+            yield record
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_labeled_records_from_json(path, limit=None):
+    """Read (call_id, transcription, human_grade) from a dataset file like Validated_slang_dataset.json"""
+    with open(path, 'r') as file:
+        data = json.load(file)
+
+    records = [(record.get('call_id'), record.get('transcription'), record.get('human_grade'))
+               for record in data if record.get('human_grade') is not None]
+    return records[:limit] if limit is not None else records
+
+def production_whisper_lookup():
+    """Whisper lookup over one production connection, opened on the first lookup and kept for the next ones"""
+    from cross_verify_slang import get_senna_db_pool, get_pooled_whisper_transcription
+
+    def lookup(call_id):
+        return get_pooled_whisper_transcription(call_id, get_senna_db_pool(1))
+    return lookup
+
+def init_worker(verify=True, whisper_source=None):
+    """
+    Set up the whisper lookup of a worker process (the Pool initializer)
+
+    Each worker keeps its own connection open for all its calls, instead of the default
+    lookup opening a production connection per call.
+
+    Args:
+        verify (bool): Verify words in VERIFIED_SLANG_WORDS against whisper
+        whisper_source (str, optional): 'production' or 'local' (the copy made by whisper_sync.py).
+            Default is WHISPER_SOURCE.
+    """
+    _worker['verify'] = verify
+    _worker['whisper_lookup'] = None
+    if not verify:
+        return
+
+    from whisper_sync import get_whisper_source, LocalWhisperLookup
+    lookup = production_whisper_lookup()
+    if (whisper_source or get_whisper_source()) == 'local':
+        # Calls not synced yet still come from production, over the same connection
+        lookup = LocalWhisperLookup(fallback=lookup, connections=1)
+    _worker['whisper_lookup'] = lookup
+
+def score_record(record):
+    """Evaluate one labeled record without writing anything (runs in a worker process set up by init_worker)"""
+    call_id, transcription, human_grade = record
+
+    start = time.perf_counter()
+    evaluation = evaluate_criteria(call_id, transcription or '', None, criteria=['slang'], verbose=False,
+                                   verify=_worker['verify'], whisper_lookup=_worker['whisper_lookup'])['slang']
+    elapsed = time.perf_counter() - start
+
+    # Words that were counted at least once in this call
+    words = sorted({occurrence['word'] for occurrence in evaluation['occurrences']})
+
+    return {
+        'call_id': call_id,
+        'human_passed': normalize_grade(human_grade),
+        'passed': evaluation['passed'],
+        'words': words,
+        'seconds': elapsed,
+    }
+
+def summarize(results, elapsed, workers):
+    """
+    Build precision/recall/confusion figures from scored records
+
+    Slang detection is the positive class: a call counts as positive when it fails.
+    """
+    confusion = {'tp': 0, 'fp': 0, 'fn': 0, 'tn': 0}
+    by_word = {word: {'flagged': 0, 'human_fail': 0, 'human_pass': 0} for word in SLANG_WORDS}
+    ungraded = 0
+    evaluation_seconds = 0.0
+
+    for result in results:
+        evaluation_seconds += result['seconds']
+        if result['human_passed'] is None:
+            ungraded += 1
+            continue
+
+        ai_fail = not result['passed']
+        human_fail = not result['human_passed']
+        if ai_fail and human_fail:
+            confusion['tp'] += 1
+        elif ai_fail:
+            confusion['fp'] += 1
+        elif human_fail:
+            confusion['fn'] += 1
+        else:
+            confusion['tn'] += 1
+
+        for word in result['words']:
+            stats = by_word.setdefault(word, {'flagged': 0, 'human_fail': 0, 'human_pass': 0})
+            stats['flagged'] += 1
+            stats['human_fail' if human_fail else 'human_pass'] += 1
+
+    graded = sum(confusion.values())
+    flagged = confusion['tp'] + confusion['fp']
+    human_failed = confusion['tp'] + confusion['fn']
+
+    return {
+        'ruleset_version': RULESET_VERSION,
+        'records': len(results),
+        'graded': graded,
+        'ungraded': ungraded,
+        'confusion': confusion,
+        'precision': confusion['tp'] / flagged if flagged else None,
+        'recall': confusion['tp'] / human_failed if human_failed else None,
+        'agreement': (confusion['tp'] + confusion['tn']) / graded if graded else None,
+        'human_failed': human_failed,
+        'by_word': by_word,
+        'elapsed': elapsed,
+        'calls_per_sec': len(results) / elapsed if elapsed > 0 else None,
+        'evaluation_seconds': evaluation_seconds,
+        'workers': workers,
+    }
+
+def format_ratio(value):
+    """Format a ratio as a percentage, or n/a when it is undefined"""
+    return f"{value * 100:.1f}%" if value is not None else "n/a"
+
+def print_report(summary):
+    """Print the accuracy and throughput report"""
+    confusion = summary['confusion']
+
+    print("\n" + "="*60)
+    print(f"ACCURACY REPORT (ruleset version {summary['ruleset_version']}):")
+    print(f"Records evaluated: {summary['records']} ({summary['graded']} graded, {summary['ungraded']} with unrecognized human_grade)")
+    print("\nConfusion (positive = slang detected / call failed):")
+    print("                 human FAIL   human PASS")
+    print(f"  AI FAIL        {confusion['tp']:>10}   {confusion['fp']:>10}")
+    print(f"  AI PASS        {confusion['fn']:>10}   {confusion['tn']:>10}")
+    print(f"\nPrecision: {format_ratio(summary['precision'])}")
+    print(f"Recall: {format_ratio(summary['recall'])}")
+    print(f"Agreement with human_grade: {format_ratio(summary['agreement'])}")
+
+    print("\nBy slang word (calls where the word was counted):")
+    print(f"  {'word':<14} {'flagged':>8} {'human FAIL':>11} {'human PASS':>11} {'precision':>10} {'recall':>8}")
+    for word, stats in sorted(summary['by_word'].items(), key=lambda item: -item[1]['flagged']):
+        if stats['flagged'] == 0:
+            continue
+        precision = stats['human_fail'] / stats['flagged']
+        # Share of the human-failed calls this word catches
+        recall = stats['human_fail'] / summary['human_failed'] if summary['human_failed'] else None
+        print(f"  {word:<14} {stats['flagged']:>8} {stats['human_fail']:>11} {stats['human_pass']:>11} "
+              f"{format_ratio(precision):>10} {format_ratio(recall):>8}")
+
+    print("\nThroughput:")
+    print(f"  Wall time: {summary['elapsed']:.2f}s with {summary['workers']} worker(s)")
+    if summary['calls_per_sec'] is not None:
+        print(f"  Calls/sec: {summary['calls_per_sec']:.1f}")
+    if summary['records']:
+        print(f"  Mean evaluation time: {summary['evaluation_seconds'] / summary['records'] * 1000:.2f} ms/call")
+    print("="*60)
+
+def save_verdicts(results, path):
+    """Write one verdict per call as JSONL, for later comparison"""
+    with open(path, 'w') as file:
+        for result in sorted(results, key=lambda result: str(result['call_id'])):
+            file.write(json.dumps({'call_id': result['call_id'], 'passed': result['passed'],
+                                   'words': result['words']}) + '\n')
+
+def compare_verdicts(results, path):
+    """
+    Compare verdicts with a file written by save_verdicts
+
+    Returns:
+        list: (call_id, baseline verdict, current verdict) for every call whose verdict changed
+    """
+    baseline = {}
+    with open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                baseline[record['call_id']] = record
+
+    changed = []
+    for result in results:
+        previous = baseline.get(result['call_id'])
+        if previous is None:
+            continue
+        if previous['passed'] != result['passed'] or previous['words'] != result['words']:
+            changed.append((result['call_id'], previous, result))
+    return changed
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Measure slang evaluation accuracy against human_grade and its throughput')
+    parser.add_argument('--limit', type=int, help='Limit the number of labeled records to evaluate')
+    parser.add_argument('--json', help='Read labeled records from a dataset file instead of slang.transcriptions_gemini')
+    parser.add_argument('--workers', type=int, default=4, help='Number of worker processes (default: 4)')
+    parser.add_argument('--chunk-size', type=int, default=20, help='Records handed to a worker at once (default: 20)')
+    parser.add_argument('--save-verdicts', help='Write per-call verdicts to this JSONL file')
+    parser.add_argument('--compare', help='Compare verdicts with a JSONL file written by --save-verdicts')
+    parser.add_argument('--summary-json', help='Also write the summary to this JSON file')
+    parser.add_argument('--no-verification', action='store_true',
+                        help='Count verified slang words without checking them against whisper (no production lookups)')
+    parser.add_argument('--whisper-source', choices=['production', 'local'],
+                        help='Where whisper transcriptions are read from (default: WHISPER_SOURCE, else production); '
+                             'local reads the copy made by whisper_sync.py')
+    return parser.parse_args()
+
+def main():
+    """Run the accuracy-and-throughput harness"""
+    args = parse_arguments()
+
+    if args.json:
+        records = get_labeled_records_from_json(args.json, limit=args.limit)
+    else:
+        records = get_labeled_records_from_db(limit=args.limit)
+
+    print(f"Evaluating labeled records with {args.workers} worker(s), ruleset version {RULESET_VERSION} (no evaluations are written)")
+    worker_args = (not args.no_verification, args.whisper_source)
+
+    start = time.perf_counter()
+    results = []
+    if args.workers > 1:
+        with Pool(args.workers, initializer=init_worker, initargs=worker_args) as pool:
+            for result in pool.imap(score_record, records, chunksize=args.chunk_size):
+                results.append(result)
+                if len(results) % 100 == 0:
+                    print(f"Processed {len(results)} records...")
+    else:
+        init_worker(*worker_args)
+        for record in records:
+            results.append(score_record(record))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results, elapsed, args.workers)
+    print_report(summary)
+
+    if args.summary_json:
+        with open(args.summary_json, 'w') as file:
+            json.dump(summary, file, indent=2)
+
+    if args.save_verdicts:
+        save_verdicts(results, args.save_verdicts)
+        print(f"Verdicts written to {args.save_verdicts}")
+
+    if args.compare:
+        changed = compare_verdicts(results, args.compare)
+        if changed:
+            print(f"\nVERDICTS CHANGED for {len(changed)} call(s) compared with {args.compare}:")
+            for call_id, previous, current in changed:
+                print(f"  - call_id {call_id}: {'PASS' if previous['passed'] else 'FAIL'} {previous['words']} → "
+                      f"{'PASS' if current['passed'] else 'FAIL'} {current['words']}")
+            sys.exit(1)
+        print(f"\nVerdicts unchanged compared with {args.compare}")
+
+if __name__ == "__main__":
+    main()
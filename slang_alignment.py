@@ -0,0 +1,127 @@
+from collections import deque
+from slang_common import extract_agent_lines, parse_timestamp_seconds
+
+# Verification modes: a word is confirmed for the whole call if whisper has it anywhere
+# (call), or each gemini occurrence needs a whisper occurrence close in time (occurrence)
+VERIFICATION_MODES = ('call', 'occurrence')
+
+# Seconds a whisper occurrence may be away from a gemini one and still confirm it
+ALIGNMENT_TOLERANCE = 5.0
+
+def index_occurrences(transcript, matcher):
+    """
+    Find every occurrence of the matcher's words in the agent lines of a transcript, in one scan
+
+    Args:
+        transcript (str): Transcript with "[timestamp] AGENT: text" lines
+        matcher: SlangMatcher or VariantMatcher with the words to look for
+
+    Returns:
+        dict: word -> list of (seconds or None, (timestamp, context)) in line order
+    """
+    occurrences = {}
+    for line in extract_agent_lines(transcript or ''):
+        parts = line.split('AGENT:', 1)
+        if len(parts) < 2:
+            continue
+        timestamp = parts[0].strip()
+        text = parts[1].strip().lower()
+
+        seconds = None
+        for word, start_pos, end_pos in matcher.finditer(text):
+            if seconds is None:
+                seconds = parse_timestamp_seconds(timestamp)
+            context = text[max(0, start_pos - 10):min(len(text), end_pos + 10)]
+            occurrences.setdefault(word, []).append((seconds, (timestamp, context)))
+    return occurrences
+
+def timed_matches(matches):
+    """Turn (timestamp, context) matches of check_slang_in_transcript into (seconds or None, match) pairs"""
+    return [(parse_timestamp_seconds(timestamp), (timestamp, context)) for timestamp, context in matches]
+
+class TimestampAligner:
+    """Confirm gemini occurrences one by one against whisper occurrences of the same word
+
+    For each word, the whisper occurrences are sorted by time once, and a pointer only
+    moves forward past those too early to confirm anything later. Each whisper
+    occurrence confirms at most one gemini occurrence. Asking for the gemini
+    occurrences of a word in time order (as they appear in the transcript) makes the
+    whole call a linear merge: O(gemini + whisper occurrences).
+
+    An occurrence without a timestamp cannot be placed, so for it the call-level rule
+    applies: a gemini occurrence without one is confirmed when whisper has the word at
+    all, and whisper occurrences without one confirm whatever the window did not.
+    """
+
+    def __init__(self, whisper_occurrences, tolerance=ALIGNMENT_TOLERANCE):
+        """
+        Args:
+            whisper_occurrences (dict): word -> list of (seconds or None, match), e.g. from index_occurrences()
+            tolerance (float): Seconds a whisper occurrence may be away from a gemini one
+        """
+        self.tolerance = tolerance
+        self.timed = {}
+        self.untimed = {}
+        self.positions = {}
+        for word, occurrences in whisper_occurrences.items():
+            # Transcripts are in time order, so this sort is linear in practice
+            self.timed[word] = sorted((occurrence for occurrence in occurrences if occurrence[0] is not None),
+                                      key=lambda occurrence: occurrence[0])
+            self.untimed[word] = deque(match for seconds, match in occurrences if seconds is None)
+
+    def has_word(self, word):
+        """Check whether whisper has the word anywhere"""
+        return bool(self.timed.get(word) or self.untimed.get(word))
+
+    def confirm(self, word, seconds):
+        """
+        Find the whisper occurrence confirming a gemini occurrence of a word
+
+        Args:
+            word (str): The word
+            seconds (float or None): Time of the gemini occurrence
+
+        Returns:
+            The (timestamp, context) match of the confirming whisper occurrence, or None
+        """
+        timed = self.timed.get(word, ())
+        untimed = self.untimed.get(word)
+        if seconds is None:
+            if timed:
+                return timed[0][1]
+            return untimed[0] if untimed else None
+
+        position = self.positions.get(word, 0)
+        while position < len(timed) and timed[position][0] < seconds - self.tolerance:
+            position += 1
+        if position < len(timed) and timed[position][0] <= seconds + self.tolerance:
+            self.positions[word] = position + 1
+            return timed[position][1]
+        self.positions[word] = position
+
+        if untimed:
+            return untimed.popleft()
+        return None
+
+def align_matches(word, gemini_matches, whisper_matches, tolerance=ALIGNMENT_TOLERANCE):
+    """
+    Pair every gemini match of a word with the whisper match confirming it
+
+    Args:
+        word (str): The word both lists are matches of
+        gemini_matches (list): (timestamp, context) tuples, as from check_slang_in_transcript
+        whisper_matches (list): (timestamp, context) tuples from the whisper transcript
+        tolerance (float): Seconds a whisper match may be away from a gemini one
+
+    Returns:
+        list: (gemini match, whisper match or None) per gemini match, in the given order
+    """
+    aligner = TimestampAligner({word: timed_matches(whisper_matches)}, tolerance)
+    timed = timed_matches(gemini_matches)
+
+    # Gemini matches are confirmed in time order, then reported in their own order
+    order = sorted(range(len(timed)), key=lambda i: (timed[i][0] is not None, timed[i][0] or 0.0))
+    confirmed = [None] * len(timed)
+    for i in order:
+        confirmed[i] = aligner.confirm(word, timed[i][0])
+    return list(zip(gemini_matches, confirmed))
@@ -0,0 +1,288 @@
+import sys
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+MIB = 1024 * 1024
+
+class AdaptiveBatchSize:
+    """Pick the batch size of a run from the throughput it observes
+
+    The time of every batch is split into stages (evaluate, verify, write) with
+    measure(), plus the fetch time reported by the fetching thread with
+    record_fetch(), and every window of a few batches ends with a decision:
+
+    - exploring: the size is multiplied by growth while throughput improves by more
+      than tolerance; when it stops improving, the size goes back to the best one
+      seen (shrinking below the starting size is tried if growing never helped)
+    - settled: the best size is kept, and exploring starts again every probe_every
+      windows, or as soon as throughput falls well below the settled level, since
+      the best size shifts with the database and network the run talks to
+
+    The size always stays within [minimum, maximum] and under the memory cap: the
+    batch being processed and the batches prefetched ahead of it are estimated to
+    hold each transcription twice (the fetched row and its evaluation).
+
+    A batch fetched before the size last changed is left out of the window, since
+    its times belong to the old size.
+
+    Call the instance to get the current size, e.g. as the batch size of
+    slang_helper.prefetch_batches(), with record_fetch as its on_fetch.
+    """
+
+    def __init__(self, initial=10, minimum=5, maximum=1000, memory_limit=256 * MIB, prefetched=1,
+                 window=3, growth=2.0, tolerance=0.05, probe_every=20, verbose=True):
+        """
+        Args:
+            initial (int): Starting batch size
+            minimum (int): Smallest batch size
+            maximum (int): Largest batch size
+            memory_limit (int): Bytes of transcriptions the batches in flight may hold
+            prefetched (int): Number of batches fetched ahead of the one being processed
+            window (int): Number of batches measured before each decision
+            growth (float): Factor the size grows or shrinks by while exploring
+            tolerance (float): Relative throughput change below which sizes count as equal
+            probe_every (int): Settled windows between two explorations
+            verbose (bool): Print every change of size and why
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.memory_limit = memory_limit
+        self.prefetched = prefetched
+        self.window = window
+        self.growth = growth
+        self.tolerance = tolerance
+        self.probe_every = probe_every
+        self.verbose = verbose
+        self.record_bytes = None
+        self.size = self.clamp(initial)
+
+        self.exploring = True
+        self.direction = 1
+        self.start_size = self.size
+        self.best = None
+        self.settled_throughput = None
+        self.settled_windows = 0
+        self.slow_windows = 0
+
+        self.stages = {}
+        self.window_records = 0
+        self.window_batches = 0
+
+        # Stage times of the batch in progress, and (size, seconds) of each batch fetched
+        # but not recorded yet, appended by the fetching thread
+        self.batch_stages = {}
+        self.fetches = deque()
+        self.fetches_lock = threading.Lock()
+
+    def __call__(self):
+        return self.size
+
+    def clamp(self, size):
+        """Bound a size by minimum, maximum and the memory cap"""
+        size = min(self.maximum, max(self.minimum, int(round(size))))
+        cap = self.memory_cap()
+        return max(self.minimum, min(size, cap)) if cap is not None else size
+
+    def memory_cap(self):
+        """Largest size that keeps the batches in flight under the memory limit, once records have been seen"""
+        if not self.memory_limit or not self.record_bytes:
+            return None
+        return int(self.memory_limit / ((self.prefetched + 1) * self.record_bytes))
+
+    @contextmanager
+    def measure(self, stage):
+        """Add the time spent in the block to a stage of the current batch"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.batch_stages[stage] = self.batch_stages.get(stage, 0.0) + time.perf_counter() - start
+
+    def record_fetch(self, size, seconds):
+        """
+        Note the fetch of the next batch; safe to call from the thread fetching it
+
+        Args:
+            size (int): Batch size the batch was fetched with
+            seconds (float): Time the fetch took
+        """
+        with self.fetches_lock:
+            self.fetches.append((size, seconds))
+
+    def wrap(self, stage, func):
+        """Wrap a callable so the time of every call is added to a stage (nested stages are only reported)"""
+        def measured(*args, **kwargs):
+            with self.measure(stage):
+                return func(*args, **kwargs)
+        return measured
+
+    def record(self, batch):
+        """
+        Close the measurement of a batch, deciding on the next size at the end of each window
+
+        Args:
+            batch (list): The (call_id, transcription) records of the batch
+        """
+        if not batch:
+            return
+        stages, self.batch_stages = self.batch_stages, {}
+        with self.fetches_lock:
+            fetch = self.fetches.popleft() if self.fetches else None
+
+        # Each transcription is held by its row and again by its evaluation
+        text_bytes = sum(sys.getsizeof(transcription) for _, transcription in batch if transcription)
+        record_bytes = 2 * text_bytes / len(batch)
+        self.record_bytes = record_bytes if self.record_bytes is None else max(record_bytes, 0.9 * self.record_bytes)
+
+        cap = self.memory_cap()
+        if cap is not None and self.size > max(self.minimum, cap):
+            self.change(self.clamp(self.size), f"memory cap of {self.memory_limit / MIB:.3g} MiB "
+                                               f"at ~{self.record_bytes / 1024:.1f} KiB per call")
+            # Growing further would only hit the cap again
+            if self.exploring and self.direction > 0:
+                self.settle(None, None)
+            self.reset_window()
+            return
+
+        if fetch is not None:
+            fetched_size, seconds = fetch
+            if fetched_size != self.size:
+                # Fetched ahead at the previous size: its times would be charged to this one
+                return
+            stages['fetch'] = stages.get('fetch', 0.0) + seconds
+
+        for stage, seconds in stages.items():
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.window_records += len(batch)
+        self.window_batches += 1
+        if self.window_batches >= self.window:
+            self.decide()
+            self.reset_window()
+
+    def reset_window(self):
+        self.stages = {}
+        self.window_records = 0
+        self.window_batches = 0
+
+    def decide(self):
+        """Pick the size of the next window from the throughput of this one"""
+        # The verify time is part of evaluate, so only the outer stages add up to the batch time
+        seconds = sum(seconds for stage, seconds in self.stages.items() if stage != 'verify')
+        if seconds <= 0:
+            return
+        throughput = self.window_records / seconds
+        breakdown = ', '.join(f"{stage} {seconds / self.window_records * 1000:.1f}ms"
+                              for stage, seconds in self.stages.items())
+        reason = f"{throughput:.1f} records/s at {self.size} (per call: {breakdown})"
+
+        if not self.exploring:
+            self.settled_windows += 1
+            if self.settled_throughput is None:
+                self.settled_throughput = throughput
+                return
+
+            # One slow window is usually just a batch of long calls: explore after two in a row
+            slow = throughput < self.settled_throughput * (1 - 4 * self.tolerance)
+            self.slow_windows = self.slow_windows + 1 if slow else 0
+            if self.slow_windows >= 2:
+                self.explore(throughput, f"{reason}, down from {self.settled_throughput:.1f} records/s")
+            elif self.settled_windows >= self.probe_every:
+                self.explore(throughput, f"{reason}, probing for a better size")
+            elif not slow:
+                # Follow slow drift, so only a sudden drop triggers exploring
+                self.settled_throughput = 0.7 * self.settled_throughput + 0.3 * throughput
+            return
+
+        if self.best is None or throughput > self.best[0] * (1 + self.tolerance):
+            self.best = (throughput, self.size)
+            target = self.clamp(self.size * self.growth ** self.direction)
+            if target != self.size:
+                self.change(target, reason)
+                return
+            self.settle(throughput, f"{reason}, at the {'largest' if self.direction > 0 else 'smallest'} allowed size")
+            return
+
+        # No better than the best size: try the other direction once, from the starting size
+        if self.direction > 0 and self.best[1] == self.start_size:
+            target = self.clamp(self.start_size / self.growth)
+            if target != self.start_size:
+                self.direction = -1
+                self.change(target, f"{reason}, growing did not help")
+                return
+
+        best_throughput, best_size = self.best
+        if best_size != self.size:
+            self.change(self.clamp(best_size), f"{reason}, best was {best_throughput:.1f} records/s at {best_size}")
+        self.settle(best_throughput, None)
+
+    def explore(self, throughput, reason):
+        """Start exploring again from the current size, growing first unless it is already the largest allowed"""
+        self.exploring = True
+        self.direction = 1
+        self.start_size = self.size
+        self.best = (throughput, self.size)
+        target = self.clamp(self.size * self.growth)
+        if target == self.size:
+            self.direction = -1
+            target = self.clamp(self.size / self.growth)
+        if target == self.size:
+            self.settle(throughput, None)
+            return
+        self.change(target, reason)
+
+    def settle(self, throughput, reason):
+        """Keep the current size until the next probe (throughput None: measure it in the next window)"""
+        self.exploring = False
+        self.settled_throughput = throughput
+        self.settled_windows = 0
+        self.slow_windows = 0
+        if self.verbose:
+            print(f"INFO: Batch size settled at {self.size}" + (f" ({reason})" if reason else ""))
+
+    def change(self, size, reason):
+        """Switch to a new size, logging the decision"""
+        if self.verbose:
+            print(f"INFO: Batch size {self.size} -> {size} ({reason})")
+        self.size = size
+
+    def describe(self):
+        """One-line description of the controller's settings"""
+        memory = f", memory cap {self.memory_limit / MIB:.3g} MiB" if self.memory_limit else ""
+        return f"adaptive from {self.size} ({self.minimum}-{self.maximum}{memory})"
+
+class FixedBatchSize(AdaptiveBatchSize):
+    """Batch size that never changes, with the same interface as AdaptiveBatchSize"""
+
+    def __init__(self, size):
+        super().__init__(initial=size, minimum=size, maximum=size, memory_limit=None, verbose=False)
+
+    def record_fetch(self, size, seconds):
+        pass
+
+    def record(self, batch):
+        pass
+
+    def describe(self):
+        return f"{self.size}"
+
+def add_batch_size_arguments(parser):
+    """Add the batch sizing options to a script's argument parser"""
+    parser.add_argument('--batch-size', type=int, default=10,
+                        help='Number of records to fetch at once; the starting size unless --fixed-batch-size (default: 10)')
+    parser.add_argument('--fixed-batch-size', action='store_true',
+                        help='Keep --batch-size for the whole run instead of adapting it to the observed throughput')
+    parser.add_argument('--min-batch-size', type=int, default=5,
+                        help='Smallest adaptive batch size (default: 5)')
+    parser.add_argument('--max-batch-size', type=int, default=1000,
+                        help='Largest adaptive batch size (default: 1000)')
+    parser.add_argument('--batch-memory-mb', type=float, default=256,
+                        help='Adaptive batches are kept small enough that the transcriptions in flight stay under this many MiB (default: 256)')
+
+def create_batch_sizer(args):
+    """Create the batch size controller selected by the batch sizing options"""
+    if args.fixed_batch_size:
+        return FixedBatchSize(args.batch_size)
+    return AdaptiveBatchSize(initial=args.batch_size, minimum=args.min_batch_size, maximum=args.max_batch_size,
+                             memory_limit=int(args.batch_memory_mb * MIB))
@@ -1,50 +1,53 @@
 import re
+from functools import lru_cache
+from slang_rules import load_ruleset
+# Line splitting lives in its own module, which the ingest script imports without loading the ruleset
+from slang_lines import extract_agent_lines, agent_only_transcription
+
+# Active ruleset, loaded from rules/slang_ruleset.json (or the file named by SLANG_RULESET)
+RULESET = load_ruleset()
+RULESET_VERSION = RULESET['version']
 
 # List of slang words to check
-SLANG_WORDS = [
-    'nope', 'gonna', 'gunna', 'gotcha', 
-    'lemme', 'okey dokey', 'all righty', 'cool', 'ain\'t', 
-    'bye-bye', 'yup', 'yep', 'ya', 'yeah', 'okay dokey', 'okey dokey'
-]
+SLANG_WORDS = RULESET['slang_words']
 
 # List of slang words that are acceptable in question context
-QUESTION_RESPONSE_SLANG = ['yeah', 'yup', 'yep', 'ya']
+QUESTION_RESPONSE_SLANG = RULESET['question_response_slang']
 
 # Define slang words that need verification
-VERIFIED_SLANG_WORDS = ['bye-bye']
+VERIFIED_SLANG_WORDS = RULESET['verified_slang_words']
 
 # Mapping of slang words to proper alternatives
-SLANG_ALTERNATIVES = {
-    'yup': 'yes',
-    'yep': 'yes',
-    'nope': 'no',
-    'ya': 'you/yes',
-    'yeah': 'yes',
-    'gonna': 'going to',
-    'gunna': 'going to',
-    'gotcha': 'I understand',
-    'lemme': 'let me',
-    'okey dokey': 'okay',
-    'all righty': 'alright',
-    'uhhhh': 'um',
-    'cool': 'good/great',
-    'ain\'t': 'is not/are not',
-    'bye-bye': 'goodbye',
-    'buh-buy': 'goodbye',
-    'k': 'okay',
-    'kay': 'okay'
-}
+SLANG_ALTERNATIVES = RULESET['alternatives']
+
+# Words the ruleset matcher (with its spelling variants) looks for
+MATCHED_WORDS = frozenset(SLANG_WORDS)
 
-def extract_agent_lines(transcription):
-    """Extract only the lines spoken by the agent from the transcription"""
-    agent_lines = []
+# Timestamps like "[00:01:10]", "[01:10]" or "00:01:10.5" at the start of a line
+TIMESTAMP_PATTERN = re.compile(r'\[?\s*(\d+):(\d{1,2})(?::(\d{1,2}))?(?:[.,](\d+))?\s*\]?')
+
+def parse_timestamp_seconds(timestamp):
+    """
+    Convert a transcript timestamp to seconds from the start of the call
     
-    # Regular expression to match lines containing "AGENT:" (with or without timestamp)
-    for line in transcription.split('\n'):
-        if 'AGENT:' in line.strip():
-            agent_lines.append(line.strip())
+    Args:
+        timestamp (str): Timestamp as it appears before "AGENT:", e.g. "[00:01:10]" (h:m:s) or "[01:10]" (m:s)
+        
+    Returns:
+        float: Seconds, or None if the text is not a timestamp
+    """
+    match = TIMESTAMP_PATTERN.search(timestamp or '')
+    if not match:
+        return None
     
-    return agent_lines
+    first, second, third, fraction = match.groups()
+    if third is None:
+        seconds = int(first) * 60 + int(second)
+    else:
+        seconds = int(first) * 3600 + int(second) * 60 + int(third)
+    if fraction:
+        seconds += float(f"0.{fraction}")
+    return float(seconds)
 
 def is_near_question(agent_lines, current_index):
     """
@@ -69,3 +72,87 @@ def is_near_question(agent_lines, current_index):
             return True
             
     return False
+
+# Agent lines at the end of a call in which 'bye-bye' is looked for (see find_slang_in_transcript)
+CLOSING_LINES = 5
+
+@lru_cache(maxsize=None)
+def whole_word_pattern(word):
+    """Compiled whole-word pattern for a word outside the ruleset"""
+    return re.compile(r'\b' + re.escape(word) + r'\b')
+
+def find_slang_in_transcript(transcript, slang_words, last_lines_only=True):
+    """
+    Find several slang words in the AGENT lines of a transcript in one pass
+    
+    The transcript is split into agent lines once and each line is scanned once by the
+    ruleset matcher for every ruleset word together, so checking more words costs
+    almost nothing more. The matches of each word are the same as checking it alone.
+    
+    Args:
+        transcript (str): The transcript text
+        slang_words (list): The slang words to check for
+        last_lines_only (bool): If True, 'bye-bye' is only looked for in the last few agent lines
+        
+    Returns:
+        dict: word -> list of (timestamp, context) matches, in transcript order (empty if not found)
+    """
+    found = {word: [] for word in slang_words}
+    if not transcript or not found:
+        return found
+    
+    agent_lines = extract_agent_lines(transcript)
+    
+    # If last_lines_only is True, 'bye-bye' (typically used at the end of a call)
+    # only counts in the last 5 agent lines (or all if less than 5)
+    closing_start = max(0, len(agent_lines) - CLOSING_LINES) if last_lines_only else 0
+    
+    matched = [word for word in found if word in MATCHED_WORDS]
+    unmatched = [word for word in found if word not in MATCHED_WORDS]
+    
+    for i, line in enumerate(agent_lines):
+        # Extract timestamp and text
+        parts = line.split('AGENT:', 1)
+        if len(parts) < 2:
+            continue
+            
+        timestamp = parts[0].strip()
+        agent_text_lower = parts[1].strip().lower()
+        
+        # Ruleset words go through the ruleset matcher, so their spelling variants count too
+        spans = {}
+        if matched:
+            for word, start_pos, end_pos in RULESET['matcher'].finditer(agent_text_lower):
+                if word in found:
+                    spans.setdefault(word, []).append((start_pos, end_pos))
+        for word in unmatched:
+            # Check for slang word as a whole word
+            word_spans = [(match.start(), match.end()) for match in whole_word_pattern(word).finditer(agent_text_lower)]
+            if word_spans:
+                spans[word] = word_spans
+        
+        for word, word_spans in spans.items():
+            if word == 'bye-bye' and i < closing_start:
+                continue
+            # Extract context (10 chars before and after if available)
+            for start_pos, end_pos in word_spans:
+                start_context = max(0, start_pos - 10)
+                end_context = min(len(agent_text_lower), end_pos + 10)
+                found[word].append((timestamp, agent_text_lower[start_context:end_context]))
+    
+    return found
+
+def check_slang_in_transcript(transcript, slang_word, last_lines_only=True):
+    """
+    Check if specific slang word appears in AGENT lines of the transcript
+    
+    Args:
+        transcript (str): The transcript text
+        slang_word (str): The slang word to check for
+        last_lines_only (bool): If True, only check the last few lines of the transcript
+        
+    Returns:
+        tuple: (bool, list of matching lines)
+    """
+    matches = find_slang_in_transcript(transcript, [slang_word], last_lines_only)[slang_word]
+    return bool(matches), matches
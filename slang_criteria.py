@@ -0,0 +1,582 @@
+from collections.abc import Mapping
+from functools import lru_cache
+from slang_common import (RULESET, RULESET_VERSION, SLANG_WORDS, SLANG_ALTERNATIVES, extract_agent_lines,
+                          is_near_question, find_slang_in_transcript, QUESTION_RESPONSE_SLANG,
+                          VERIFIED_SLANG_WORDS, parse_timestamp_seconds)
+from slang_rules import load_matcher
+from slang_alignment import VERIFICATION_MODES, ALIGNMENT_TOLERANCE, TimestampAligner, index_occurrences
+
+# Registered criteria, in registration order. Each criterion is a dict describing
+# the words it looks for, how an occurrence is accepted and how the call is scored.
+CRITERIA = {}
+
+# Shared matchers, keyed by the tuple of criterion names they were built for
+_MATCHERS = {}
+
+# Suffix of the ruleset_version of evaluations verified occurrence by occurrence, so they
+# are stored next to the call-mode evaluations of the same ruleset instead of replacing them
+OCCURRENCE_VERSION_SUFFIX = '+occ'
+
+def get_evaluation_version(verification_mode='call'):
+    """Get the ruleset_version evaluations are stored under with a verification mode"""
+    if verification_mode == 'occurrence':
+        return RULESET_VERSION + OCCURRENCE_VERSION_SUFFIX
+    return RULESET_VERSION
+
+def register_criterion(name, label, words, table='slang.evaluation_gemini', max_score=2,
+                       alternatives=None, accept=None, score=None, summary_label=None,
+                       improvement_suggestion="", verified_words=None):
+    """
+    Register an evaluation criterion with the engine
+
+    Args:
+        name (str): Short name used to select the criterion (e.g. 'slang')
+        label (str): Value stored in the criteria column of the evaluation table
+        words (list): Words or phrases this criterion looks for in agent lines
+        table (str): Evaluation table the results are written to
+        max_score (int): Score given when the criterion passes
+        alternatives (dict, optional): Mapping of words to proper alternatives
+        accept (callable, optional): accept(call, word, line_index, text) -> bool, decides
+            whether an occurrence counts. Every occurrence counts if not given. The occurrence
+            being decided is in call['occurrence'] as (line_index, timestamp, start_pos).
+        score (callable, optional): score(criterion, counts) -> (score, explanation, suggestion).
+            Defaults to score_word_usage.
+        summary_label (str, optional): Label used in the per-call debug summary
+        improvement_suggestion (str): Suggestion given when the criterion fails
+        verified_words (list, optional): Words whose occurrences accept may verify against whisper,
+            decided last in verdict-only mode since that can mean a whisper lookup
+
+    Returns:
+        dict: The registered criterion
+    """
+    CRITERIA[name] = {
+        'name': name,
+        'label': label,
+        'words': list(words),
+        'table': table,
+        'max_score': max_score,
+        'alternatives': alternatives or {},
+        'accept': accept,
+        'score': score or score_word_usage,
+        'summary_label': summary_label or label,
+        'improvement_suggestion': improvement_suggestion,
+        'verified_words': set(verified_words or ()),
+    }
+    # Matchers cover the union of all selected criteria, so rebuild them lazily
+    _MATCHERS.clear()
+    return CRITERIA[name]
+
+def get_shared_matcher(names):
+    """
+    Get the matcher shared by the given criteria
+
+    The matcher covers the union of the criteria's words, so one scan of a line
+    feeds every criterion.
+    """
+    key = tuple(names)
+    if key not in _MATCHERS:
+        words = list(dict.fromkeys(word for name in names for word in CRITERIA[name]['words']))
+        # Usually the criteria only use words from the ruleset, whose matcher is already compiled
+        if words == RULESET['matcher'].words:
+            _MATCHERS[key] = RULESET['matcher']
+        else:
+            _MATCHERS[key] = load_matcher(words, RULESET['variants'])
+    return _MATCHERS[key]
+
+def stops_at_first_occurrence(criterion):
+    """Check whether one accepted occurrence settles the verdict of a criterion (true of score_word_usage)"""
+    return criterion['score'] is score_word_usage
+
+def score_word_usage(criterion, counts):
+    """
+    Default scoring rule: full marks if none of the criterion's words were used, 0 otherwise
+
+    Returns:
+        tuple: (score, explanation, improvement_suggestion)
+    """
+    used = [(word, count) for word, count in counts.items() if count > 0]
+
+    if not used:
+        return criterion['max_score'], "Agent used proper English with no slang words.", ""
+
+    used_slang = [f"'{word}' ({count} time{'s' if count > 1 else ''})" for word, count in used]
+    explanation = f"Agent used inappropriate slang: {', '.join(used_slang)}"
+
+    # Add proper alternatives
+    alternatives = []
+    for word, _ in used:
+        proper = criterion['alternatives'].get(word, "")
+        if proper:
+            alternatives.append(f"'{word}' → '{proper}'")
+
+    if alternatives:
+        explanation += f"\n\nProper alternatives: {', '.join(alternatives)}"
+
+    return 0, explanation, criterion['improvement_suggestion']
+
+def is_confirmed_by_whisper(call, word):
+    """
+    Check whether a word found in the gemini transcription also appears in the whisper one
+
+    The first word asked about verifies every word in VERIFIED_SLANG_WORDS with it, so each
+    transcription is scanned once per call whatever the number of words, and the whisper
+    transcription is fetched at most once per call (and only if gemini has one of them).
+    """
+    verified = call['verified']
+    if word not in verified:
+        words = [w for w in dict.fromkeys((*VERIFIED_SLANG_WORDS, word)) if w not in verified]
+
+        # The gemini transcription is already in hand, so only whisper needs a lookup
+        gemini_found = [w for w, matches in find_slang_in_transcript(call['transcription'], words).items() if matches]
+
+        whisper_found = {}
+        if gemini_found:
+            if 'whisper_transcription' not in call:
+                call['whisper_transcription'] = call['whisper_lookup'](call['call_id'])
+            whisper_found = find_slang_in_transcript(call['whisper_transcription'], gemini_found)
+
+        for w in words:
+            verified[w] = bool(whisper_found.get(w))
+            if w in gemini_found and not verified[w]:
+                call['unconfirmed'].add(w)
+
+    # Reported once per word, when an occurrence of it is decided
+    if word in call['unconfirmed']:
+        call['unconfirmed'].discard(word)
+        if call['verbose']:
+            print(f"INFO: '{word}' found in gemini transcription but NOT in whisper transcription for call_id {call['call_id']} - NOT counting it")
+
+    return verified[word]
+
+def db_whisper_lookup(call_id):
+    """Default whisper provider: look the whisper transcription up in the database selected by
+    WHISPER_SOURCE (production, or the local copy kept by whisper_sync.py)
+
+    The database modules are only imported on first use, so the engine itself can run
+    without psycopg2 or database settings when another provider is used.
+    """
+    from whisper_sync import default_whisper_lookup
+    return default_whisper_lookup()(call_id)
+
+def whisper_from_mapping(mapping):
+    """Whisper provider reading from a mapping of call_id -> whisper transcription (missing calls get None)"""
+    return lambda call_id: mapping.get(call_id)
+
+def cached_whisper_lookup(lookup, maxsize=10000):
+    """Wrap a whisper provider so each call_id is looked up at most once while it stays in the cache"""
+    return lru_cache(maxsize=maxsize)(lookup)
+
+def resolve_whisper_lookup(whisper_lookup):
+    """
+    Turn any supported whisper provider into a call_id -> whisper transcription callable
+
+    Args:
+        whisper_lookup: None for the database (db_whisper_lookup), a mapping of call_id ->
+            whisper transcription, or any callable taking a call_id
+    """
+    if whisper_lookup is None:
+        return db_whisper_lookup
+    if isinstance(whisper_lookup, Mapping):
+        return whisper_from_mapping(whisper_lookup)
+    if callable(whisper_lookup):
+        return whisper_lookup
+    raise TypeError(f"whisper_lookup must be None, a mapping or a callable, not {type(whisper_lookup).__name__}")
+
+def get_aligner(call):
+    """Get the call's whisper aligner, fetching and scanning the whisper transcription once on first use"""
+    if call['aligner'] is None:
+        if 'whisper_transcription' not in call:
+            call['whisper_transcription'] = call['whisper_lookup'](call['call_id'])
+        # The whisper lines are scanned with the same matcher as the gemini ones, for every word at once
+        call['aligner'] = TimestampAligner(index_occurrences(call['whisper_transcription'], call['matcher']),
+                                           call['alignment_tolerance'])
+    return call['aligner']
+
+def is_occurrence_confirmed(call, word):
+    """
+    Check whether the whisper transcription confirms the occurrence being decided
+
+    The occurrence (call['occurrence']) needs a whisper occurrence of the same word
+    within the alignment tolerance of its timestamp, which no earlier occurrence took.
+    The result is cached per occurrence, so criteria sharing a word agree on it.
+    """
+    line_index, timestamp, start_pos = call['occurrence']
+    key = (word, line_index, start_pos)
+    aligned = call['aligned']
+    if key not in aligned:
+        match = get_aligner(call).confirm(word, parse_timestamp_seconds(timestamp))
+        aligned[key] = match is not None
+        if match is None and call['verbose']:
+            print(f"INFO: '{word}' at {timestamp} has no matching whisper occurrence within "
+                  f"{call['alignment_tolerance']:g}s for call_id {call['call_id']} - NOT counting it")
+    return aligned[key]
+
+def is_verified(call, word):
+    """Verify an occurrence of a word against whisper in the call's verification mode"""
+    if call['verification_mode'] == 'occurrence':
+        return is_occurrence_confirmed(call, word)
+    return is_confirmed_by_whisper(call, word)
+
+def accept_slang_occurrence(call, word, line_index, text):
+    """Decide whether an occurrence of a slang word counts against the agent"""
+    # Special handling for 'yeah', 'yup', etc. near questions
+    if (call['question_context'] and word in QUESTION_RESPONSE_SLANG
+            and is_near_question(call['agent_lines'], line_index)):
+        # This is an acceptable use of 'yeah', 'yup', etc. near a question
+        if call['verbose']:
+            print(f"INFO: '{word}' found near a question - NOT counting it as slang")
+            print(f"      Context: '{text}'")
+        return False
+
+    # Special handling for slang words that need verification with whisper transcriptions
+    if call['verify'] and word in VERIFIED_SLANG_WORDS and call['call_id'] is not None:
+        return is_verified(call, word)
+
+    return True
+
+def accept_verified_occurrence(call, word, line_index, text):
+    """Only count an occurrence if the whisper transcription confirms it"""
+    if not call['verify'] or call['call_id'] is None:
+        return True
+    return is_verified(call, word)
+
+def parse_agent_lines(agent_lines):
+    """Split agent lines into (line_index, timestamp, lowercased agent text) tuples"""
+    parsed = []
+    for i, line in enumerate(agent_lines):
+        # Extract timestamp (assuming it's at the beginning of the line before AGENT:)
+        parts = line.split('AGENT:', 1)
+        if len(parts) < 2:
+            continue
+        parsed.append((i, parts[0].strip(), parts[1].strip().lower()))
+    return parsed
+
+def new_occurrence(call, name, word, line_index, timestamp, start_pos, end_pos):
+    """
+    Structured record of an accepted occurrence, as written to slang.slang_occurrences
+
+    Offsets are character positions in the agent text of the line (after "AGENT:").
+    verified is True when the whisper transcription confirmed the word (in occurrence
+    mode, this very occurrence), False when it did not, and None when the word was not
+    checked against whisper (not one of the criterion's verified_words, verification
+    off, or no call_id to look whisper up with).
+    """
+    if call['verify'] and call['call_id'] is not None and word in CRITERIA[name]['verified_words']:
+        verified = call['aligned'].get((word, line_index, start_pos), call['verified'].get(word, False))
+    else:
+        verified = None
+    return {
+        'call_id': call['call_id'],
+        'criterion': name,
+        'word': word,
+        'line_index': line_index,
+        'timestamp': timestamp,
+        'timestamp_seconds': parse_timestamp_seconds(timestamp),
+        'start_offset': start_pos,
+        'end_offset': end_pos,
+        'verified': verified,
+    }
+
+def match_criteria(call, names):
+    """
+    Run the shared match pass for the selected criteria over the call's agent lines
+
+    The accepted occurrences are also kept in structured form in call['occurrences']
+    (criterion name -> list of occurrence dicts, see new_occurrence), in the same order
+    as found_references.
+
+    Returns:
+        dict: criterion name -> (counts, found_references)
+    """
+    matcher = get_shared_matcher(names)
+    call['matcher'] = matcher
+    results = {}
+    for name in names:
+        results[name] = ({word: 0 for word in CRITERIA[name]['words']}, [])
+        call['occurrences'][name] = []
+
+    for i, timestamp, text in call['parsed_lines']:
+        # One scan of the line for every word of every criterion
+        hits = {}
+        for word, start_pos, end_pos in matcher.finditer(text):
+            hits.setdefault(word, []).append((start_pos, end_pos))
+        if not hits:
+            continue
+
+        for name in names:
+            criterion = CRITERIA[name]
+            counts, found_references = results[name]
+
+            # Report in the criterion's word order, like scanning once per word would
+            for word in criterion['words']:
+                for start_pos, end_pos in hits.get(word, ()):
+                    accept = criterion['accept']
+                    call['occurrence'] = (i, timestamp, start_pos)
+                    if accept is not None and not accept(call, word, i, text):
+                        continue
+
+                    counts[word] += 1
+                    found_references.append(record_occurrence(call, name, word, i, timestamp, text, start_pos, end_pos))
+
+    return results
+
+def record_occurrence(call, name, word, line_index, timestamp, text, start_pos, end_pos):
+    """Keep an accepted occurrence in call['occurrences'] and return its found_references entry"""
+    # Extract some context around the word (10 chars before and after if available)
+    start_context = max(0, start_pos - 10)
+    end_context = min(len(text), end_pos + 10)
+    context_text = text[start_context:end_context]
+
+    call['occurrences'][name].append(new_occurrence(call, name, word, line_index, timestamp, start_pos, end_pos))
+
+    if call['verbose']:
+        print(f"DEBUG: Found slang word '{word}' at {timestamp} - context: '{context_text}'")
+
+    # Detailed reference with timestamp and context
+    proper_alternative = CRITERIA[name]['alternatives'].get(word, "")
+    return f"{timestamp} - '{word}' (proper: '{proper_alternative}') in '{context_text}'"
+
+def match_first_occurrences(call, names):
+    """
+    Verdict-only match pass: stop at the first accepted occurrence of each criterion
+
+    For criteria that fail on any occurrence (see stops_at_first_occurrence), one
+    occurrence is all the verdict needs. Occurrences of words that need no whisper
+    verification are decided first, line by line, and the scan stops as soon as every
+    criterion has one. Occurrences of the criteria's verified words are decided
+    afterwards, in line order, and only for the criteria still undecided, so whisper
+    is only looked up for calls nothing cheaper has failed. A criterion that passes
+    has been through every line, so its details are complete; those that failed are
+    added to call['incomplete'].
+
+    Returns:
+        dict: criterion name -> (counts, found_references), like match_criteria but with at
+            most the first accepted occurrence of each criterion
+    """
+    matcher = get_shared_matcher(names)
+    call['matcher'] = matcher
+    words = {name: set(CRITERIA[name]['words']) for name in names}
+    verify = call['verify'] and call['call_id'] is not None
+    results = {}
+    for name in names:
+        results[name] = ({word: 0 for word in CRITERIA[name]['words']}, [])
+        call['occurrences'][name] = []
+
+    def decide(name, word, i, timestamp, text, start_pos, end_pos):
+        counts, found_references = results[name]
+        accept = CRITERIA[name]['accept']
+        call['occurrence'] = (i, timestamp, start_pos)
+        if accept is not None and not accept(call, word, i, text):
+            return
+        counts[word] += 1
+        found_references.append(record_occurrence(call, name, word, i, timestamp, text, start_pos, end_pos))
+        call['incomplete'].add(name)
+
+    deferred = []
+    for i, timestamp, text in call['parsed_lines']:
+        for word, start_pos, end_pos in matcher.finditer(text):
+            for name in names:
+                if name in call['incomplete'] or word not in words[name]:
+                    continue
+                if verify and word in CRITERIA[name]['verified_words']:
+                    deferred.append((name, word, i, timestamp, text, start_pos, end_pos))
+                else:
+                    decide(name, word, i, timestamp, text, start_pos, end_pos)
+        if len(call['incomplete']) == len(names):
+            return results
+
+    for name, word, i, timestamp, text, start_pos, end_pos in deferred:
+        if name not in call['incomplete']:
+            decide(name, word, i, timestamp, text, start_pos, end_pos)
+    return results
+
+def new_call(call_id, transcription, agent_lines=None, whisper_lookup=None, verbose=True,
+             verify=True, question_context=True, verification_mode='call', alignment_tolerance=ALIGNMENT_TOLERANCE):
+    """Parse a transcription once into the per-call state shared by every criterion"""
+    if verification_mode not in VERIFICATION_MODES:
+        raise ValueError(f"verification_mode must be one of {', '.join(VERIFICATION_MODES)}, not {verification_mode!r}")
+    if agent_lines is None:
+        agent_lines = extract_agent_lines(transcription)
+    return {
+        'call_id': call_id,
+        'transcription': transcription,
+        'agent_lines': agent_lines,
+        'parsed_lines': parse_agent_lines(agent_lines),
+        'whisper_lookup': resolve_whisper_lookup(whisper_lookup),
+        'verified': {},
+        'unconfirmed': set(),
+        'occurrences': {},
+        'incomplete': set(),
+        'verbose': verbose,
+        'verify': verify,
+        'question_context': question_context,
+        'verification_mode': verification_mode,
+        'alignment_tolerance': alignment_tolerance,
+        'matcher': None,
+        'aligner': None,
+        'aligned': {},
+        'occurrence': None,
+    }
+
+def evaluate_criteria(call_id, transcription, transcription_id, criteria=None,
+                      whisper_lookup=None, verbose=True, verify=True, question_context=True,
+                      verification_mode='call', alignment_tolerance=ALIGNMENT_TOLERANCE, verdict_only=False):
+    """
+    Evaluate a transcription against several criteria with a single parse and match pass
+
+    Args:
+        call_id: The call ID of the transcription
+        transcription (str): The full transcription text
+        transcription_id (int): ID stored with the evaluation records
+        criteria (list, optional): Names of the criteria to run. Default is every registered criterion.
+        whisper_lookup (optional): Whisper provider used for verification, see resolve_whisper_lookup.
+            Default looks the whisper transcription up in the production database.
+        verbose (bool): Print debug output while evaluating
+        verify (bool): Verify words in VERIFIED_SLANG_WORDS against the whisper transcription.
+            When False they are counted like any other word and whisper is never looked up.
+        question_context (bool): Ignore responses like 'yeah' near questions
+        verification_mode (str): 'call' confirms a word for the whole call if whisper has it
+            anywhere; 'occurrence' confirms each occurrence against whisper occurrences of
+            the same word close in time (see slang_alignment.TimestampAligner)
+        alignment_tolerance (float): In occurrence mode, seconds a whisper occurrence may be away
+        verdict_only (bool): Stop at the first occurrence that fails a criterion (see
+            match_first_occurrences). Failed evaluations then only hold that occurrence and
+            have details_complete False until they are evaluated again in full. Ignored
+            unless every selected criterion fails on any occurrence.
+
+    Returns:
+        dict: criterion name -> evaluation data, ready for insert_evaluations
+    """
+    names = list(criteria) if criteria else list(CRITERIA)
+    call = new_call(call_id, transcription, whisper_lookup=whisper_lookup, verbose=verbose,
+                    verify=verify, question_context=question_context,
+                    verification_mode=verification_mode, alignment_tolerance=alignment_tolerance)
+    if verdict_only and all(stops_at_first_occurrence(CRITERIA[name]) for name in names):
+        matches = match_first_occurrences(call, names)
+    else:
+        matches = match_criteria(call, names)
+
+    # Create context string from agent_lines
+    context = '\n'.join(call['agent_lines'])
+
+    evaluations = {}
+    for name in names:
+        criterion = CRITERIA[name]
+        counts, found_references = matches[name]
+
+        if verbose:
+            print(f"\nDEBUG: {criterion['summary_label']} summary for call_id {call_id}:")
+            for word, count in counts.items():
+                if count > 0:
+                    print(f"  - '{word}': {count} occurrences")
+
+        score, explanation, improvement_suggestion = criterion['score'](criterion, counts)
+        passed = score > 0
+        details_complete = name not in call['incomplete']
+        if not details_complete:
+            explanation += "\n\nVerdict only: stopped at the first occurrence, the others are not listed yet."
+
+        evaluations[name] = {
+            'transcription_id': transcription_id,
+            'call_id': call_id,
+            'ruleset_version': get_evaluation_version(verification_mode),
+            'intern_ai_grade': 'Yes' if passed else 'No',
+            'score': score,
+            'max_score': criterion['max_score'],
+            'criteria': criterion['label'],
+            'passed': passed,
+            'explanation': explanation,
+            'improvement_suggestion': improvement_suggestion,
+            'found_references': found_references,
+            'context': context,
+            'original_transcription': transcription,
+            'criterion': name,
+            'occurrences': call['occurrences'][name],
+            'details_complete': details_complete,
+        }
+
+        if verbose:
+            print(f"DEBUG: Evaluation result: {'PASSED' if passed else 'FAILED'} (Score: {score}/{criterion['max_score']})")
+
+    return evaluations
+
+def evaluate_many(records, whisper_lookup=None, criteria=None, verify=True, question_context=True,
+                  start_transcription_id=None, verbose=False, verification_mode='call',
+                  alignment_tolerance=ALIGNMENT_TOLERANCE, verdict_only=False):
+    """
+    Lazily evaluate any iterable of transcripts, without touching the evaluation tables
+
+    Records are consumed one at a time and one result is yielded per record, in order,
+    so arbitrarily large inputs (a generator, a file, a Spark partition) stream through
+    in constant memory. Nothing is written and, with a mapping or a custom whisper
+    provider, nothing is read from any database either.
+
+    Args:
+        records (iterable): (call_id, transcription) tuples, or dicts with 'call_id' and
+            'transcription' and optionally 'transcription_id' and 'whisper_transcription'
+        whisper_lookup (optional): Whisper provider for verification: a mapping of call_id ->
+            whisper transcription, any callable taking a call_id (e.g. wrapped in
+            cached_whisper_lookup), or None for the production database
+        criteria (list, optional): Names of the criteria to run. Default is every registered criterion.
+        verify (bool): Verify words in VERIFIED_SLANG_WORDS against the whisper transcription
+        question_context (bool): Ignore responses like 'yeah' near questions
+        start_transcription_id (int, optional): transcription_id given to the first record without
+            one, incremented per record. Default leaves transcription_id as None.
+        verbose (bool): Print debug output while evaluating
+        verification_mode (str): 'call' or 'occurrence', see evaluate_criteria
+        alignment_tolerance (float): In occurrence mode, seconds a whisper occurrence may be away
+        verdict_only (bool): Stop at the first failing occurrence, see evaluate_criteria
+
+    Yields:
+        dict: criterion name -> evaluation data, one per record
+    """
+    whisper_lookup = resolve_whisper_lookup(whisper_lookup)
+    next_id = start_transcription_id
+
+    for record in records:
+        record_lookup = whisper_lookup
+        if isinstance(record, Mapping):
+            call_id = record.get('call_id')
+            transcription = record.get('transcription') or ''
+            transcription_id = record.get('transcription_id')
+            if 'whisper_transcription' in record:
+                whisper_transcription = record['whisper_transcription']
+                record_lookup = lambda _: whisper_transcription
+        else:
+            call_id, transcription = record[0], record[1] or ''
+            transcription_id = None
+
+        if transcription_id is None and next_id is not None:
+            transcription_id = next_id
+            next_id += 1
+
+        yield evaluate_criteria(call_id, transcription, transcription_id, criteria=criteria,
+                                whisper_lookup=record_lookup, verbose=verbose,
+                                verify=verify, question_context=question_context,
+                                verification_mode=verification_mode, alignment_tolerance=alignment_tolerance,
+                                verdict_only=verdict_only)
+
+# Slang usage, the criterion stored in slang.evaluation_gemini
+register_criterion(
+    'slang',
+    label="No Slang (Using Proper English)",
+    words=SLANG_WORDS,
+    alternatives=SLANG_ALTERNATIVES,
+    accept=accept_slang_occurrence,
+    summary_label="Slang word",
+    improvement_suggestion="Use proper English in customer interactions. Avoid casual slang and informal language.",
+    verified_words=VERIFIED_SLANG_WORDS,
+)
+
+# 'Bye-bye' closings, only counted when the whisper transcription confirms them
+register_criterion(
+    'bye_bye',
+    label="No 'Bye-Bye' Closing",
+    words=['bye-bye'],
+    table='slang.evaluation_bye_bye_gemini',
+    alternatives={'bye-bye': SLANG_ALTERNATIVES['bye-bye']},
+    accept=accept_verified_occurrence,
+    summary_label="Bye-bye",
+    improvement_suggestion="Close the call with 'goodbye' instead of 'bye-bye'.",
+    verified_words=['bye-bye'],
+)
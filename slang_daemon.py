@@ -0,0 +1,295 @@
+import time
+import select
+import signal
+import psycopg2
+import psycopg2.extensions
+from slang_helper import (get_db_connection, insert_evaluations, allocate_transcription_ids, get_call_id_type,
+                          get_missing_evaluation_condition)
+from slang_schema import require_schema, NOTIFY_CHANNEL
+from slang_criteria import CRITERIA, evaluate_criteria, get_evaluation_version
+from slang_alignment import ALIGNMENT_TOLERANCE
+from cross_verify_slang import get_senna_db_pool, close_senna_db_pool, get_pooled_whisper_transcription
+from whisper_sync import get_whisper_source, LocalWhisperLookup
+
+class EvaluationDaemon:
+    """Evaluate new transcriptions as they arrive, driven by LISTEN/NOTIFY
+
+    An insert trigger on slang.transcriptions_gemini notifies NOTIFY_CHANNEL with
+    the call_id of every new transcription (installed by slang_schema.py --apply). The daemon
+    listens on that channel and evaluates the notified calls within seconds, with
+    the compiled ruleset kept warm and its connections kept open between calls.
+
+    Notifications sent while the daemon is down or reconnecting are lost, so every
+    sweep_interval seconds (and after every reconnect) it also sweeps for
+    transcriptions that have no evaluation yet.
+    """
+
+    def __init__(self, criteria, sweep_interval=300, batch_size=50, whisper_connections=2, verify=True,
+                 question_context=True, verification_mode='call', alignment_tolerance=ALIGNMENT_TOLERANCE,
+                 verdict_only=False):
+        """
+        Args:
+            criteria (list): Names of the criteria to evaluate
+            sweep_interval (float): Seconds between sweeps for missed transcriptions
+            batch_size (int): Maximum number of calls evaluated and written together
+            whisper_connections (int): Size of the pool of production connections for whisper lookups
+            verify, question_context, verification_mode, alignment_tolerance, verdict_only:
+                As in slang_criteria.evaluate_criteria, so the daemon writes what a batch run
+                with the same options would, under the same ruleset_version
+        """
+        self.criteria = criteria
+        self.tables = list(dict.fromkeys(CRITERIA[name]['table'] for name in criteria))
+        self.evaluation_options = {
+            'verify': verify,
+            'question_context': question_context,
+            'verification_mode': verification_mode,
+            'alignment_tolerance': alignment_tolerance,
+            'verdict_only': verdict_only,
+        }
+        self.ruleset_version = get_evaluation_version(verification_mode)
+        self.sweep_interval = sweep_interval
+        self.batch_size = batch_size
+        self.whisper_connections = whisper_connections
+        self.running = False
+        self.listen_conn = None
+        self.work_conn = None
+        self.whisper_pool = None
+        self.local_whisper = None
+        self.call_id_type = None
+        self.processed = 0
+
+    def connect(self):
+        """Open the listening connection, the working connection and the whisper pool"""
+        self.listen_conn = get_db_connection()
+        self.listen_conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = self.listen_conn.cursor()
+        cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        cursor.close()
+
+        self.work_conn = get_db_connection()
+        if not self.evaluation_options['verify']:
+            # Nothing is checked against whisper, so production is never connected to
+            return
+        self.whisper_pool = get_senna_db_pool(self.whisper_connections)
+        if get_whisper_source() == 'local':
+            # Synced calls are read locally; the pool only serves calls not synced yet
+            self.local_whisper = LocalWhisperLookup(
+                fallback=lambda call_id: get_pooled_whisper_transcription(call_id, self.whisper_pool))
+
+    def disconnect(self):
+        """Close every connection, ignoring errors from connections that are already broken"""
+        for conn in (self.listen_conn, self.work_conn):
+            if conn is not None:
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+        self.listen_conn = self.work_conn = None
+        if self.local_whisper is not None:
+            self.local_whisper.close()
+            self.local_whisper = None
+        if self.whisper_pool is not None:
+            close_senna_db_pool()
+        self.whisper_pool = None
+
+    def lookup_whisper(self, call_id):
+        """Whisper lookup for the engine, from the local copy or the pool of production connections"""
+        if self.local_whisper is not None:
+            return self.local_whisper(call_id)
+        return get_pooled_whisper_transcription(call_id, self.whisper_pool)
+
+    def fetch_transcriptions(self, call_ids):
+        """Fetch (call_id, transcription) for the given call_ids, in call_id order"""
+        cursor = self.work_conn.cursor()
+        try:
+            # Notification payloads are text, cast them to the column type so the index is used
+            cursor.execute(f"""
+            SELECT call_id, transcription
+            FROM slang.transcriptions_gemini
+            WHERE call_id = ANY(%s::{self.call_id_type}[])
+            ORDER BY call_id
+            """, (list(call_ids),))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            self.work_conn.commit()
+
+    def fetch_missed(self, after_call_id):
+        """Fetch the next batch of transcriptions missing an evaluation of the daemon's ruleset_version for any criterion"""
+        cursor = self.work_conn.cursor()
+        try:
+            cursor.execute(f"""
+            SELECT t.call_id, t.transcription
+            FROM slang.transcriptions_gemini t
+            WHERE (%(after)s IS NULL OR t.call_id > %(after)s)
+              AND t.transcription IS NOT NULL AND t.transcription <> ''
+              AND {get_missing_evaluation_condition(self.tables)}
+            ORDER BY t.call_id
+            LIMIT %(limit)s
+            """, {'after': after_call_id, 'ruleset_version': self.ruleset_version, 'limit': self.batch_size})
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            self.work_conn.commit()
+
+    def evaluate_batch(self, records):
+        """Evaluate a batch of records and upsert their evaluations in one transaction
+
+        A record that fails to evaluate or to write is logged and skipped, so it cannot
+        block the others; having no evaluation, it is retried by the next sweep.
+        """
+        start = time.perf_counter()
+        records = [(call_id, transcription) for call_id, transcription in records if transcription]
+        transcription_ids = allocate_transcription_ids(len(records), conn=self.work_conn)
+        # The ids are taken for good; do not hold a transaction open while evaluating
+        self.work_conn.commit()
+
+        pending = []
+        outcomes = []
+        for (call_id, transcription), transcription_id in zip(records, transcription_ids):
+            try:
+                evaluations = evaluate_criteria(call_id, transcription, transcription_id, criteria=self.criteria,
+                                                whisper_lookup=self.lookup_whisper, verbose=False,
+                                                **self.evaluation_options)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except Exception as e:
+                print(f"Error evaluating call_id {call_id}: {e} - skipping it")
+                continue
+            for name, evaluation_data in evaluations.items():
+                pending.append((CRITERIA[name]['table'], evaluation_data))
+            outcomes.append((call_id, evaluations))
+
+        failed = self.write_evaluations(pending)
+        outcomes = [outcome for outcome in outcomes if outcome[0] not in failed]
+        elapsed = (time.perf_counter() - start) * 1000
+
+        for call_id, evaluations in outcomes:
+            results = ", ".join(f"{name}: {'PASSED' if data['passed'] else 'FAILED'}"
+                                for name, data in evaluations.items())
+            print(f"INFO: Evaluated call_id {call_id} ({results})")
+        if outcomes:
+            print(f"INFO: Wrote {len(outcomes)} evaluation(s) in {elapsed:.0f} ms")
+        self.processed += len(outcomes)
+
+    def write_evaluations(self, pending):
+        """
+        Upsert the evaluations of a batch, call by call if the batch as a whole is refused
+
+        Returns:
+            set: call_ids whose evaluations could not be written
+        """
+        try:
+            insert_evaluations(pending, conn=self.work_conn)
+            return set()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except psycopg2.Error as e:
+            print(f"WARNING: Writing the batch failed ({str(e).strip().splitlines()[0]}) - writing its calls one by one")
+
+        by_call = {}
+        for table, evaluation_data in pending:
+            by_call.setdefault(evaluation_data['call_id'], []).append((table, evaluation_data))
+
+        failed = set()
+        for call_id, rows in by_call.items():
+            try:
+                insert_evaluations(rows, conn=self.work_conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except psycopg2.Error as e:
+                print(f"Error writing the evaluations of call_id {call_id}: {str(e).strip().splitlines()[0]} - skipping it")
+                failed.add(call_id)
+        return failed
+
+    def evaluate_notified(self, call_ids):
+        """Evaluate the calls named in notifications, batch_size at a time"""
+        call_ids = sorted(call_ids, key=str)
+        for i in range(0, len(call_ids), self.batch_size):
+            self.evaluate_batch(self.fetch_transcriptions(call_ids[i:i + self.batch_size]))
+
+    def sweep(self):
+        """Evaluate every transcription that was missed, e.g. while the daemon was down"""
+        swept = 0
+        last_call_id = None
+        while self.running:
+            records = self.fetch_missed(last_call_id)
+            if not records:
+                break
+            self.evaluate_batch(records)
+            swept += len(records)
+            last_call_id = records[-1][0]
+
+        if swept:
+            print(f"INFO: Sweep evaluated {swept} missed transcription(s)")
+
+    def drain_notifications(self):
+        """Collect the call_ids of every notification received so far"""
+        self.listen_conn.poll()
+        call_ids = set()
+        while self.listen_conn.notifies:
+            call_ids.add(self.listen_conn.notifies.pop(0).payload)
+        return call_ids
+
+    def stop(self, *_):
+        """Stop the daemon after the batch in progress (also used as a signal handler)"""
+        if self.running:
+            print("INFO: Stopping after the current batch...")
+        self.running = False
+
+    def run(self):
+        """Listen and evaluate until stopped by SIGINT or SIGTERM"""
+        self.running = True
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        require_schema(self.tables, notify_trigger=True)
+        self.call_id_type = get_call_id_type()
+
+        print(f"Daemon listening on '{NOTIFY_CHANNEL}' for criteria: {', '.join(self.criteria)}, "
+              f"ruleset version {self.ruleset_version} (sweep every {self.sweep_interval:g}s)")
+
+        while self.running:
+            try:
+                self.connect()
+                # Anything inserted while we were not listening is only found by a sweep
+                self.sweep()
+                next_sweep = time.monotonic() + self.sweep_interval
+
+                while self.running:
+                    # Wake up at least once a second so a stop request is noticed
+                    timeout = min(1.0, max(0.0, next_sweep - time.monotonic()))
+                    readable, _, _ = select.select([self.listen_conn], [], [], timeout)
+                    if readable:
+                        call_ids = self.drain_notifications()
+                        if call_ids:
+                            self.evaluate_notified(call_ids)
+
+                    if time.monotonic() >= next_sweep:
+                        self.sweep()
+                        next_sweep = time.monotonic() + self.sweep_interval
+
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                print(f"Error in daemon connection: {e} - reconnecting in 5s")
+                self.disconnect()
+                time.sleep(5)
+            except Exception as e:
+                # The calls of the failed batch have no evaluation, so the sweep after reconnecting retries them
+                print(f"Error during processing: {e} - restarting in 5s")
+                self.disconnect()
+                time.sleep(5)
+            finally:
+                if not self.running:
+                    self.disconnect()
+
+        print(f"Daemon stopped. Records processed: {self.processed}")
+
+def run_daemon(criteria, sweep_interval=300, batch_size=50, **evaluation_options):
+    """
+    Run the evaluation daemon in the foreground until it is stopped
+
+    Args:
+        evaluation_options: verify, question_context, verification_mode, alignment_tolerance
+            and verdict_only, see EvaluationDaemon
+    """
+    EvaluationDaemon(criteria, sweep_interval=sweep_interval, batch_size=batch_size, **evaluation_options).run()
@@ -0,0 +1,14 @@
+# Set once the .env file has been loaded, see load_environment()
+_loaded = False
+
+def load_environment():
+    """Load settings from the .env file into the environment, the first time it is called
+
+    Database and ruleset settings are only needed once something connects or loads a
+    ruleset, so modules call this on first use instead of when they are imported.
+    """
+    global _loaded
+    if not _loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _loaded = True
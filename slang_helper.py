@@ -1,22 +1,65 @@
 import os
+import re
 import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_values
 import json
-from dotenv import load_dotenv
+import queue
+import threading
+import time
 from datetime import datetime
+from slang_env import load_environment
+from slang_rollups import compute_rollup_deltas, apply_rollup_deltas
 
-# Load environment variables
-load_dotenv()
+def get_db_connection_params():
+    """Get the connection settings of the PostgreSQL database, e.g. for a connection pool"""
+    load_environment()
+    return {
+        'host': os.getenv('DEV_DB_HOST'),
+        'user': os.getenv('DEV_DB_USER'),
+        'password': os.getenv('DEV_DB_PASS'),
+        'dbname': os.getenv('DEV_DB_NAME')
+    }
 
 def get_db_connection():
     """Create a connection to the PostgreSQL database"""
-    conn = psycopg2.connect(
-        host=os.getenv('DEV_DB_HOST'),
-        user=os.getenv('DEV_DB_USER'),
-        password=os.getenv('DEV_DB_PASS'),
-        dbname=os.getenv('DEV_DB_NAME')
-    )
+    conn = psycopg2.connect(**get_db_connection_params())
     return conn
 
+# Sequence transcription_ids are allocated from, created by `python slang_schema.py --apply`
+TRANSCRIPTION_ID_SEQUENCE = 'slang.transcription_id_seq'
+
+def allocate_transcription_ids(count, conn=None):
+    """Allocate transcription_ids from TRANSCRIPTION_ID_SEQUENCE
+    
+    Concurrent runs (batch scripts and the daemon) never get the same id, unlike
+    counting up from get_max_transcription_id(). Ids are increasing but may have gaps.
+    
+    Args:
+        count (int): Number of ids to allocate
+        conn (optional): Open connection to use. Default is a new connection, closed afterwards.
+        
+    Returns:
+        list: The allocated ids, in increasing order
+    """
+    if count <= 0:
+        return []
+    
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # nextval() is never rolled back, so the ids stay taken whatever the transaction does
+        cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", (TRANSCRIPTION_ID_SEQUENCE, count))
+        return sorted(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.commit()
+            conn.close()
+
 def get_max_transcription_id():
     """Get the highest transcription_id from the evaluation_gemini table"""
     conn = get_db_connection()
@@ -33,13 +76,27 @@ def get_max_transcription_id():
         cursor.close()
         conn.close()
 
-def get_transcription_cursor(limit=None, offset=0, order_by="call_id"):
+def transcription_expression(agent_only=False, alias=None):
+    """SQL expression of the transcription text to evaluate
+    
+    With agent_only, the agent lines kept in agent_transcription at ingest, which is about
+    half the text to transfer and parse. Rows without them (ingested before the column,
+    changed since, or without any agent line) fall back to the full transcription, which
+    evaluates the same.
+    """
+    prefix = f"{alias}." if alias else ""
+    if agent_only:
+        return f"COALESCE(NULLIF({prefix}agent_transcription, ''), {prefix}transcription)"
+    return f"{prefix}transcription"
+
+def get_transcription_cursor(limit=None, offset=0, order_by="call_id", agent_only=False):
     """Get a server-side cursor for transcriptions that fetches records one at a time
     
     Args:
         limit (int, optional): Maximum number of transcriptions to fetch. Default is None (all entries).
         offset (int, optional): Number of records to skip. Default is 0.
         order_by (str, optional): Column to order by. Default is "call_id".
+        agent_only (bool, optional): Fetch only the agent lines, see transcription_expression(). Default is False.
         
     Returns:
         tuple: (connection, cursor) - Keep the connection open until done with cursor
@@ -48,7 +105,7 @@ def get_transcription_cursor(limit=None, offset=0, order_by="call_id"):
     # Use server-side cursor to avoid loading all records into memory
     cursor = conn.cursor(name='transcriptions_cursor')
     
-    query = f"SELECT call_id, transcription FROM slang.transcriptions_gemini ORDER BY {order_by}"
+    query = f"SELECT call_id, {transcription_expression(agent_only)} FROM slang.transcriptions_gemini ORDER BY {order_by}"
     
     if offset > 0:
         query += f" OFFSET {offset}"
@@ -59,15 +116,248 @@ def get_transcription_cursor(limit=None, offset=0, order_by="call_id"):
     cursor.execute(query)
     return conn, cursor
 
-def get_unprocessed_transcription_cursor(limit=None, order_by="call_id"):
+def prefetch_batches(cursor, batch_size, depth=1, on_fetch=None):
+    """Yield batches from a cursor while the next batch is fetched on a background thread
+    
+    With the default depth of 1 this is double-buffered: batch N+1 is being fetched
+    while batch N is being processed, so fetch latency hides behind the processing.
+    
+    Args:
+        cursor: Cursor returned by get_transcription_cursor() or get_unprocessed_transcription_cursor()
+        batch_size (int or callable): Number of records per batch, or a callable returning it
+            before each fetch (e.g. slang_batching.AdaptiveBatchSize)
+        depth (int, optional): Number of batches fetched ahead. Default is 1.
+        on_fetch (callable, optional): Called on the fetching thread with the batch size and the
+            seconds each non-empty fetch took (e.g. AdaptiveBatchSize.record_fetch)
+        
+    Yields:
+        list: The next batch of records
+    """
+    get_batch_size = batch_size if callable(batch_size) else lambda: batch_size
+    batches = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+    
+    def put(item):
+        # Give up if the consumer went away while the queue is full
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def fetch():
+        try:
+            while not stop.is_set():
+                size = get_batch_size()
+                start = time.perf_counter()
+                batch = cursor.fetchmany(size)
+                if not batch:
+                    break
+                if on_fetch is not None:
+                    on_fetch(size, time.perf_counter() - start)
+                if not put(batch):
+                    return
+            put(done)
+        except Exception as e:
+            put(e)
+    
+    thread = threading.Thread(target=fetch, name='prefetch_batches', daemon=True)
+    thread.start()
+    
+    try:
+        while True:
+            item = batches.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stop the fetcher before the caller closes the cursor
+        stop.set()
+        thread.join()
+
+# Backslash escapes of the COPY text format
+COPY_ESCAPE = re.compile(r'\\(?:([0-7]{1,3})|x([0-9a-fA-F]{1,2})|(.))', re.DOTALL)
+COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+def _unescape_copy_match(match):
+    octal, hexadecimal, char = match.groups()
+    if octal:
+        return chr(int(octal, 8))
+    if hexadecimal:
+        return chr(int(hexadecimal, 16))
+    return COPY_ESCAPES.get(char, char)
+
+def parse_copy_field(field):
+    """Decode one field of COPY text output (None for NULL)"""
+    if field == b'\\N':
+        return None
+    value = field.decode('utf-8')
+    if '\\' in value:
+        value = COPY_ESCAPE.sub(_unescape_copy_match, value)
+    return value
+
+class _CopyStopped(Exception):
+    """Raised inside COPY to abandon it once the consumer has stopped reading"""
+
+def stream_transcriptions_copy(limit=None, order_by="call_id", chunk_size=1 << 20, agent_only=False):
+    """Stream (call_id, transcription) tuples with COPY ... TO STDOUT
+    
+    COPY ships the rows as one continuous stream instead of one round trip per fetch.
+    The stream is read on a background thread and parsed incrementally, so memory
+    stays bounded by a few chunks and parsing overlaps with the transfer.
+    
+    Args:
+        limit (int, optional): Maximum number of transcriptions to stream. Default is None (all entries).
+        order_by (str, optional): Column to order by. Default is "call_id".
+        chunk_size (int, optional): Bytes handed from the reader thread at a time. Default is 1 MiB.
+        agent_only (bool, optional): Stream only the agent lines, see transcription_expression(). Default is False.
+        
+    Yields:
+        tuple: (call_id, transcription), with call_id typed exactly as a regular cursor returns it
+    """
+    conn = get_db_connection()
+    conn.set_client_encoding('UTF8')
+    cursor = conn.cursor()
+    
+    # Convert call_id with the same typecaster psycopg2 would use for a regular query
+    cursor.execute("SELECT call_id FROM slang.transcriptions_gemini LIMIT 0")
+    type_code = cursor.description[0].type_code
+    caster = psycopg2.extensions.string_types.get(type_code)
+    
+    query = f"SELECT call_id, {transcription_expression(agent_only)} FROM slang.transcriptions_gemini ORDER BY {order_by}"
+    if limit is not None:
+        query += f" LIMIT {limit}"
+    
+    chunks = queue.Queue(maxsize=4)
+    stop = threading.Event()
+    done = object()
+    
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _CopyStopped()
+    
+    class ChunkWriter:
+        """File-like target for copy_expert that hands over data in large chunks"""
+        def __init__(self):
+            self.buffer = bytearray()
+        
+        def write(self, data):
+            self.buffer += data if isinstance(data, (bytes, bytearray)) else data.encode('utf-8')
+            if len(self.buffer) >= chunk_size:
+                self.flush()
+        
+        def flush(self):
+            if self.buffer:
+                put(bytes(self.buffer))
+                self.buffer = bytearray()
+    
+    def copy():
+        writer = ChunkWriter()
+        try:
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT", writer)
+            writer.flush()
+            put(done)
+        except _CopyStopped:
+            pass
+        except Exception as e:
+            if not stop.is_set():
+                try:
+                    put(e)
+                except _CopyStopped:
+                    pass
+    
+    thread = threading.Thread(target=copy, name='stream_transcriptions_copy', daemon=True)
+    thread.start()
+    
+    try:
+        remainder = b''
+        while True:
+            chunk = chunks.get()
+            if chunk is done:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            
+            # Rows end with a newline; newlines inside values are escaped as \n
+            lines = (remainder + chunk).split(b'\n')
+            remainder = lines.pop()
+            for line in lines:
+                raw_call_id, raw_transcription = line.split(b'\t', 1)
+                call_id = parse_copy_field(raw_call_id)
+                if caster is not None and call_id is not None:
+                    call_id = caster(call_id, cursor)
+                yield call_id, parse_copy_field(raw_transcription)
+    finally:
+        stop.set()
+        if thread.is_alive():
+            # Abandon a COPY that is still running
+            conn.cancel()
+        thread.join()
+        cursor.close()
+        conn.close()
+
+def iter_batches(rows, batch_size, on_fetch=None):
+    """Group an iterable of records into lists of batch_size records (an int, or a callable returning it)
+    
+    on_fetch, if given, is called with the batch size and the seconds spent reading each batch
+    from rows, like in prefetch_batches().
+    """
+    get_batch_size = batch_size if callable(batch_size) else lambda: batch_size
+    batch = []
+    start = time.perf_counter()
+    for row in rows:
+        batch.append(row)
+        size = get_batch_size()
+        if len(batch) >= size:
+            if on_fetch is not None:
+                on_fetch(size, time.perf_counter() - start)
+            yield batch
+            batch = []
+            start = time.perf_counter()
+    if batch:
+        if on_fetch is not None:
+            on_fetch(get_batch_size(), time.perf_counter() - start)
+        yield batch
+
+def get_missing_evaluation_condition(tables, alias='t'):
+    """Get the SQL condition matching transcriptions missing an evaluation in any of tables
+    
+    Each table is anti-joined on its (call_id, ruleset_version) key. The condition
+    takes the version as the %(ruleset_version)s parameter.
+    
+    Args:
+        tables (list): Evaluation tables of the selected criteria
+        alias (str, optional): Alias of slang.transcriptions_gemini in the query. Default is 't'.
+    """
+    return "(" + " OR ".join(
+        f"NOT EXISTS (SELECT 1 FROM {table} e WHERE e.call_id = {alias}.call_id "
+        f"AND e.ruleset_version = %(ruleset_version)s)" for table in tables) + ")"
+
+def get_unprocessed_transcription_cursor(tables, ruleset_version, limit=None, order_by="call_id", agent_only=False):
     """Get a cursor for transcriptions that haven't been processed yet
     
-    This uses a JOIN to exclude records that have already been processed,
+    This uses an anti-join to exclude records that have already been processed,
     which is much more efficient than loading all processed IDs into memory.
+    A transcription is unprocessed while any selected criterion has no evaluation
+    of it; evaluations of other ruleset versions do not count, so a new ruleset
+    re-evaluates every call.
     
     Args:
+        tables (list): Evaluation tables of the selected criteria
+        ruleset_version (str): Ruleset version the evaluations must have been written with
         limit (int, optional): Maximum number of transcriptions to fetch. Default is None (all entries).
         order_by (str, optional): Column to order by. Default is "call_id".
+        agent_only (bool, optional): Fetch only the agent lines, see transcription_expression(). Default is False.
         
     Returns:
         tuple: (connection, cursor) - Keep the connection open until done with cursor
@@ -75,19 +365,53 @@ def get_unprocessed_transcription_cursor(limit=None, order_by="call_id"):
     conn = get_db_connection()
     cursor = conn.cursor(name='unprocessed_cursor')
     
-    # This query selects transcriptions that don't have matching call_id in the evaluation table
+    # This query selects transcriptions that don't have matching call_id in an evaluation table
     query = f"""
-    SELECT t.call_id, t.transcription 
+    SELECT t.call_id, {transcription_expression(agent_only, 't')}
     FROM slang.transcriptions_gemini t
-    LEFT JOIN slang.evaluation_gemini e ON t.call_id = e.call_id
-    WHERE e.call_id IS NULL
+    WHERE {get_missing_evaluation_condition(tables)}
     ORDER BY t.{order_by}
     """
     
     if limit is not None:
         query += f" LIMIT {limit}"
         
-    cursor.execute(query)
+    cursor.execute(query, {'ruleset_version': ruleset_version})
+    return conn, cursor
+
+def get_incomplete_evaluation_cursor(table, label, ruleset_version, limit=None):
+    """Get a server-side cursor over the evaluations of a criterion written with --verdict-only
+    
+    These are the failed evaluations that stopped at their first occurrence
+    (details_complete false). Each comes with the transcription it was evaluated on,
+    or, for evaluations written with --agent-only (which store no original_transcription),
+    with the current full transcription of the call.
+    
+    Args:
+        table (str): Evaluation table of the criterion
+        label (str): Value of the criteria column for the criterion
+        ruleset_version (str): Only evaluations of this ruleset version can be completed with it
+        limit (int, optional): Maximum number of evaluations to fetch. Default is None (all of them).
+        
+    Returns:
+        tuple: (connection, cursor) of (call_id, transcription_id, transcription) rows,
+            in call_id order - Keep the connection open until done with cursor
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(name='incomplete_cursor')
+    
+    query = f"""
+    SELECT e.call_id, e.transcription_id, COALESCE(e.original_transcription, t.transcription)
+    FROM {table} e
+    LEFT JOIN slang.transcriptions_gemini t ON t.call_id = e.call_id AND e.original_transcription IS NULL
+    WHERE NOT e.details_complete AND e.criteria = %s AND e.ruleset_version = %s
+    ORDER BY e.call_id
+    """
+    
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+        
+    cursor.execute(query, (label, ruleset_version))
     return conn, cursor
 
 def get_total_transcription_count():
@@ -106,19 +430,18 @@ def get_total_transcription_count():
         cursor.close()
         conn.close()
 
-def get_unprocessed_count():
-    """Get the count of unprocessed records"""
+def get_unprocessed_count(tables, ruleset_version):
+    """Get the count of records missing an evaluation of ruleset_version in any of tables"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
     try:
-        query = """
+        query = f"""
         SELECT COUNT(*) 
         FROM slang.transcriptions_gemini t
-        LEFT JOIN slang.evaluation_gemini e ON t.call_id = e.call_id
-        WHERE e.call_id IS NULL
+        WHERE {get_missing_evaluation_condition(tables)}
         """
-        cursor.execute(query)
+        cursor.execute(query, {'ruleset_version': ruleset_version})
         count = cursor.fetchone()[0]
         return count
     except Exception as e:
@@ -128,36 +451,247 @@ def get_unprocessed_count():
         cursor.close()
         conn.close()
 
-def insert_evaluation(evaluation_data):
-    """Insert evaluation data into the evaluation_gemini table"""
+def estimate_version_rows(cursor, table, ruleset_version):
+    """Estimate the evaluations of ruleset_version in table from the planner statistics
+    
+    The row count of the table is scaled by the share of ruleset_version among the
+    most common values of its ruleset_version column.
+    
+    Returns:
+        int: Estimated number of evaluations, or None if the statistics cannot tell
+    """
+    schema, name = table.split('.', 1)
+    cursor.execute("""
+    SELECT c.reltuples::bigint, s.most_common_vals::text::text[], s.most_common_freqs
+    FROM pg_class c
+    LEFT JOIN pg_stats s ON s.schemaname = %s AND s.tablename = %s AND s.attname = 'ruleset_version'
+    WHERE c.oid = %s::regclass
+    """, (schema, name, table))
+    rows, values, frequencies = cursor.fetchone()
+    
+    # reltuples is -1 (or 0 on older servers) until the table is first analyzed
+    if rows is None or rows < 0:
+        return None
+    if rows == 0:
+        return 0
+    if not values:
+        return None
+    if ruleset_version in values:
+        return int(rows * frequencies[values.index(ruleset_version)])
+    # A version missing from the list is only known to be absent when the list covers every row
+    return 0 if sum(frequencies) >= 0.99 else None
+
+def get_estimated_counts(tables=(), ruleset_version=None):
+    """Get planner estimates of the total and unprocessed record counts
+    
+    Reads the statistics the planner keeps in pg_class and pg_stats instead of
+    scanning the tables, so it returns in milliseconds on any table size. Like
+    get_unprocessed_count(), a record is unprocessed when it misses an evaluation
+    of ruleset_version in any of tables (see estimate_version_rows()).
+    
+    Args:
+        tables (list): Evaluation tables of the selected criteria
+        ruleset_version (str): Version the evaluations are stored under
+    
+    Returns:
+        tuple: (estimated total, estimated unprocessed). The total is None if the table was never
+            analyzed, the unprocessed count also if the statistics do not know ruleset_version.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = 'slang.transcriptions_gemini'::regclass")
+        total = cursor.fetchone()[0]
+        if total is None or total < 0:
+            return None, None
+        if not tables or ruleset_version is None:
+            return total, None
+        
+        # Calls evaluated in one table may still miss another, so the most incomplete table counts
+        unprocessed = 0
+        for table in tables:
+            evaluated = estimate_version_rows(cursor, table, ruleset_version)
+            if evaluated is None:
+                return total, None
+            unprocessed = max(unprocessed, total - evaluated)
+        return total, int(unprocessed)
+    except Exception as e:
+        print(f"Error getting estimated counts: {e}")
+        return None, None
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_call_id_histogram():
+    """Get the planner's histogram of transcriptions_gemini.call_id
+    
+    The bounds split the table into buckets holding roughly the same number of rows,
+    so the position of a call_id in them estimates how far through the table it is.
+    
+    Returns:
+        list: Sorted bucket bounds, or None if no numeric histogram is available
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    insert_query = """
-    INSERT INTO slang.evaluation_gemini (
-        transcription_id, call_id, intern_ai_grade, score, max_score, 
-        criteria, passed, explanation, improvement_suggestion, 
-        found_references, context, original_transcription
-    ) VALUES (
-        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-    )
-    """
-    
-    cursor.execute(insert_query, (
-        evaluation_data['transcription_id'],
-        evaluation_data['call_id'],
-        evaluation_data['intern_ai_grade'],
-        evaluation_data['score'],
-        evaluation_data['max_score'],
-        evaluation_data['criteria'],
-        evaluation_data['passed'],
-        evaluation_data['explanation'],
-        evaluation_data['improvement_suggestion'],
-        json.dumps(evaluation_data['found_references']),
-        evaluation_data['context'],
-        evaluation_data['original_transcription']
-    ))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
\ No newline at end of file
+    try:
+        cursor.execute("""
+        SELECT histogram_bounds::text
+        FROM pg_stats
+        WHERE schemaname = 'slang' AND tablename = 'transcriptions_gemini' AND attname = 'call_id'
+        """)
+        row = cursor.fetchone()
+        if not row or not row[0]:
+            return None
+        bounds = [float(value) for value in row[0].strip('{}').split(',')]
+        return bounds if len(bounds) > 1 else None
+    except Exception:
+        # Non-numeric call_ids have no usable histogram for progress estimation
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+# Columns written for every evaluation, in the order the values are built
+EVALUATION_COLUMNS = [
+    'transcription_id', 'call_id', 'ruleset_version', 'intern_ai_grade', 'score', 'max_score',
+    'criteria', 'passed', 'explanation', 'improvement_suggestion',
+    'found_references', 'context', 'original_transcription', 'details_complete'
+]
+
+def get_call_id_type(table='slang.transcriptions_gemini'):
+    """Get the SQL type of a table's call_id column, e.g. 'bigint'"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attname = 'call_id'
+        """, (table,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+# Columns of slang.slang_occurrences, in the order the values are built
+OCCURRENCE_COLUMNS = [
+    'call_id', 'ruleset_version', 'criterion', 'word', 'line_index',
+    'timestamp_seconds', 'start_offset', 'end_offset', 'verified'
+]
+
+def write_occurrences(cursor, occurrences):
+    """Replace the occurrences of a batch of evaluations, in the caller's transaction
+    
+    Args:
+        cursor: Cursor of the transaction the evaluations are written in
+        occurrences (dict): (call_id, ruleset_version, criterion) -> list of occurrence dicts
+    """
+    # Stable order, so concurrent writers cannot deadlock
+    keys = sorted(occurrences, key=lambda key: (str(key[0]), key[1], key[2]))
+    execute_values(cursor, """
+    DELETE FROM slang.slang_occurrences o
+    USING (VALUES %s) AS k(call_id, ruleset_version, criterion)
+    WHERE o.call_id = k.call_id AND o.ruleset_version = k.ruleset_version AND o.criterion = k.criterion
+    """, keys)
+    
+    values = [
+        (call_id, ruleset_version, criterion, occurrence['word'], occurrence['line_index'],
+         occurrence['timestamp_seconds'], occurrence['start_offset'], occurrence['end_offset'],
+         occurrence['verified'])
+        for call_id, ruleset_version, criterion in keys
+        for occurrence in occurrences[(call_id, ruleset_version, criterion)]
+    ]
+    if values:
+        execute_values(cursor, f"""
+        INSERT INTO slang.slang_occurrences ({', '.join(OCCURRENCE_COLUMNS)})
+        VALUES %s
+        """, values, page_size=1000)
+
+def insert_evaluation(evaluation_data):
+    """Insert or replace evaluation data in the evaluation_gemini table"""
+    insert_evaluations([('slang.evaluation_gemini', evaluation_data)])
+
+def insert_evaluations(rows, conn=None):
+    """Upsert a batch of evaluations in a single transaction
+    
+    Evaluations are keyed on (call_id, ruleset_version): re-evaluating a call with the
+    same ruleset replaces its row (keeping its transcription_id) instead of adding one,
+    so reruns are safe to repeat and concurrent reruns cannot double-write.
+    The structured occurrences of each evaluation replace its previous ones in
+    slang.slang_occurrences, and the rollup tables are updated by the difference,
+    all in the same transaction.
+    The tables need the key created by `python slang_schema.py --apply`.
+    
+    Args:
+        rows (list): (table, evaluation_data) tuples, e.g. one per criterion per call
+        conn (optional): Open connection to use. Default is a new connection, closed afterwards.
+    """
+    if not rows:
+        return
+    
+    # Group the rows by target table so each table gets one multi-row upsert.
+    # A key may only appear once per statement, so the last evaluation of a call wins.
+    by_table = {}
+    for table, evaluation_data in rows:
+        key = (evaluation_data['call_id'], evaluation_data['ruleset_version'])
+        by_table.setdefault(table, {})[key] = (
+            evaluation_data['transcription_id'],
+            evaluation_data['call_id'],
+            evaluation_data['ruleset_version'],
+            evaluation_data['intern_ai_grade'],
+            evaluation_data['score'],
+            evaluation_data['max_score'],
+            evaluation_data['criteria'],
+            evaluation_data['passed'],
+            evaluation_data['explanation'],
+            evaluation_data['improvement_suggestion'],
+            json.dumps(evaluation_data['found_references']),
+            evaluation_data['context'],
+            evaluation_data['original_transcription'],
+            evaluation_data.get('details_complete', True)
+        )
+    
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in EVALUATION_COLUMNS
+                        if column not in ('transcription_id', 'call_id', 'ruleset_version'))
+    updates += ", evaluated_at = now()"
+    
+    # Structured occurrences replace those of the same (call_id, ruleset_version, criterion).
+    # Evaluations that stopped at their first occurrence (--verdict-only) keep none, so
+    # per-word analytics only count calls whose every occurrence is known.
+    occurrences = {}
+    for table, evaluation_data in rows:
+        if 'occurrences' in evaluation_data:
+            key = (evaluation_data['call_id'], evaluation_data['ruleset_version'], evaluation_data['criterion'])
+            occurrences[key] = evaluation_data['occurrences'] if evaluation_data.get('details_complete', True) else []
+    
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # The rollups need what the replaced evaluations contributed, so they are read first
+        daily, words = compute_rollup_deltas(cursor, rows)
+        
+        for table, values in by_table.items():
+            # Lock rows in a stable order so concurrent reruns cannot deadlock
+            values = [values[key] for key in sorted(values, key=lambda key: (str(key[0]), key[1]))]
+            execute_values(cursor, f"""
+            INSERT INTO {table} ({', '.join(EVALUATION_COLUMNS)})
+            VALUES %s
+            ON CONFLICT (call_id, ruleset_version) DO UPDATE SET {updates}
+            """, values)
+        if occurrences:
+            write_occurrences(cursor, occurrences)
+        apply_rollup_deltas(cursor, daily, words)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
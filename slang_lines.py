@@ -0,0 +1,27 @@
+# Agent line splitting, shared by the evaluator (through slang_common) and
+# data_transfer/json_to_database.py, which must not load the ruleset to use it
+
+def extract_agent_lines(transcription):
+    """Extract only the lines spoken by the agent from the transcription"""
+    agent_lines = []
+    
+    # Regular expression to match lines containing "AGENT:" (with or without timestamp)
+    for line in transcription.split('\n'):
+        if 'AGENT:' in line.strip():
+            agent_lines.append(line.strip())
+    
+    return agent_lines
+
+def agent_only_transcription(transcription):
+    """
+    Keep only the agent lines of a transcription, as stored in agent_transcription at ingest
+    
+    Every criterion only looks at agent lines, so evaluating the result gives the same
+    verdicts, references and occurrences as evaluating the full transcription.
+    
+    Returns:
+        str: The agent lines joined by newlines (None for a missing transcription)
+    """
+    if transcription is None:
+        return None
+    return '\n'.join(extract_agent_lines(transcription))
@@ -0,0 +1,74 @@
+import re
+
+# Runs of word characters, i.e. the spans delimited by \b in the original per-word patterns
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+class SlangMatcher:
+    """Match a whole vocabulary of slang words in a single scan of each line
+
+    Every word is matched with the same semantics as the per-word pattern
+    r'\\b' + re.escape(word) + r'\\b' run through re.finditer, so the results are
+    identical to scanning the line once per word, only the line is scanned once.
+
+    Words are indexed by their first token, so matching costs one hash lookup per
+    token of the line no matter how large the vocabulary is. The matcher only holds
+    plain dicts and lists, which keeps it cheap to store as JSON and load.
+    """
+
+    def __init__(self, words):
+        # Unique words, keeping the order they were given in
+        self.words = list(dict.fromkeys(words))
+
+        # First token of each word -> words starting with it, longest first
+        self.by_first_token = {}
+        for word in self.words:
+            first = TOKEN_PATTERN.match(word)
+            if first is None or not TOKEN_PATTERN.fullmatch(word[-1]):
+                raise ValueError(f"Slang word must start and end with a letter or digit: '{word}'")
+            self.by_first_token.setdefault(first.group(), []).append(word)
+        for candidates in self.by_first_token.values():
+            candidates.sort(key=len, reverse=True)
+
+    def to_dict(self):
+        """Get the compiled matcher as JSON-serializable data (see from_dict)"""
+        return {'kind': 'exact', 'words': self.words, 'by_first_token': self.by_first_token}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a matcher from to_dict() data without compiling it again"""
+        matcher = cls.__new__(cls)
+        matcher.words = [str(word) for word in data['words']]
+        matcher.by_first_token = {str(token): [str(word) for word in words]
+                                  for token, words in data['by_first_token'].items()}
+        return matcher
+
+    def finditer(self, text):
+        """Yield (word, start, end) for every match in text, ordered by position
+
+        Matches of the same word never overlap, exactly like re.finditer.
+        """
+        by_first_token = self.by_first_token
+        last_end = {}
+        for token in TOKEN_PATTERN.finditer(text):
+            candidates = by_first_token.get(token.group())
+            if candidates is None:
+                continue
+
+            start = token.start()
+            for word in candidates:
+                end = start + len(word)
+                if not text.startswith(word, start):
+                    continue
+                # The word has to end on a word boundary, like the trailing \b
+                if end < len(text) and TOKEN_PATTERN.match(text, end, end + 1):
+                    continue
+                if start < last_end.get(word, 0):
+                    continue
+                last_end[word] = end
+                yield word, start, end
+
+
+def compile_matcher(words):
+    """Build a SlangMatcher for the given list of words"""
+    return SlangMatcher(words)
@@ -0,0 +1,259 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Stage that is active whenever no other stage is (setup, logging, the loop itself)
+BASE_STAGE = 'other'
+
+def frame_name(code):
+    """Name of a frame in collapsed stacks: 'function (file.py:line)'"""
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def format_bytes(size):
+    """Format a number of bytes as KiB/MiB"""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MiB"
+    return f"{size / 1024:.1f} KiB"
+
+class StageProfiler:
+    """Profile a run split by pipeline stage (fetch, evaluate, whisper, write, ...)
+
+    Each stage has its own cProfile profiler, enabled only while the stage runs on
+    the main thread, so the pstats of a stage only hold what that stage did. Stages
+    may nest: the time of an inner stage is not counted in the outer one.
+
+    Alongside, a sampling thread records the main thread's stack every interval
+    seconds, rooted at the active stage, for collapsed-stack (flamegraph) output.
+    With memory, tracemalloc tracks the peak traced memory of each stage and a
+    snapshot of the largest allocations is written at the end.
+
+    Written by stop(), for an output prefix of 'profile':
+        profile.pstats             every stage combined
+        profile.<stage>.pstats     one file per stage
+        profile.collapsed          sampled stacks, one 'frame;frame;... count' line each
+        profile.memory.txt         top allocations and per-stage peaks (with memory)
+    """
+
+    def __init__(self, output_prefix='profile', interval=0.005, memory=False):
+        """
+        Args:
+            output_prefix (str): Path prefix of the output files
+            interval (float): Seconds between stack samples
+            memory (bool): Trace memory allocations with tracemalloc (slows the run down noticeably)
+        """
+        self.output_prefix = output_prefix
+        self.interval = interval
+        self.memory = memory
+        self.stages = {}
+        self.stack = []
+        self.samples = Counter()
+        self.thread_id = threading.get_ident()
+        self.sampler = None
+        self.stopping = threading.Event()
+        self.segment_start = None
+        self.start_time = None
+
+    def _stage(self, name):
+        """Get the counters of a stage, creating them on first use"""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {'profile': cProfile.Profile(), 'calls': 0, 'seconds': 0.0, 'peak_memory': 0}
+        return stage
+
+    def _pause(self):
+        """Stop charging the active stage"""
+        stage = self.stages[self.stack[-1]]
+        stage['profile'].disable()
+        stage['seconds'] += time.perf_counter() - self.segment_start
+        if self.memory:
+            stage['peak_memory'] = max(stage['peak_memory'], tracemalloc.get_traced_memory()[1])
+
+    def _resume(self):
+        """Start charging the active stage"""
+        if self.memory:
+            tracemalloc.reset_peak()
+        self.segment_start = time.perf_counter()
+        self.stages[self.stack[-1]]['profile'].enable()
+
+    def start(self):
+        """Start profiling in the base stage"""
+        if self.memory:
+            tracemalloc.start()
+        self.start_time = time.perf_counter()
+        self.stack.append(BASE_STAGE)
+        self._stage(BASE_STAGE)['calls'] += 1
+        self._resume()
+
+        self.sampler = threading.Thread(target=self._sample, name='stage-profiler-sampler', daemon=True)
+        self.sampler.start()
+
+    @contextmanager
+    def stage(self, name):
+        """Charge everything run inside the block to a stage (only on the thread that started the profiler)"""
+        if not self.stack or threading.get_ident() != self.thread_id:
+            yield
+            return
+
+        self._pause()
+        self.stack.append(name)
+        self._stage(name)['calls'] += 1
+        self._resume()
+        try:
+            yield
+        finally:
+            self._pause()
+            self.stack.pop()
+            self._resume()
+
+    def wrap(self, name, func):
+        """Wrap a callable so every call runs in a stage"""
+        def staged(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return staged
+
+    def iterate(self, name, iterable):
+        """Iterate, charging the production of every item to a stage (e.g. fetching from a cursor)"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def _sample(self):
+        """Sampling thread: count the main thread's stack, rooted at the active stage"""
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            try:
+                stage = self.stack[-1]
+            except IndexError:
+                continue
+            if frame is None:
+                continue
+
+            frames = []
+            while frame is not None:
+                frames.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            frames.append(stage)
+            self.samples[';'.join(reversed(frames))] += 1
+
+    def stop(self):
+        """Stop profiling, write the output files and print a per-stage summary"""
+        if not self.stack:
+            return
+        self._pause()
+        self.stack.clear()
+        elapsed = time.perf_counter() - self.start_time
+
+        self.stopping.set()
+        self.sampler.join()
+
+        snapshot = None
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        written = self.write_stats() + self.write_collapsed()
+        if snapshot is not None:
+            written.append(self.write_memory(snapshot))
+        self.print_summary(elapsed)
+        print(f"Profile written to: {', '.join(written)}")
+
+    def write_stats(self):
+        """Write the pstats of each stage and of the whole run, returning the paths written"""
+        written = []
+        combined = None
+        for name, stage in self.stages.items():
+            stats = pstats.Stats(stage['profile'])
+            if not stats.stats:
+                continue
+            path = f"{self.output_prefix}.{name}.pstats"
+            stats.dump_stats(path)
+            written.append(path)
+            if combined is None:
+                combined = stats
+            else:
+                combined.add(stats)
+
+        if combined is not None:
+            path = f"{self.output_prefix}.pstats"
+            combined.dump_stats(path)
+            written.insert(0, path)
+        return written
+
+    def write_collapsed(self):
+        """Write the sampled stacks in collapsed format (flamegraph.pl, speedscope), returning the paths written"""
+        path = f"{self.output_prefix}.collapsed"
+        with open(path, 'w') as file:
+            for stack, count in sorted(self.samples.items()):
+                file.write(f"{stack} {count}\n")
+        return [path]
+
+    def write_memory(self, snapshot, limit=25):
+        """Write the largest allocations still alive at the end and the peak of each stage"""
+        path = f"{self.output_prefix}.memory.txt"
+        with open(path, 'w') as file:
+            file.write("Peak traced memory by stage:\n")
+            for name, stage in self.stages.items():
+                file.write(f"  {name}: {format_bytes(stage['peak_memory'])}\n")
+
+            file.write(f"\nTop {limit} allocation sites still alive at the end of the run:\n")
+            for statistic in snapshot.statistics('lineno')[:limit]:
+                file.write(f"  {statistic}\n")
+        return path
+
+    def print_summary(self, elapsed):
+        """Print the time (excluding nested stages), calls and memory peak of each stage"""
+        print("\n" + "="*60)
+        print(f"PROFILE ({elapsed:.2f}s wall, {sum(self.samples.values())} stack samples):")
+        for name, stage in sorted(self.stages.items(), key=lambda item: -item[1]['seconds']):
+            share = stage['seconds'] / elapsed * 100 if elapsed > 0 else 0.0
+            line = f"  {name:<10} {stage['seconds']:9.3f}s {share:5.1f}%  {stage['calls']} call(s)"
+            if self.memory:
+                line += f", peak {format_bytes(stage['peak_memory'])}"
+            print(line)
+        print("="*60)
+
+class NullProfiler:
+    """Stand-in for StageProfiler when profiling is off: every stage is a no-op"""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stage(self, name):
+        return nullcontext()
+
+    def wrap(self, name, func):
+        return func
+
+    def iterate(self, name, iterable):
+        return iterable
+
+def add_profile_arguments(parser):
+    """Add the --profile options to a script's argument parser"""
+    parser.add_argument('--profile', nargs='?', const='profile', metavar='PREFIX',
+                        help='Profile the run by stage and write PREFIX.pstats, PREFIX.<stage>.pstats '
+                             'and PREFIX.collapsed (default prefix: profile)')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='With --profile, also trace memory with tracemalloc and write PREFIX.memory.txt')
+    parser.add_argument('--profile-interval', type=float, default=5,
+                        help='With --profile, milliseconds between stack samples (default: 5)')
+
+def create_profiler(args):
+    """Create the profiler selected by the --profile options"""
+    if not args.profile:
+        return NullProfiler()
+    return StageProfiler(args.profile, interval=args.profile_interval / 1000, memory=args.profile_memory)
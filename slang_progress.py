@@ -0,0 +1,102 @@
+import time
+from bisect import bisect_right
+
+def format_duration(seconds):
+    """Format a number of seconds as H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def histogram_fraction(bounds, value):
+    """Estimate the fraction of rows ordered before value from equi-depth histogram bounds"""
+    if value <= bounds[0]:
+        return 0.0
+    if value >= bounds[-1]:
+        return 1.0
+
+    bucket = bisect_right(bounds, value) - 1
+    low, high = bounds[bucket], bounds[bucket + 1]
+    within = (value - low) / (high - low) if high > low else 1.0
+    return (bucket + within) / (len(bounds) - 1)
+
+class ProgressTracker:
+    """Track progress and estimate the time left in a run
+
+    Starts from a cheap estimate of the total (a planner estimate, the --limit
+    target or an exact count) and refines it as records are processed: since
+    records are processed in call_id order, the position of the last call_id in
+    the planner's call_id histogram tells how far through the table the run is.
+    """
+
+    def __init__(self, total=None, exact=False, target=None, histogram=None):
+        """
+        Args:
+            total (int, optional): Exact or estimated number of records to process
+            exact (bool): Whether total is an exact count
+            target (int, optional): Number of records the run stops at (--limit/--test)
+            histogram (list, optional): call_id histogram bounds from get_call_id_histogram()
+        """
+        self.total = total
+        self.exact = exact
+        self.target = target
+        self.histogram = histogram
+        self.processed = 0
+        self.last_call_id = None
+        self.start = time.perf_counter()
+        self.finished = False
+
+    def update(self, processed, last_call_id=None):
+        """Record how many records have been processed so far and the last call_id seen"""
+        self.processed = processed
+        if last_call_id is not None:
+            self.last_call_id = last_call_id
+
+    def finish(self):
+        """Mark the run as finished: the number processed is now the exact total"""
+        self.finished = True
+        self.total = self.processed
+        self.exact = True
+
+    def estimated_total(self):
+        """Current best estimate of the number of records the run will process"""
+        if self.finished or self.exact:
+            total = self.total
+        else:
+            total = self.total
+            fraction = self._table_fraction()
+            # Only trust the extrapolation once the run is far enough into the table
+            if fraction is not None and fraction >= 0.05:
+                total = int(self.processed / fraction)
+            if total is not None:
+                total = max(total, self.processed)
+
+        if self.target is not None:
+            total = min(total, self.target) if total is not None else self.target
+        return total
+
+    def _table_fraction(self):
+        """Estimated fraction of the table (in call_id order) the run has passed"""
+        if not self.histogram or self.last_call_id is None:
+            return None
+        try:
+            return histogram_fraction(self.histogram, float(self.last_call_id))
+        except (TypeError, ValueError):
+            return None
+
+    def rate(self):
+        """Records processed per second so far"""
+        elapsed = time.perf_counter() - self.start
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def describe(self):
+        """One-line progress summary with rate and ETA"""
+        total = self.estimated_total()
+        rate = self.rate()
+        approx = "" if (self.exact or self.target is not None) else "~"
+
+        text = f"Progress: {self.processed}"
+        if total:
+            text += f"/{approx}{total} ({self.processed / total * 100:.1f}%)"
+        text += f", {rate:.1f} records/s"
+        if total and rate > 0:
+            text += f", ETA {approx}{format_duration(max(0, total - self.processed) / rate)}"
+        return text
@@ -0,0 +1,182 @@
+import json
+import argparse
+from slang_common import RULESET_VERSION
+from slang_criteria import CRITERIA
+from slang_helper import get_db_connection
+from slang_rollups import UNDATED
+
+PERIODS = ('day', 'week', 'month')
+
+def get_trend(cursor, criterion, ruleset_version, days, period='day'):
+    """
+    Get the evaluations and passes of a criterion per period from slang.rollup_daily
+
+    Returns:
+        list: (period start, evaluations, passed, incomplete) tuples, oldest first
+    """
+    cursor.execute("""
+    SELECT date_trunc(%s, day)::date AS period, sum(evaluations)::int, sum(passed)::int, sum(incomplete)::int
+    FROM slang.rollup_daily
+    WHERE criterion = %s AND ruleset_version = %s AND day > current_date - %s AND day <> %s
+    GROUP BY 1
+    HAVING sum(evaluations) > 0
+    ORDER BY 1
+    """, (period, criterion, ruleset_version, days, UNDATED))
+    return cursor.fetchall()
+
+def get_undated_totals(cursor, criterion, ruleset_version):
+    """
+    Get the evaluations and passes of a criterion written before evaluated_at existed
+
+    Their write day is unknown (see slang_rollups.UNDATED), so they are in no period.
+
+    Returns:
+        tuple: (evaluations, passed)
+    """
+    cursor.execute("""
+    SELECT COALESCE(sum(evaluations), 0)::int, COALESCE(sum(passed), 0)::int
+    FROM slang.rollup_daily
+    WHERE criterion = %s AND ruleset_version = %s AND day = %s
+    """, (criterion, ruleset_version, UNDATED))
+    return cursor.fetchone()
+
+def get_top_words(cursor, criterion, ruleset_version, days, limit=20):
+    """
+    Get the words of a criterion used in the most calls, from slang.rollup_word_daily
+
+    Returns:
+        list: (word, calls, occurrences) tuples, most used first
+    """
+    cursor.execute("""
+    SELECT word, sum(calls)::int, sum(occurrences)::int
+    FROM slang.rollup_word_daily
+    WHERE criterion = %s AND ruleset_version = %s AND day > current_date - %s AND day <> %s
+    GROUP BY word
+    HAVING sum(calls) > 0
+    ORDER BY 2 DESC, 3 DESC, word
+    LIMIT %s
+    """, (criterion, ruleset_version, days, UNDATED, limit))
+    return cursor.fetchall()
+
+def build_report(criteria, ruleset_version=RULESET_VERSION, days=30, period='day', words=20):
+    """
+    Build the pass rate, trend and word report of some criteria from the rollup tables
+
+    Only the rollups are read, so the report costs the same however many evaluations
+    there are. Days are the days the evaluations were last written; evaluations written
+    before that was recorded are only counted apart, under 'before_rollups'.
+
+    Args:
+        criteria (list): Criterion names
+        ruleset_version (str): Ruleset version to report on
+        days (int): Number of days to report, today included
+        period (str): Trend granularity: 'day', 'week' or 'month'
+        words (int): Number of top words per criterion
+
+    Returns:
+        dict: Per criterion, the totals, the trend per period, the top words and the
+            evaluations without a write day
+    """
+    report = {'ruleset_version': ruleset_version, 'days': days, 'period': period, 'criteria': {}}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        for name in criteria:
+            trend = get_trend(cursor, name, ruleset_version, days, period)
+            evaluations = sum(row[1] for row in trend)
+            passed = sum(row[2] for row in trend)
+            incomplete = sum(row[3] for row in trend)
+            undated, undated_passed = get_undated_totals(cursor, name, ruleset_version)
+            report['criteria'][name] = {
+                'evaluations': evaluations,
+                'passed': passed,
+                'pass_rate': passed / evaluations if evaluations else None,
+                # Failed calls evaluated with --verdict-only, which are missing from the word counts
+                'incomplete': incomplete,
+                'trend': [{'period': start.isoformat(), 'evaluations': count, 'passed': passes,
+                           'pass_rate': passes / count} for start, count, passes, _ in trend],
+                'words': [{'word': word, 'calls': calls, 'occurrences': occurrences,
+                           'call_rate': calls / evaluations if evaluations else None}
+                          for word, calls, occurrences in get_top_words(cursor, name, ruleset_version, days, words)],
+                'before_rollups': {'evaluations': undated, 'passed': undated_passed},
+            }
+    finally:
+        cursor.close()
+        conn.close()
+    return report
+
+def print_report(report):
+    """Print a report built by build_report()"""
+    print(f"Last {report['days']} day(s), ruleset version {report['ruleset_version']}, "
+          f"by evaluation write day")
+
+    for name, data in report['criteria'].items():
+        print(f"\n{CRITERIA[name]['label']}")
+        before = data['before_rollups']
+        if before['evaluations']:
+            print(f"  Before rollups: {before['passed']} of {before['evaluations']} calls passed "
+                  f"(written before write days were recorded, so in no period below)")
+        if not data['evaluations']:
+            print("  No evaluations in the period" +
+                  ("" if before['evaluations'] else " (run with --rebuild if evaluations predate the rollups)"))
+            continue
+        print(f"  Pass rate: {data['pass_rate'] * 100:.1f}% ({data['passed']} of {data['evaluations']} calls)")
+        if data['incomplete']:
+            print(f"  Incomplete: {data['incomplete']} failed call(s) evaluated with --verdict-only are not in the "
+                  f"word counts (complete them with --expand-details)")
+
+        print(f"\n  {'Per ' + report['period']:<12} {'Calls':>8} {'Passed':>8} {'Pass rate':>10}")
+        for row in data['trend']:
+            print(f"  {row['period']:<12} {row['evaluations']:>8} {row['passed']:>8} {row['pass_rate'] * 100:>9.1f}%")
+
+        if data['words']:
+            print(f"\n  {'Word':<16} {'Calls':>8} {'% calls':>8} {'Occurrences':>12}")
+            for row in data['words']:
+                print(f"  {row['word']!r:<16} {row['calls']:>8} {row['call_rate'] * 100:>7.1f}% {row['occurrences']:>12}")
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Report pass rates, word counts and trends of the evaluations from the rollup tables')
+    parser.add_argument('--criteria', nargs='+', default=['slang'], choices=list(CRITERIA),
+                        help='Criteria to report on (default: slang)')
+    parser.add_argument('--ruleset-version', default=RULESET_VERSION,
+                        help=f'Ruleset version to report on (default: {RULESET_VERSION}; '
+                             f'evaluations of --verification-mode occurrence are under {RULESET_VERSION}+occ)')
+    parser.add_argument('--days', type=int, default=30,
+                        help='Number of days to report, today included (default: 30)')
+    parser.add_argument('--by', choices=PERIODS, default='day',
+                        help='Trend granularity (default: day)')
+    parser.add_argument('--words', type=int, default=20,
+                        help='Number of top words to show per criterion (default: 20)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the report as JSON')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Recompute the rollups of the criteria from the evaluation tables first '
+                             '(once after upgrading, or to repair them; scans the evaluation tables)')
+    return parser.parse_args()
+
+def main():
+    """Print the report, rebuilding the rollups first if asked"""
+    args = parse_arguments()
+
+    if args.rebuild:
+        from slang_schema import require_schema
+        from slang_rollups import rebuild_rollups
+        require_schema(list(dict.fromkeys(CRITERIA[name]['table'] for name in args.criteria)))
+        conn = get_db_connection()
+        try:
+            rebuild_rollups(conn, {name: CRITERIA[name] for name in args.criteria})
+        finally:
+            conn.close()
+        print(f"INFO: Rebuilt the rollups of {', '.join(args.criteria)}")
+
+    report = build_report(args.criteria, args.ruleset_version, args.days, args.by, args.words)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
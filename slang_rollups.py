@@ -0,0 +1,211 @@
+import random
+from datetime import date
+from collections import Counter
+from psycopg2.extras import execute_values
+
+# Rollup day of the evaluations written before evaluated_at existed, whose write day is unknown.
+# Reports show them apart, as before the rollups, and never in a trend.
+UNDATED = date.min
+
+# Shards of each rollup key (see the shard column of the rollup tables): every write
+# transaction adds its deltas to one shard picked at random, so concurrent writers
+# rarely wait on each other for today's rows
+ROLLUP_SHARDS = 16
+
+def evaluation_rollup_keys(rows):
+    """
+    Get the evaluations of a write batch that count in the rollups, the last one per key
+
+    Args:
+        rows (list): (table, evaluation_data) tuples, as given to insert_evaluations()
+
+    Returns:
+        dict: (table, call_id, ruleset_version) -> evaluation_data
+    """
+    evaluations = {}
+    for table, evaluation_data in rows:
+        # Evaluations built outside the engine may not name their criterion
+        if 'criterion' in evaluation_data:
+            evaluations[(table, evaluation_data['call_id'], evaluation_data['ruleset_version'])] = evaluation_data
+    return evaluations
+
+def compute_rollup_deltas(cursor, rows):
+    """
+    Compute how a batch of evaluations changes the rollups, before it is written
+
+    Each evaluation adds itself to today's rollups and removes the evaluation it replaces
+    (if any) from the day that one was written. Every (table, call_id, ruleset_version)
+    key is first taken with a transaction-level advisory lock, whether its evaluation
+    exists yet or not, so concurrent writers of the same calls are serialized: the second
+    one sees and subtracts what the first wrote. Must be called in the write transaction,
+    before the evaluations and occurrences are replaced.
+    Evaluations without all their details (written with --verdict-only) count as
+    incomplete instead of adding words, since they stopped at their first occurrence.
+
+    Returns:
+        tuple: (daily, words) Counters of (evaluations, passed, incomplete) and (calls, occurrences)
+            deltas, keyed like slang.rollup_daily and slang.rollup_word_daily
+    """
+    daily = Counter()
+    words = Counter()
+    evaluations = evaluation_rollup_keys(rows)
+    if not evaluations:
+        return daily, words
+
+    # Row locks alone would miss new calls: two writers would both find nothing to
+    # subtract and both add the call. The locks are taken in key order, in one statement,
+    # so concurrent batches cannot deadlock.
+    keys = [(table, str(call_id), ruleset_version) for table, call_id, ruleset_version in evaluations]
+    execute_values(cursor, """
+    SELECT pg_advisory_xact_lock(k.table_key, k.call_key)
+    FROM (
+        SELECT DISTINCT hashtext(v.tbl) AS table_key, hashtext(v.call_id || ':' || v.ruleset_version) AS call_key
+        FROM (VALUES %s) AS v(tbl, call_id, ruleset_version)
+        ORDER BY 1, 2
+    ) k
+    """, keys, page_size=len(keys), fetch=True)
+
+    cursor.execute("SELECT current_date")
+    today = cursor.fetchone()[0]
+
+    by_table = {}
+    for table, call_id, ruleset_version in evaluations:
+        by_table.setdefault(table, []).append((call_id, ruleset_version))
+
+    # What the replaced evaluations contributed, on the day they were written
+    previous_days = {}
+    for table, keys in by_table.items():
+        keys.sort(key=lambda key: (str(key[0]), key[1]))
+        previous = execute_values(cursor, f"""
+        SELECT e.call_id, e.ruleset_version, e.passed, COALESCE(e.evaluated_at::date, DATE '{UNDATED}'),
+               e.details_complete
+        FROM {table} e
+        JOIN (VALUES %s) AS k(call_id, ruleset_version)
+          ON e.call_id = k.call_id AND e.ruleset_version = k.ruleset_version
+        ORDER BY e.call_id
+        FOR UPDATE OF e
+        """, keys, fetch=True)
+        for call_id, ruleset_version, passed, day, details_complete in previous:
+            criterion = evaluations[(table, call_id, ruleset_version)]['criterion']
+            daily[(day, criterion, ruleset_version, 'evaluations')] -= 1
+            daily[(day, criterion, ruleset_version, 'passed')] -= 1 if passed else 0
+            if details_complete:
+                previous_days[(call_id, ruleset_version, criterion)] = day
+            else:
+                daily[(day, criterion, ruleset_version, 'incomplete')] -= 1
+
+    if previous_days:
+        previous = execute_values(cursor, """
+        SELECT o.call_id, o.ruleset_version, o.criterion, o.word, count(*)
+        FROM slang.slang_occurrences o
+        JOIN (VALUES %s) AS k(call_id, ruleset_version, criterion)
+          ON o.call_id = k.call_id AND o.ruleset_version = k.ruleset_version AND o.criterion = k.criterion
+        GROUP BY 1, 2, 3, 4
+        """, list(previous_days), fetch=True)
+        for call_id, ruleset_version, criterion, word, count in previous:
+            day = previous_days[(call_id, ruleset_version, criterion)]
+            words[(day, criterion, ruleset_version, word, 'calls')] -= 1
+            words[(day, criterion, ruleset_version, word, 'occurrences')] -= count
+
+    for evaluation_data in evaluations.values():
+        criterion = evaluation_data['criterion']
+        ruleset_version = evaluation_data['ruleset_version']
+        daily[(today, criterion, ruleset_version, 'evaluations')] += 1
+        daily[(today, criterion, ruleset_version, 'passed')] += 1 if evaluation_data['passed'] else 0
+        if not evaluation_data.get('details_complete', True):
+            daily[(today, criterion, ruleset_version, 'incomplete')] += 1
+            continue
+
+        for word, count in Counter(occurrence['word'] for occurrence in evaluation_data.get('occurrences', ())).items():
+            words[(today, criterion, ruleset_version, word, 'calls')] += 1
+            words[(today, criterion, ruleset_version, word, 'occurrences')] += count
+
+    return daily, words
+
+def apply_rollup_deltas(cursor, daily, words, shard=None):
+    """
+    Add the deltas of compute_rollup_deltas() to the rollup tables, in the caller's transaction
+
+    Args:
+        shard (int, optional): Shard to add them to. Default is a random one of ROLLUP_SHARDS.
+    """
+    if shard is None:
+        shard = random.randrange(ROLLUP_SHARDS)
+    daily_values = {}
+    for (day, criterion, ruleset_version, field), delta in daily.items():
+        daily_values.setdefault((day, criterion, ruleset_version),
+                                {'evaluations': 0, 'passed': 0, 'incomplete': 0})[field] += delta
+    word_values = {}
+    for (day, criterion, ruleset_version, word, field), delta in words.items():
+        word_values.setdefault((day, criterion, ruleset_version, word), {'calls': 0, 'occurrences': 0})[field] += delta
+
+    # Rows are locked in key order, so concurrent batches cannot deadlock
+    values = [key + (shard, delta['evaluations'], delta['passed'], delta['incomplete'])
+              for key, delta in sorted(daily_values.items()) if any(delta.values())]
+    if values:
+        execute_values(cursor, """
+        INSERT INTO slang.rollup_daily AS r (day, criterion, ruleset_version, shard, evaluations, passed, incomplete)
+        VALUES %s
+        ON CONFLICT (day, criterion, ruleset_version, shard) DO UPDATE
+        SET evaluations = r.evaluations + EXCLUDED.evaluations, passed = r.passed + EXCLUDED.passed,
+            incomplete = r.incomplete + EXCLUDED.incomplete
+        """, values)
+
+    values = [key + (shard, delta['calls'], delta['occurrences'])
+              for key, delta in sorted(word_values.items()) if any(delta.values())]
+    if values:
+        execute_values(cursor, """
+        INSERT INTO slang.rollup_word_daily AS r (day, criterion, ruleset_version, word, shard, calls, occurrences)
+        VALUES %s
+        ON CONFLICT (day, criterion, ruleset_version, word, shard) DO UPDATE
+        SET calls = r.calls + EXCLUDED.calls, occurrences = r.occurrences + EXCLUDED.occurrences
+        """, values, page_size=1000)
+
+def rebuild_rollups(conn, criteria):
+    """
+    Recompute the rollups of some criteria from the evaluation and occurrence tables
+
+    Only needed once after upgrading, or to repair the rollups: this is the one
+    operation that scans the evaluation tables. Writers of those tables wait until
+    it commits, so no batch is counted twice or missed.
+
+    Args:
+        conn: Open connection, committed on success
+        criteria (dict): criterion name -> registered criterion (see slang_criteria.CRITERIA)
+    """
+    cursor = conn.cursor()
+    try:
+        # Same order as writers (evaluations, then rollups), so the two cannot deadlock
+        for table in dict.fromkeys(criterion['table'] for criterion in criteria.values()):
+            cursor.execute(f"LOCK TABLE {table} IN SHARE MODE")
+        cursor.execute("LOCK TABLE slang.rollup_daily, slang.rollup_word_daily IN EXCLUSIVE MODE")
+
+        for name, criterion in criteria.items():
+            table = criterion['table']
+            cursor.execute("DELETE FROM slang.rollup_daily WHERE criterion = %s", (name,))
+            cursor.execute("DELETE FROM slang.rollup_word_daily WHERE criterion = %s", (name,))
+
+            # Tables may be shared by criteria, which tell their rows apart by label
+            cursor.execute(f"""
+            INSERT INTO slang.rollup_daily (day, criterion, ruleset_version, evaluations, passed, incomplete)
+            SELECT COALESCE(evaluated_at::date, %s), %s, ruleset_version, count(*), count(*) FILTER (WHERE passed),
+                   count(*) FILTER (WHERE NOT details_complete)
+            FROM {table}
+            WHERE criteria = %s
+            GROUP BY 1, 3
+            """, (UNDATED, name, criterion['label']))
+            cursor.execute(f"""
+            INSERT INTO slang.rollup_word_daily (day, criterion, ruleset_version, word, calls, occurrences)
+            SELECT COALESCE(e.evaluated_at::date, %s), o.criterion, o.ruleset_version, o.word,
+                   count(DISTINCT o.call_id), count(*)
+            FROM slang.slang_occurrences o
+            JOIN {table} e ON e.call_id = o.call_id AND e.ruleset_version = o.ruleset_version
+            WHERE o.criterion = %s AND e.details_complete
+            GROUP BY 1, 2, 3, 4
+            """, (UNDATED, name))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
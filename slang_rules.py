@@ -0,0 +1,268 @@
+import os
+import json
+import hashlib
+import tempfile
+from slang_env import load_environment
+from slang_matcher import TOKEN_PATTERN
+from slang_variants import build_matcher, matcher_from_dict
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+
+# Ruleset used when SLANG_RULESET is not set
+DEFAULT_RULESET_PATH = os.path.join(RULES_DIR, 'slang_ruleset.json')
+
+# Compiled rulesets and matchers are cached here unless SLANG_RULESET_CACHE is set
+DEFAULT_CACHE_DIR = os.path.join(RULES_DIR, '.compiled')
+
+# Bump whenever the layout of cached artifacts changes, so stale ones are ignored
+MATCHER_FORMAT_VERSION = 3
+
+# Spelling-variant settings a ruleset may enable (see slang_variants.VariantMatcher)
+VARIANT_SETTINGS = ('separators', 'elongation', 'phonetic')
+
+def get_ruleset_path():
+    """Get the path of the active ruleset file"""
+    load_environment()
+    return os.getenv('SLANG_RULESET') or DEFAULT_RULESET_PATH
+
+def normalize_word(word):
+    """Lowercase a rule word and collapse its internal whitespace"""
+    return ' '.join(word.lower().split())
+
+def _word_list(raw, key, source, errors, required=True):
+    """Validate, normalize and deduplicate one list of words from a ruleset"""
+    if key not in raw:
+        if required:
+            errors.append(f"missing '{key}'")
+        return []
+
+    value = raw[key]
+    if not isinstance(value, list):
+        errors.append(f"'{key}' must be a list of strings")
+        return []
+
+    words = []
+    seen = set()
+    for word in value:
+        if not isinstance(word, str) or not word.strip():
+            errors.append(f"'{key}' contains an invalid entry: {word!r}")
+            continue
+
+        word = normalize_word(word)
+        if word in seen:
+            print(f"WARNING: '{word}' is listed more than once in '{key}' of {source} - ignoring the duplicate")
+            continue
+
+        # The matcher relies on whole-word boundaries at both ends
+        if not TOKEN_PATTERN.match(word) or not TOKEN_PATTERN.fullmatch(word[-1]):
+            errors.append(f"'{word}' in '{key}' must start and end with a letter or digit")
+            continue
+
+        seen.add(word)
+        words.append(word)
+    return words
+
+def validate_ruleset(raw, source='ruleset'):
+    """
+    Validate and normalize a ruleset loaded from a file
+
+    Args:
+        raw (dict): The parsed ruleset file
+        source (str): Name used in warnings and errors
+
+    Returns:
+        dict: The normalized ruleset, with duplicates removed
+
+    Raises:
+        ValueError: If the ruleset is malformed or its lists disagree with each other
+    """
+    if not isinstance(raw, dict):
+        raise ValueError(f"Invalid slang ruleset {source}: expected a JSON object")
+
+    errors = []
+
+    version = raw.get('version')
+    if isinstance(version, bool) or not isinstance(version, (int, str)) or str(version) == '':
+        errors.append("'version' must be a number or a string")
+
+    slang_words = _word_list(raw, 'slang_words', source, errors)
+    question_response_slang = _word_list(raw, 'question_response_slang', source, errors, required=False)
+    verified_slang_words = _word_list(raw, 'verified_slang_words', source, errors, required=False)
+
+    # Every word that gets special handling has to be matched in the first place
+    matched = set(slang_words)
+    for key, words in (('question_response_slang', question_response_slang),
+                       ('verified_slang_words', verified_slang_words)):
+        for word in words:
+            if word not in matched:
+                errors.append(f"'{word}' in '{key}' is not in 'slang_words', so it is never matched")
+
+    alternatives = {}
+    raw_alternatives = raw.get('alternatives', {})
+    if not isinstance(raw_alternatives, dict):
+        errors.append("'alternatives' must be an object mapping words to alternatives")
+        raw_alternatives = {}
+
+    for word, proper in raw_alternatives.items():
+        word = normalize_word(word)
+        if not isinstance(proper, str):
+            errors.append(f"alternative for '{word}' must be a string")
+        elif word not in matched:
+            errors.append(f"'{word}' has an alternative but is not in 'slang_words', so it is never matched")
+        elif word in alternatives:
+            print(f"WARNING: '{word}' has more than one alternative in {source} - keeping the first")
+        else:
+            alternatives[word] = proper
+
+    variants = {setting: False for setting in VARIANT_SETTINGS}
+    raw_variants = raw.get('variants', {})
+    if not isinstance(raw_variants, dict):
+        errors.append("'variants' must be an object of variant settings")
+        raw_variants = {}
+
+    for setting, enabled in raw_variants.items():
+        if setting not in VARIANT_SETTINGS:
+            errors.append(f"unknown variant setting '{setting}' (available: {', '.join(VARIANT_SETTINGS)})")
+        elif not isinstance(enabled, bool):
+            errors.append(f"variant setting '{setting}' must be true or false")
+        else:
+            variants[setting] = enabled
+
+    if errors:
+        raise ValueError(f"Invalid slang ruleset {source}:\n  - " + "\n  - ".join(errors))
+
+    return {
+        'version': str(version),
+        'description': raw.get('description', ''),
+        'slang_words': slang_words,
+        'question_response_slang': question_response_slang,
+        'verified_slang_words': verified_slang_words,
+        'alternatives': alternatives,
+        'variants': variants,
+    }
+
+def ruleset_fingerprint(ruleset):
+    """Get a content fingerprint of a normalized ruleset"""
+    content = json.dumps(ruleset, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def get_cache_dir(cache_dir=None):
+    """Get the directory compiled artifacts are cached in"""
+    load_environment()
+    return cache_dir or os.getenv('SLANG_RULESET_CACHE') or DEFAULT_CACHE_DIR
+
+def _read_artifact(path):
+    """
+    Read a cached artifact, returning None if it is missing, unreadable or outdated
+
+    Artifacts are plain JSON, so a file placed in the cache directory can at worst
+    hold a wrong matcher, never run code when it is loaded.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            artifact = json.load(file)
+        if isinstance(artifact, dict) and artifact.get('format') == MATCHER_FORMAT_VERSION:
+            artifact['matcher'] = matcher_from_dict(artifact['matcher'])
+            return artifact
+        print(f"WARNING: Compiled artifact {path} has an outdated format - recompiling")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"WARNING: Could not read compiled artifact {path}: {e} - recompiling")
+    return None
+
+def _write_artifact(path, artifact):
+    """Write an artifact to the cache, atomically so concurrent workers never see a partial file"""
+    cache_dir = os.path.dirname(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(dict(artifact, matcher=artifact['matcher'].to_dict()), file, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"WARNING: Could not cache compiled artifact in {cache_dir}: {e}")
+
+def load_ruleset(path=None, cache_dir=None):
+    """
+    Load, validate and compile a ruleset file
+
+    The validated ruleset and the matcher for its slang words are cached on disk
+    under the fingerprint of the file's content, so only the first load of a
+    given file parses, validates and compiles it.
+
+    Args:
+        path (str, optional): Ruleset file to load. Default is the active ruleset (see get_ruleset_path).
+        cache_dir (str, optional): Cache directory. Default is SLANG_RULESET_CACHE or rules/.compiled.
+
+    Returns:
+        dict: The normalized ruleset, with its 'fingerprint', 'path' and compiled 'matcher'
+    """
+    path = path or get_ruleset_path()
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    content_fingerprint = hashlib.sha256(content).hexdigest()
+    artifact_path = os.path.join(get_cache_dir(cache_dir), f"ruleset-{content_fingerprint}.json")
+
+    artifact = _read_artifact(artifact_path)
+    if artifact is None:
+        ruleset = validate_ruleset(json.loads(content.decode('utf-8')), source=path)
+        ruleset['fingerprint'] = ruleset_fingerprint(ruleset)
+        artifact = {
+            'format': MATCHER_FORMAT_VERSION,
+            'ruleset': ruleset,
+            'matcher': build_matcher(ruleset['slang_words'], ruleset['variants']),
+        }
+        _write_artifact(artifact_path, artifact)
+
+    ruleset = dict(artifact['ruleset'])
+    ruleset['path'] = path
+    ruleset['matcher'] = artifact['matcher']
+    return ruleset
+
+def matcher_fingerprint(words, variants=None):
+    """Get the content fingerprint a compiled matcher for these words is cached under"""
+    content = json.dumps([list(dict.fromkeys(words)), variants or {}], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def load_matcher(words, variants=None, cache_dir=None):
+    """
+    Get a compiled matcher for any list of words, from the on-disk cache when possible
+
+    Args:
+        words (list): Words the matcher should find
+        variants (dict, optional): Spelling-variant settings, like the 'variants' of a ruleset
+        cache_dir (str, optional): Cache directory. Default is SLANG_RULESET_CACHE or rules/.compiled.
+
+    Returns:
+        SlangMatcher or VariantMatcher: The compiled matcher
+    """
+    artifact_path = os.path.join(get_cache_dir(cache_dir), f"matcher-{matcher_fingerprint(words, variants)}.json")
+
+    artifact = _read_artifact(artifact_path)
+    if artifact is None:
+        artifact = {'format': MATCHER_FORMAT_VERSION, 'matcher': build_matcher(words, variants)}
+        _write_artifact(artifact_path, artifact)
+
+    return artifact['matcher']
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Validate a slang ruleset and precompile its matcher')
+    parser.add_argument('path', nargs='?', help='Ruleset file (default: SLANG_RULESET or rules/slang_ruleset.json)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ruleset = load_ruleset(args.path)
+    loaded = time.perf_counter()
+
+    print(f"Ruleset: {ruleset['path']} (version {ruleset['version']})")
+    print(f"Fingerprint: {ruleset['fingerprint']}")
+    print(f"Slang words: {len(ruleset['slang_words'])}, question responses: {len(ruleset['question_response_slang'])}, "
+          f"verified: {len(ruleset['verified_slang_words'])}, alternatives: {len(ruleset['alternatives'])}")
+    enabled = [setting for setting in VARIANT_SETTINGS if ruleset['variants'][setting]]
+    print(f"Spelling variants: {', '.join(enabled) if enabled else 'none (exact matches only)'}")
+    print(f"Loaded and compiled in {(loaded - start) * 1000:.1f} ms, cached in {get_cache_dir()}")
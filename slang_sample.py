@@ -0,0 +1,273 @@
+import math
+import time
+from statistics import NormalDist
+from slang_common import RULESET_VERSION
+from slang_criteria import CRITERIA, new_call, match_criteria
+from slang_alignment import ALIGNMENT_TOLERANCE
+from slang_helper import get_db_connection, get_call_id_histogram, get_call_id_type, get_estimated_counts
+
+# Rows read per sampled call: the calls are picked by hash among this many times more candidates,
+# which evens out the clustering of sampling whole pages
+SAMPLE_OVERSAMPLING = 4
+
+def get_strata_bounds(strata):
+    """
+    Split the call_id range into strata holding roughly the same number of transcriptions
+
+    The bounds come from the planner's equi-depth call_id histogram, so nothing is scanned.
+    The first and last strata are open-ended, which keeps calls added since the last
+    ANALYZE in the sample frame.
+
+    Returns:
+        list: (low, high, share) per stratum, low inclusive and high exclusive, None for an
+            open end, and share the fraction of the table the histogram puts in the stratum
+    """
+    histogram = get_call_id_histogram()
+    if not histogram or strata <= 1:
+        return [(None, None, 1.0)]
+
+    buckets = len(histogram) - 1
+    step = buckets / strata
+    cuts = []
+    positions = []
+    for i in range(1, strata):
+        position = round(i * step)
+        bound = histogram[position]
+        bound = int(bound) if float(bound).is_integer() else bound
+        if not cuts or bound > cuts[-1]:
+            cuts.append(bound)
+            positions.append(position)
+    shares = [(high - low) / buckets for low, high in zip([0] + positions, positions + [buckets])]
+    return list(zip([None] + cuts, cuts + [None], shares))
+
+def sample_strata(cursor, bounds, size, seed, call_id_type, total=None):
+    """
+    Draw a random sample of every stratum on the server, in one query
+
+    A TABLESAMPLE SYSTEM pass reads about SAMPLE_OVERSAMPLING * size rows of each stratum,
+    and the sample is the size call_ids of each stratum with the lowest hash of (call_id, seed)
+    among them, so it is random with respect to the transcriptions and repeatable for a
+    seed. The pass is repeated on more pages while a stratum comes up short, up to the
+    whole table. The cost grows with the sample size, not with the table.
+
+    Args:
+        bounds (list): Strata from get_strata_bounds()
+        size (int): Calls to draw per stratum
+        total (int, optional): Planner estimate of the table's row count. Without it
+            the whole table is read and the strata are counted exactly.
+
+    Returns:
+        list: (estimated number of transcriptions in the stratum, [(call_id, transcription)]) per stratum
+    """
+    cuts = [low for low, _, _ in bounds[1:]]
+    stratum = f"width_bucket(call_id, %(cuts)s::{call_id_type}[])" if cuts else "0"
+    params = {'cuts': cuts, 'size': size, 'seed': str(seed)}
+
+    if total:
+        percent = min(100.0, max(100.0 * SAMPLE_OVERSAMPLING * size / max(1.0, total * share)
+                                 for _, _, share in bounds))
+    else:
+        percent = 100.0
+
+    while True:
+        params['percent'] = percent
+        cursor.execute(f"""
+        SELECT s.stratum, s.seen, t.call_id, t.transcription
+        FROM (
+            SELECT call_id, stratum, count(*) OVER (PARTITION BY stratum) AS seen,
+                   row_number() OVER (PARTITION BY stratum ORDER BY hashtext(call_id::text || %(seed)s)) AS position
+            FROM (
+                SELECT call_id, {stratum} AS stratum
+                FROM slang.transcriptions_gemini TABLESAMPLE SYSTEM (%(percent)s) REPEATABLE (hashtext(%(seed)s))
+            ) sampled
+        ) s
+        JOIN slang.transcriptions_gemini t ON t.call_id = s.call_id
+        WHERE s.position <= %(size)s
+        ORDER BY t.call_id
+        """, params)
+
+        records = [[] for _ in bounds]
+        seen = [0] * len(bounds)
+        for index, count, call_id, transcription in cursor.fetchall():
+            records[index].append((call_id, transcription))
+            seen[index] = count
+
+        # A stratum the histogram puts fewer than size rows in cannot fill its sample anyway
+        if percent >= 100 or all(len(sample) >= min(size, total * share)
+                                 for sample, (_, _, share) in zip(records, bounds)):
+            break
+        percent = min(100.0, percent * 4)
+
+    if percent >= 100:
+        # Every row was read, so the strata were counted exactly
+        return list(zip(seen, records))
+    return [(round(total * share), sample) for (_, _, share), sample in zip(bounds, records)]
+
+def wilson_interval(rate, n, z):
+    """Wilson score interval of a proportion observed in n trials"""
+    if n <= 0:
+        return 0.0, 1.0
+    denominator = 1 + z * z / n
+    center = (rate + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+def stratified_rate(strata, z):
+    """
+    Estimate a proportion from per-stratum observations
+
+    Args:
+        strata (list): (population, sampled, hits) per stratum
+        z (float): Normal quantile of the confidence level
+
+    Returns:
+        tuple: (rate, low, high). The interval is a Wilson interval at the effective
+            sample size of the stratified estimate (with finite population correction).
+    """
+    total = sum(population for population, sampled, _ in strata if sampled)
+    if not total:
+        return 0.0, 0.0, 1.0
+
+    rate = 0.0
+    variance = 0.0
+    sampled_total = 0
+    for population, sampled, hits in strata:
+        if not sampled:
+            continue
+        weight = population / total
+        stratum_rate = hits / sampled
+        rate += weight * stratum_rate
+        if sampled > 1:
+            correction = max(0.0, 1 - sampled / population) if population else 0.0
+            variance += weight * weight * correction * stratum_rate * (1 - stratum_rate) / (sampled - 1)
+        sampled_total += sampled
+
+    rate = min(1.0, max(0.0, rate))
+
+    # A rate of 0 or 1 has no sampling variance to speak of: fall back to the plain sample size
+    effective = rate * (1 - rate) / variance if variance > 0 and 0 < rate < 1 else sampled_total
+    low, high = wilson_interval(rate, effective, z)
+    return rate, low, high
+
+def estimate_slang_rates(sample_size, strata=10, seed=0, criteria=None, verify=True, question_context=True,
+                         confidence=0.95, whisper_lookup=None, verification_mode='call',
+                         alignment_tolerance=ALIGNMENT_TOLERANCE):
+    """
+    Estimate failure rates and per-word rates from a stratified random sample of calls
+
+    Nothing is written: only the sampled calls are fetched and evaluated.
+
+    Args:
+        sample_size (int): Number of calls to sample, split evenly across strata
+        strata (int): Number of call_id strata (call_ids grow over time, so strata are periods)
+        seed: Sample seed; the same seed draws the same calls
+        criteria (list, optional): Criteria to estimate. Default is slang only.
+        verify (bool): Verify words in VERIFIED_SLANG_WORDS against whisper
+        question_context (bool): Ignore responses like 'yeah' near questions
+        confidence (float): Confidence level of the intervals
+        whisper_lookup (optional): Whisper provider, see slang_criteria.resolve_whisper_lookup.
+            Default fetches the whisper transcriptions of each stratum's sample in one query.
+        verification_mode (str): 'call' or 'occurrence', see slang_criteria.evaluate_criteria
+        alignment_tolerance (float): In occurrence mode, seconds a whisper occurrence may be away
+
+    Returns:
+        dict: Population, sample size and, per criterion, the failure rate and per-word rates
+            as (rate, low, high), with the sampled calls and occurrences of each word
+    """
+    criteria = list(criteria) if criteria else ['slang']
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    bounds = get_strata_bounds(strata)
+    per_stratum = max(1, math.ceil(sample_size / len(bounds)))
+    call_id_type = get_call_id_type()
+    total, _ = get_estimated_counts()
+    start = time.perf_counter()
+
+    # Per criterion and stratum: failed calls, and per word the calls using it and its occurrences
+    observed = []
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        for population, records in sample_strata(cursor, bounds, per_stratum, seed, call_id_type, total):
+            stratum = {'population': population, 'sampled': 0,
+                       'failed': {name: 0 for name in criteria},
+                       'calls': {name: {word: 0 for word in CRITERIA[name]['words']} for name in criteria},
+                       'occurrences': {name: {word: 0 for word in CRITERIA[name]['words']} for name in criteria}}
+
+            # One whisper query per stratum instead of one lookup per call
+            stratum_lookup = whisper_lookup
+            if stratum_lookup is None and verify:
+                from whisper_sync import get_whisper_transcriptions
+                stratum_lookup = get_whisper_transcriptions([call_id for call_id, _ in records])
+
+            for call_id, transcription in records:
+                # Empty transcriptions are never evaluated, so they count as sampled without slang
+                stratum['sampled'] += 1
+                if not transcription:
+                    continue
+
+                call = new_call(call_id, transcription, whisper_lookup=stratum_lookup, verbose=False,
+                                verify=verify, question_context=question_context,
+                                verification_mode=verification_mode, alignment_tolerance=alignment_tolerance)
+                for name, (counts, _) in match_criteria(call, criteria).items():
+                    criterion = CRITERIA[name]
+                    score, _, _ = criterion['score'](criterion, counts)
+                    if score <= 0:
+                        stratum['failed'][name] += 1
+                    for word, count in counts.items():
+                        if count:
+                            stratum['calls'][name][word] += 1
+                            stratum['occurrences'][name][word] += count
+            observed.append(stratum)
+    finally:
+        cursor.close()
+        conn.close()
+
+    report = {
+        'ruleset_version': RULESET_VERSION,
+        'confidence': confidence,
+        'seed': seed,
+        'strata': len(observed),
+        'population': sum(stratum['population'] for stratum in observed),
+        'sampled': sum(stratum['sampled'] for stratum in observed),
+        'seconds': time.perf_counter() - start,
+        'criteria': {},
+    }
+    for name in criteria:
+        failure = stratified_rate([(s['population'], s['sampled'], s['failed'][name]) for s in observed], z)
+        words = {}
+        for word in CRITERIA[name]['words']:
+            words[word] = {
+                'rate': stratified_rate([(s['population'], s['sampled'], s['calls'][name][word]) for s in observed], z),
+                'calls': sum(s['calls'][name][word] for s in observed),
+                'occurrences': sum(s['occurrences'][name][word] for s in observed),
+            }
+        report['criteria'][name] = {'failure_rate': failure, 'words': words}
+    return report
+
+def format_rate(rate):
+    """Format a (rate, low, high) estimate as 'rate [low, high]' in percent"""
+    value, low, high = rate
+    return f"{value * 100:5.1f}% [{low * 100:4.1f}%, {high * 100:4.1f}%]"
+
+def print_sample_report(report):
+    """Print the estimates of estimate_slang_rates(), most used words first"""
+    confidence = f"{report['confidence'] * 100:g}%"
+    print(f"Sampled {report['sampled']} of {report['population']} calls in {report['strata']} call_id strata "
+          f"(seed {report['seed']}, ruleset version {report['ruleset_version']}) in {report['seconds']:.1f}s")
+    print(f"Rates are the estimated share of all calls, with {confidence} confidence intervals")
+
+    for name, estimates in report['criteria'].items():
+        print(f"\n{CRITERIA[name]['label']}")
+        print(f"  Failure rate: {format_rate(estimates['failure_rate'])}")
+
+        used = [(word, data) for word, data in estimates['words'].items() if data['calls']]
+        used.sort(key=lambda item: -item[1]['rate'][0])
+        for word, data in used:
+            print(f"  {word!r:<16} {format_rate(data['rate'])}  "
+                  f"({data['calls']} sampled call(s), {data['occurrences']} occurrence(s))")
+
+        unused = len(estimates['words']) - len(used)
+        if unused:
+            # Zero hits still bound the rate: with n calls the upper limit is about 3/n at 95%
+            upper = wilson_interval(0.0, report['sampled'], NormalDist().inv_cdf(0.5 + report['confidence'] / 2))[1]
+            print(f"  {unused} word(s) not seen in the sample (each below {upper * 100:.1f}% of calls)")
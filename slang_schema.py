@@ -0,0 +1,934 @@
+import sys
+import json
+import argparse
+import psycopg2
+import psycopg2.extensions
+from slang_helper import get_db_connection, get_call_id_type, TRANSCRIPTION_ID_SEQUENCE
+
+# Tables of the dev database, created by --apply if missing. Existing tables are never altered,
+# except for the upsert key and the evaluated_at and details_complete columns of the evaluation
+# tables, and the agent_transcription column of the transcriptions. Scripts never change the
+# schema themselves: they only check it with require_schema().
+TRANSCRIPTIONS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS slang.transcriptions_gemini (
+    call_id bigint PRIMARY KEY,
+    transcription text,
+    human_grade text,
+    agent_transcription text
+)
+"""
+
+EVALUATION_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    transcription_id integer,
+    call_id bigint NOT NULL,
+    ruleset_version text NOT NULL,
+    intern_ai_grade text,
+    score integer,
+    max_score integer,
+    criteria text,
+    passed boolean,
+    explanation text,
+    improvement_suggestion text,
+    found_references jsonb,
+    context text,
+    original_transcription text,
+    evaluated_at timestamptz DEFAULT now(),
+    details_complete boolean NOT NULL DEFAULT true,
+    UNIQUE (call_id, ruleset_version)
+)
+"""
+
+# One row per accepted occurrence of a word, written with the evaluation it belongs to,
+# so per-word analytics are a GROUP BY instead of re-parsing found_references.
+# verified is NULL for occurrences that were never checked against whisper.
+OCCURRENCES_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS slang.slang_occurrences (
+    call_id {call_id_type} NOT NULL,
+    ruleset_version text NOT NULL,
+    criterion text NOT NULL,
+    word text NOT NULL,
+    line_index integer,
+    timestamp_seconds real,
+    start_offset integer,
+    end_offset integer,
+    verified boolean
+)
+"""
+
+# Rollups kept up to date by every evaluation write (see slang_rollups.py), so reports
+# never scan the evaluation tables. Days are the days evaluations were last written.
+# Each key is split into shards that concurrent writers pick at random, so they do not
+# all wait on today's row; reports sum the shards.
+ROLLUP_DAILY_DDL = """
+CREATE TABLE IF NOT EXISTS slang.rollup_daily (
+    day date NOT NULL,
+    criterion text NOT NULL,
+    ruleset_version text NOT NULL,
+    evaluations integer NOT NULL DEFAULT 0,
+    passed integer NOT NULL DEFAULT 0,
+    incomplete integer NOT NULL DEFAULT 0,
+    shard smallint NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, criterion, ruleset_version, shard)
+)
+"""
+
+ROLLUP_WORD_DAILY_DDL = """
+CREATE TABLE IF NOT EXISTS slang.rollup_word_daily (
+    day date NOT NULL,
+    criterion text NOT NULL,
+    ruleset_version text NOT NULL,
+    word text NOT NULL,
+    calls integer NOT NULL DEFAULT 0,
+    occurrences integer NOT NULL DEFAULT 0,
+    shard smallint NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, criterion, ruleset_version, word, shard)
+)
+"""
+
+# Primary keys of the rollup tables, shard last
+ROLLUP_KEYS = {
+    'slang.rollup_daily': ('day', 'criterion', 'ruleset_version', 'shard'),
+    'slang.rollup_word_daily': ('day', 'criterion', 'ruleset_version', 'word', 'shard'),
+}
+
+OCCURRENCE_INDEXES = [
+    ('slang.slang_occurrences', ('call_id', 'ruleset_version', 'criterion'), False, 'slang_occurrences_call_id_idx',
+     "replacing the occurrences of re-evaluated calls"),
+    ('slang.slang_occurrences', ('criterion', 'word'), False, 'slang_occurrences_word_idx',
+     "per-word aggregation"),
+]
+
+# Local copy of the production whisper transcriptions, filled by whisper_sync.py.
+# A NULL final_transcript means production had no whisper transcription when the call was synced.
+WHISPER_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS slang.transcriptions_whisper (
+    call_id {call_id_type} PRIMARY KEY,
+    final_transcript text,
+    synced_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+# High-water marks of incremental sync jobs, one row per job
+SYNC_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS slang.sync_state (
+    name text PRIMARY KEY,
+    high_water_mark text,
+    updated_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+# Indexes the hot queries rely on: (table, columns, unique, name, what needs it).
+# Any valid index with these leading columns (the exact columns for unique ones) counts,
+# whatever its name, so a primary key or an index created by hand is recognized.
+DEV_INDEXES = [
+    ('slang.transcriptions_gemini', ('call_id',), True, 'transcriptions_gemini_call_id_key',
+     "ON CONFLICT (call_id) in json_to_database.py and lookups by call_id"),
+]
+
+# Index of the production database, which this project does not own: only created with --production
+PRODUCTION_INDEXES = [
+    ('public.audio_file_processing_data', ('call_id',), False, 'audio_file_processing_data_call_id_idx',
+     "whisper transcription lookups by call_id"),
+]
+
+def get_evaluation_tables():
+    """Get the evaluation table of every registered criterion"""
+    from slang_criteria import CRITERIA
+    return list(dict.fromkeys(criterion['table'] for criterion in CRITERIA.values()))
+
+def get_evaluation_indexes(table):
+    """Get the indexes an evaluation table needs, in the format of DEV_INDEXES"""
+    name = table.rpartition('.')[2]
+    return [
+        (table, ('call_id', 'ruleset_version'), True, f"{name}_call_id_ruleset_version_key",
+         "the evaluation upsert and the unprocessed-call anti-join on call_id"),
+        (table, ('transcription_id',), False, f"{name}_transcription_id_idx",
+         "MAX(transcription_id) at startup"),
+    ]
+
+def table_exists(cursor, table):
+    """Check whether a table exists"""
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+def get_table_indexes(cursor, table):
+    """Get (unique, columns) for every valid, non-partial index of a table"""
+    cursor.execute("""
+    SELECT i.indisunique, array_agg(a.attname ORDER BY k.position)
+    FROM pg_index i
+    CROSS JOIN LATERAL unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, position)
+    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+    WHERE i.indrelid = %s::regclass AND i.indisvalid AND i.indpred IS NULL
+    GROUP BY i.indexrelid, i.indisunique
+    """, (table,))
+    return [(unique, tuple(columns)) for unique, columns in cursor.fetchall()]
+
+def has_index(cursor, table, columns, unique=False):
+    """Check whether an index serves lookups on columns (and enforces their uniqueness if unique)"""
+    columns = tuple(columns)
+    for index_unique, index_columns in get_table_indexes(cursor, table):
+        if unique:
+            if index_unique and index_columns == columns:
+                return True
+        elif index_columns[:len(columns)] == columns:
+            return True
+    return False
+
+def create_index(conn, table, columns, unique, name, concurrently=False):
+    """
+    Create an index
+
+    Args:
+        conn: Open connection; with concurrently it must be in autocommit mode
+        concurrently (bool): Build without blocking writes (slower, cannot run in a transaction)
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}"
+                       f"IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+    finally:
+        cursor.close()
+
+def ensure_evaluation_upsert_key(table='slang.evaluation_gemini', default_version='1'):
+    """Make sure an evaluation table can be upserted on (call_id, ruleset_version)
+
+    Adds the ruleset_version column if needed (rows written before rulesets were
+    versioned get default_version, the version those hard-coded word lists became),
+    removes duplicate evaluations keeping the latest transcription_id (rows without
+    one go first), and creates the unique index the upsert relies on. Does nothing
+    once such an index exists (or if the table is missing). This deletes rows: it only
+    runs from `python slang_schema.py --apply`, scripts only check for the key (see
+    require_schema()).
+
+    Args:
+        table (str): Evaluation table, e.g. 'slang.evaluation_gemini'
+        default_version (str): ruleset_version given to rows that predate the column
+    """
+    index_name = f"{table.rpartition('.')[2]}_call_id_ruleset_version_key"
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if not table_exists(cursor, table) or has_upsert_key(cursor, table):
+            return
+
+        print(f"Preparing {table} for idempotent upserts on (call_id, ruleset_version)...")
+
+        # Keep concurrent writers out while duplicates are removed
+        cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS ruleset_version text")
+        cursor.execute(f"UPDATE {table} SET ruleset_version = %s WHERE ruleset_version IS NULL", (default_version,))
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN ruleset_version SET NOT NULL")
+
+        # NULL transcription_ids rank last, so their duplicates are removed too
+        cursor.execute(f"""
+        DELETE FROM {table}
+        WHERE ctid IN (
+            SELECT ctid FROM (
+                SELECT ctid, row_number() OVER (
+                    PARTITION BY call_id, ruleset_version
+                    ORDER BY transcription_id DESC NULLS LAST, ctid DESC
+                ) AS position
+                FROM {table}
+            ) ranked
+            WHERE position > 1
+        )
+        """)
+        if cursor.rowcount:
+            print(f"Removed {cursor.rowcount} duplicate evaluations from {table}")
+
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} (call_id, ruleset_version)")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def has_upsert_key(cursor, table):
+    """Check whether an evaluation table has the unique (call_id, ruleset_version) key the upsert relies on"""
+    return has_index(cursor, table, ('call_id', 'ruleset_version'), unique=True)
+
+def has_column(cursor, table, column):
+    """Check whether a table has a column"""
+    schema, _, name = table.rpartition('.')
+    cursor.execute("""
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = %s AND table_name = %s AND column_name = %s
+    """, (schema or 'public', name, column))
+    return cursor.fetchone() is not None
+
+def is_nullable(cursor, table, column):
+    """Check whether a column accepts NULL"""
+    schema, _, name = table.rpartition('.')
+    cursor.execute("""
+    SELECT is_nullable = 'YES' FROM information_schema.columns
+    WHERE table_schema = %s AND table_name = %s AND column_name = %s
+    """, (schema or 'public', name, column))
+    row = cursor.fetchone()
+    return row is not None and row[0]
+
+def has_trigger(cursor, table, name):
+    """Check whether a table has a trigger"""
+    cursor.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = %s::regclass AND tgname = %s", (table, name))
+    return cursor.fetchone() is not None
+
+def find_missing_schema(cursor, tables, agent_only=False, notify_trigger=False, whisper_tables=False):
+    """
+    Find what evaluation writes need from the schema and do not have
+
+    Args:
+        cursor: Open cursor on the dev database
+        tables (list): Evaluation tables that will be written (none for runs that write no evaluations)
+        agent_only (bool): Whether transcriptions are read from agent_transcription
+        notify_trigger (bool): Whether the daemon's NOTIFY trigger is needed
+        whisper_tables (bool): Whether the local whisper copy and its sync state are needed
+
+    Returns:
+        list: Missing tables, keys, columns and triggers, as messages
+    """
+    missing = []
+    for table in tables:
+        if not table_exists(cursor, table):
+            missing.append(f"missing table {table}")
+            continue
+        if not has_upsert_key(cursor, table):
+            missing.append(f"missing unique (call_id, ruleset_version) key on {table} "
+                           f"(adding it removes duplicate evaluations)")
+        missing += [f"missing column {table}.{column}" for column in ('evaluated_at', 'details_complete')
+                    if not has_column(cursor, table, column)]
+
+    if tables:
+        missing += [f"missing table {table}" for table in ['slang.slang_occurrences'] + list(ROLLUP_KEYS)
+                    if not table_exists(cursor, table)]
+        if table_exists(cursor, 'slang.slang_occurrences') and not is_nullable(cursor, 'slang.slang_occurrences', 'verified'):
+            missing.append("slang.slang_occurrences.verified is NOT NULL (never-verified words are stored as NULL)")
+        missing += [f"missing column {table}.shard" for table in ROLLUP_KEYS
+                    if table_exists(cursor, table) and not has_column(cursor, table, 'shard')]
+        if table_exists(cursor, 'slang.rollup_daily') and not has_column(cursor, 'slang.rollup_daily', 'incomplete'):
+            missing.append("missing column slang.rollup_daily.incomplete")
+
+        if not table_exists(cursor, TRANSCRIPTION_ID_SEQUENCE):
+            missing.append(f"missing sequence {TRANSCRIPTION_ID_SEQUENCE}")
+    if agent_only and not has_column(cursor, 'slang.transcriptions_gemini', 'agent_transcription'):
+        missing.append("missing column slang.transcriptions_gemini.agent_transcription")
+    if notify_trigger and not has_trigger(cursor, 'slang.transcriptions_gemini', 'transcriptions_gemini_notify'):
+        missing.append("missing trigger transcriptions_gemini_notify on slang.transcriptions_gemini")
+    if whisper_tables:
+        missing += [f"missing table {table}" for table in ('slang.transcriptions_whisper', 'slang.sync_state')
+                    if not table_exists(cursor, table)]
+    return missing
+
+def require_schema(tables, agent_only=False, notify_trigger=False, whisper_tables=False):
+    """
+    Exit with an instruction unless the schema has everything evaluation writes need
+
+    Changing the schema takes locks, builds indexes and may delete duplicate evaluations,
+    so scripts never do it implicitly: it is left to `python slang_schema.py --apply`.
+    Arguments as in find_missing_schema().
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        missing = find_missing_schema(cursor, tables, agent_only, notify_trigger, whisper_tables)
+    finally:
+        cursor.close()
+        conn.close()
+
+    if missing:
+        print("Error: The database schema is not ready for this run:")
+        for problem in missing:
+            print(f"  - {problem}")
+        print("Create what is missing with: python slang_schema.py --apply")
+        sys.exit(1)
+
+# Channel notified with the call_id of every new or re-transcribed call, see install_notify_trigger()
+NOTIFY_CHANNEL = 'slang_new_transcription'
+
+def install_notify_trigger(channel=NOTIFY_CHANNEL):
+    """Install the trigger that NOTIFYs channel whenever a transcription is inserted or replaced
+
+    The payload is the call_id as text. Safe to run repeatedly.
+
+    Args:
+        channel (str): Channel to notify. Default is NOTIFY_CHANNEL.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION slang.notify_new_transcription() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{channel}', NEW.call_id::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS transcriptions_gemini_notify ON slang.transcriptions_gemini")
+        cursor.execute("""
+        CREATE TRIGGER transcriptions_gemini_notify
+        AFTER INSERT OR UPDATE OF transcription ON slang.transcriptions_gemini
+        FOR EACH ROW EXECUTE FUNCTION slang.notify_new_transcription()
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def ensure_evaluation_schema(table='slang.evaluation_gemini'):
+    """
+    Make sure an evaluation table exists with the keys and indexes the evaluation queries rely on
+
+    Creates the table if missing, then its upsert key (see ensure_evaluation_upsert_key),
+    its transcription_id index, its evaluated_at and details_complete columns, the
+    occurrence table and the rollup tables. Does nothing once they exist. Part of
+    `--apply` (see apply_schema()); scripts only check the result with require_schema().
+
+    Args:
+        table (str): Evaluation table, e.g. 'slang.evaluation_gemini'
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if not table_exists(cursor, table):
+            print(f"Creating {table}...")
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {table.rpartition('.')[0] or 'public'}")
+            cursor.execute(EVALUATION_TABLE_DDL.format(table=table))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    ensure_evaluation_upsert_key(table)
+    for index_table, columns, unique, name, _ in get_evaluation_indexes(table)[1:]:
+        ensure_index(get_db_connection, index_table, columns, unique, name)
+
+    # Evaluations written before rollups existed keep NULL: their write day is unknown
+    ensure_column(table, 'evaluated_at', 'timestamptz', default='now()')
+    # Evaluations written before --verdict-only existed have all their details
+    ensure_column(table, 'details_complete', 'boolean NOT NULL DEFAULT true')
+
+    # Occurrences and rollups are written in the same transaction as the evaluations
+    ensure_occurrence_table()
+    ensure_rollup_tables()
+
+def ensure_transcription_id_sequence(tables):
+    """
+    Create the sequence transcription_ids are allocated from, if missing, past every id in use
+
+    Args:
+        tables (list): Evaluation tables whose transcription_ids the sequence must not hand out again
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if not table_exists(cursor, TRANSCRIPTION_ID_SEQUENCE):
+            print(f"Creating {TRANSCRIPTION_ID_SEQUENCE}...")
+            cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {TRANSCRIPTION_ID_SEQUENCE}")
+            max_id = 0
+            for table in tables:
+                cursor.execute(f"SELECT COALESCE(MAX(transcription_id), 0) FROM {table}")
+                max_id = max(max_id, cursor.fetchone()[0])
+            if max_id:
+                cursor.execute("SELECT setval(%s, %s)", (TRANSCRIPTION_ID_SEQUENCE, max_id))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def ensure_column(table, column, definition, default=None):
+    """Add a column to a table unless it already has it (the lock is only taken when it is added)
+
+    Args:
+        default (str, optional): Default for new rows, set after the column is added so existing rows keep NULL
+
+    Returns:
+        bool: True if the column was added
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if has_column(cursor, table, column):
+            return False
+        print(f"Adding {column} to {table}...")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}")
+        if default is not None:
+            cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT {default}")
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def ensure_agent_transcription_column():
+    """
+    Add the agent-only projection of the transcriptions, agent_transcription, if missing
+
+    The column is filled at ingest by json_to_database.py (and for older rows by
+    backfill_agent_transcriptions()) with slang_lines.agent_only_transcription(), so it
+    splits lines exactly like the evaluator. A trigger clears it whenever a transcription
+    is changed without it, so it is never stale: evaluations read the full transcription
+    until it is filled again. Safe to run repeatedly.
+    """
+    if ensure_column('slang.transcriptions_gemini', 'agent_transcription', 'text'):
+        print("INFO: Fill agent_transcription for existing rows with: python slang_schema.py --backfill-agent-transcriptions")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION slang.clear_stale_agent_transcription() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.transcription IS DISTINCT FROM OLD.transcription
+               AND NEW.agent_transcription IS NOT DISTINCT FROM OLD.agent_transcription THEN
+                NEW.agent_transcription := NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS transcriptions_gemini_agent_stale ON slang.transcriptions_gemini")
+        cursor.execute("""
+        CREATE TRIGGER transcriptions_gemini_agent_stale
+        BEFORE UPDATE OF transcription ON slang.transcriptions_gemini
+        FOR EACH ROW EXECUTE FUNCTION slang.clear_stale_agent_transcription()
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def backfill_agent_transcriptions(batch_size=1000):
+    """
+    Fill agent_transcription for the transcriptions that do not have it, in call_id order
+
+    Each batch is committed on its own, so an interrupted backfill loses at most one
+    batch and simply continues with what is left when run again. A row changed between
+    the read and the write of its batch is left for the next run.
+
+    Returns:
+        int: Number of transcriptions filled
+    """
+    from psycopg2.extras import execute_values
+    from slang_lines import agent_only_transcription
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    filled = 0
+    last_call_id = None
+
+    try:
+        while True:
+            cursor.execute("""
+            SELECT call_id, xmin::text, transcription
+            FROM slang.transcriptions_gemini
+            WHERE agent_transcription IS NULL AND transcription IS NOT NULL
+              AND (%s IS NULL OR call_id > %s)
+            ORDER BY call_id
+            LIMIT %s
+            """, (last_call_id, last_call_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            # The row version guards against a transcription replaced since it was read
+            execute_values(cursor, """
+            UPDATE slang.transcriptions_gemini t
+            SET agent_transcription = v.agent_transcription
+            FROM (VALUES %s) AS v(call_id, row_version, agent_transcription)
+            WHERE t.call_id = v.call_id AND t.xmin::text = v.row_version
+            """, [(call_id, row_version, agent_only_transcription(transcription))
+                   for call_id, row_version, transcription in rows], page_size=batch_size)
+            filled += cursor.rowcount
+            conn.commit()
+
+            last_call_id = rows[-1][0]
+            print(f"Filled agent_transcription for {filled} transcription(s), last call_id {last_call_id}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return filled
+
+def ensure_rollup_tables():
+    """Create the rollup tables if missing, and add the shard to the key of rollup tables created without it"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(ROLLUP_DAILY_DDL)
+        cursor.execute(ROLLUP_WORD_DAILY_DDL)
+
+        # Existing rows become shard 0; the rollups are small, so the key is rebuilt in place
+        for table, key in ROLLUP_KEYS.items():
+            if has_column(cursor, table, 'shard'):
+                continue
+            print(f"Adding shard to the key of {table}...")
+            name = table.rpartition('.')[2]
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN shard smallint NOT NULL DEFAULT 0")
+            cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}_pkey")
+            cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(key)})")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    # Evaluations written before --verdict-only existed all have their word details
+    ensure_column('slang.rollup_daily', 'incomplete', 'integer NOT NULL DEFAULT 0')
+
+def ensure_occurrence_table():
+    """Create slang.slang_occurrences and its indexes if missing (call_id typed like the transcriptions)"""
+    call_id_type = get_call_id_type()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if not table_exists(cursor, 'slang.slang_occurrences'):
+            print("Creating slang.slang_occurrences...")
+            cursor.execute(OCCURRENCES_TABLE_DDL.format(call_id_type=call_id_type))
+            conn.commit()
+        elif not is_nullable(cursor, 'slang.slang_occurrences', 'verified'):
+            migrate_occurrence_verified(cursor)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    for table, columns, unique, name, _ in OCCURRENCE_INDEXES:
+        ensure_index(get_db_connection, table, columns, unique, name)
+
+def migrate_occurrence_verified(cursor):
+    """
+    Make slang_occurrences.verified nullable, and NULL for the occurrences whisper never checked
+
+    Occurrences used to get false both when whisper rejected them and when their word
+    is not verified at all. Only the criterion's verified_words are ever checked (and
+    accepted ones are confirmed), so the false of any other word means "never checked".
+    """
+    from slang_criteria import CRITERIA
+
+    print("Making slang.slang_occurrences.verified nullable (NULL for never-verified words)...")
+    cursor.execute("ALTER TABLE slang.slang_occurrences ALTER COLUMN verified DROP NOT NULL")
+    cursor.execute("ALTER TABLE slang.slang_occurrences ALTER COLUMN verified DROP DEFAULT")
+    for name, criterion in CRITERIA.items():
+        cursor.execute("""
+        UPDATE slang.slang_occurrences SET verified = NULL
+        WHERE criterion = %s AND NOT verified AND word <> ALL(%s)
+        """, (name, sorted(criterion['verified_words'])))
+        if cursor.rowcount:
+            print(f"Set verified to NULL for {cursor.rowcount} occurrence(s) of {name}")
+
+def ensure_whisper_tables():
+    """Create the local whisper table and the sync state table if missing (call_id typed like the transcriptions)"""
+    call_id_type = get_call_id_type()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        if not table_exists(cursor, 'slang.transcriptions_whisper'):
+            print("Creating slang.transcriptions_whisper...")
+            cursor.execute(WHISPER_TABLE_DDL.format(call_id_type=call_id_type))
+        cursor.execute(SYNC_STATE_DDL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def ensure_index(connect, table, columns, unique, name):
+    """
+    Create an index unless an equivalent one exists, without blocking writes to the table
+
+    Args:
+        connect (callable): Opens a connection to the database of the table
+        table (str): Table to index
+        columns (tuple): Indexed columns
+        unique (bool): Whether the index enforces uniqueness
+        name (str): Name of the index if it has to be created
+
+    Returns:
+        bool: True if the index was created
+    """
+    conn = connect()
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    cursor = conn.cursor()
+
+    try:
+        if has_index(cursor, table, columns, unique):
+            return False
+
+        # A concurrent build that failed leaves an invalid index behind, which IF NOT EXISTS would keep
+        index = f"{table.rpartition('.')[0] or 'public'}.{name}"
+        cursor.execute("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (index,))
+        invalid = cursor.fetchone()
+        if invalid and invalid[0]:
+            print(f"WARNING: Dropping invalid index {index} left by an interrupted build")
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+
+        print(f"Creating index {name} on {table} ({', '.join(columns)})...")
+        create_index(conn, table, columns, unique, name, concurrently=True)
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_hot_queries(evaluation_tables):
+    """
+    Get the hot queries of the dev database, in a form EXPLAIN can plan
+
+    Returns:
+        list: (description, query, table that must not be read with a sequential scan) tuples.
+            Queries with ON CONFLICT have no such table: they fail to plan without a matching unique index.
+    """
+    queries = [
+        ("transcription lookup by call_id (cross_verify_slang.py)",
+         "SELECT transcription FROM slang.transcriptions_gemini WHERE call_id = '0'",
+         'slang.transcriptions_gemini'),
+        ("transcription upsert (json_to_database.py)",
+         "INSERT INTO slang.transcriptions_gemini (call_id, transcription, human_grade) VALUES ('0', '', '') "
+         "ON CONFLICT (call_id) DO UPDATE SET transcription = EXCLUDED.transcription, "
+         "human_grade = EXCLUDED.human_grade",
+         None),
+    ]
+    for table in evaluation_tables:
+        queries += [
+            (f"unprocessed-call anti-join on {table}",
+             f"SELECT t.call_id, t.transcription FROM slang.transcriptions_gemini t "
+             f"WHERE NOT EXISTS (SELECT 1 FROM {table} e WHERE e.call_id = t.call_id "
+             f"AND e.ruleset_version = '') ORDER BY t.call_id",
+             table),
+            (f"MAX(transcription_id) of {table}",
+             f"SELECT COALESCE(MAX(transcription_id), 0) FROM {table}",
+             table),
+            (f"evaluation upsert into {table}",
+             f"INSERT INTO {table} (call_id, ruleset_version) VALUES ('0', '') "
+             f"ON CONFLICT (call_id, ruleset_version) DO UPDATE SET score = EXCLUDED.score",
+             None),
+        ]
+    return queries
+
+# Hot query of the production database: the whisper lookup of every verified call
+PRODUCTION_HOT_QUERIES = [
+    ("whisper transcription lookup by call_id (cross_verify_slang.py)",
+     "SELECT final_transcript FROM public.audio_file_processing_data WHERE call_id = '0'",
+     'public.audio_file_processing_data'),
+]
+
+def find_seq_scans(plan, table):
+    """Check whether a JSON plan node, or any node below it, reads table with a sequential scan"""
+    schema, _, name = table.rpartition('.')
+    if (plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') == name
+            and plan.get('Schema', schema or 'public') == (schema or 'public')):
+        return True
+    return any(find_seq_scans(child, table) for child in plan.get('Plans', []))
+
+def explain_hot_queries(conn, queries):
+    """
+    EXPLAIN each hot query and report the ones that would read a whole table
+
+    Sequential scans are disabled while planning, so the planner only keeps one
+    when no index can serve the query. Nothing is executed.
+
+    Args:
+        conn: Open connection to the database the queries run on
+        queries (list): (description, query, table) tuples, see get_hot_queries()
+
+    Returns:
+        list: Problems found, as messages
+    """
+    problems = []
+    cursor = conn.cursor()
+
+    try:
+        for description, query, table in queries:
+            try:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN (FORMAT JSON, VERBOSE) {query}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                if table and find_seq_scans(plan[0]['Plan'], table):
+                    problems.append(f"{description}: sequential scan on {table}")
+            except psycopg2.Error as e:
+                problems.append(f"{description}: {str(e).strip().splitlines()[0]}")
+            finally:
+                conn.rollback()
+    finally:
+        cursor.close()
+    return problems
+
+def check_database(conn, tables, indexes, queries):
+    """
+    Report missing tables, missing indexes and hot queries that cannot use an index
+
+    Args:
+        conn: Open connection
+        tables (list): Tables that must exist
+        indexes (list): Required indexes, in the format of DEV_INDEXES
+        queries (list): Hot queries, see get_hot_queries()
+
+    Returns:
+        list: Problems found, as messages
+    """
+    problems = []
+    cursor = conn.cursor()
+
+    try:
+        missing = [table for table in tables if not table_exists(cursor, table)]
+        problems += [f"missing table {table}" for table in missing]
+
+        for table, columns, unique, name, reason in indexes:
+            if table not in missing and not has_index(cursor, table, columns, unique):
+                problems.append(f"missing {'unique ' if unique else ''}index on {table} ({', '.join(columns)}), "
+                                f"needed by {reason}")
+    finally:
+        cursor.close()
+        conn.rollback()
+
+    # Queries on missing tables only fail to plan, which says nothing more
+    queries = [query for query in queries
+               if not any(table in query[1] for table in missing)]
+    return problems + explain_hot_queries(conn, queries)
+
+def check_schema(production=False):
+    """
+    Check the dev database (and optionally the production one) for everything the hot queries need
+
+    Args:
+        production (bool): Also check the whisper lookup on the production database
+
+    Returns:
+        list: Problems found, as messages
+    """
+    evaluation_tables = get_evaluation_tables()
+    indexes = DEV_INDEXES + [index for table in evaluation_tables for index in get_evaluation_indexes(table)]
+    indexes += OCCURRENCE_INDEXES
+
+    conn = get_db_connection()
+    try:
+        problems = check_database(conn, ['slang.transcriptions_gemini'] + evaluation_tables +
+                                  ['slang.slang_occurrences', 'slang.rollup_daily', 'slang.rollup_word_daily'],
+                                  indexes, get_hot_queries(evaluation_tables))
+    finally:
+        conn.close()
+
+    if production:
+        from cross_verify_slang import get_senna_db_connection
+        conn = get_senna_db_connection()
+        try:
+            problems += [f"production: {problem}" for problem in
+                         check_database(conn, ['public.audio_file_processing_data'],
+                                        PRODUCTION_INDEXES, PRODUCTION_HOT_QUERIES)]
+        finally:
+            conn.close()
+    return problems
+
+def apply_schema(production=False):
+    """
+    Create every missing table, key and index of the dev database (and optionally the production index)
+
+    Existing tables are never recreated; indexes are built without blocking writes.
+
+    Args:
+        production (bool): Also index the whisper lookup on the production database
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS slang")
+        if not table_exists(cursor, 'slang.transcriptions_gemini'):
+            print("Creating slang.transcriptions_gemini...")
+            cursor.execute(TRANSCRIPTIONS_TABLE_DDL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    for table, columns, unique, name, _ in DEV_INDEXES:
+        ensure_index(get_db_connection, table, columns, unique, name)
+    for table in get_evaluation_tables():
+        ensure_evaluation_schema(table)
+    ensure_transcription_id_sequence(get_evaluation_tables())
+    ensure_agent_transcription_column()
+    ensure_whisper_tables()
+    install_notify_trigger()
+
+    if production:
+        from cross_verify_slang import get_senna_db_connection
+        for table, columns, unique, name, _ in PRODUCTION_INDEXES:
+            ensure_index(get_senna_db_connection, table, columns, unique, name)
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Create and check the tables, keys and indexes the slang evaluation queries rely on')
+    parser.add_argument('--apply', action='store_true',
+                        help='Create whatever is missing (default: only check and report)')
+    parser.add_argument('--production', action='store_true',
+                        help='Also check (and with --apply, create) the whisper lookup index on the production database')
+    parser.add_argument('--backfill-agent-transcriptions', action='store_true',
+                        help='Fill agent_transcription for the transcriptions ingested without it (adds the column if missing)')
+    return parser.parse_args()
+
+def main():
+    """Check the schema, optionally apply it first, and exit with 1 if anything is still missing"""
+    args = parse_arguments()
+
+    if args.apply:
+        apply_schema(production=args.production)
+
+    if args.backfill_agent_transcriptions:
+        ensure_agent_transcription_column()
+        filled = backfill_agent_transcriptions()
+        print(f"Filled agent_transcription for {filled} transcription(s)")
+
+    problems = check_schema(production=args.production)
+    if problems:
+        print(f"Found {len(problems)} schema problem(s):")
+        for problem in problems:
+            print(f"  - {problem}")
+        if not args.apply:
+            print("Run with --apply to create what is missing.")
+        sys.exit(1)
+    print("Schema OK: every hot query can use an index.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import json
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from slang_common import RULESET_VERSION
+from slang_criteria import CRITERIA, evaluate_criteria
+from cross_verify_slang import get_senna_db_pool, close_senna_db_pool, get_pooled_whisper_transcription
+from whisper_sync import get_whisper_source, LocalWhisperLookup
+
+# Requests larger than this are rejected before their body is read
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+class ServiceError(Exception):
+    """A request the service cannot handle, answered with a JSON error and an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def parse_criteria(value):
+    """Validate the criteria of a request, defaulting to slang like the batch script"""
+    if value is None:
+        return ['slang']
+    if isinstance(value, str):
+        value = [name.strip() for name in value.split(',') if name.strip()]
+    if not isinstance(value, list) or not value:
+        raise ServiceError(400, "'criteria' must be a list of criterion names")
+
+    unknown = [name for name in value if name not in CRITERIA]
+    if unknown:
+        raise ServiceError(400, f"Unknown criteria: {', '.join(map(str, unknown))} (available: {', '.join(CRITERIA)})")
+    return value
+
+def pooled_whisper_lookup(pool, connections):
+    """Whisper lookup over a pool that waits for a free connection instead of failing when all are busy"""
+    slots = threading.BoundedSemaphore(connections)
+
+    def lookup(call_id):
+        with slots:
+            return get_pooled_whisper_transcription(call_id, pool)
+    return lookup
+
+def evaluate_record(record, criteria, whisper_lookup=None):
+    """
+    Evaluate one transcript from a request without writing anything
+
+    Args:
+        record (dict): {'call_id', 'transcription', optional 'whisper_transcription'}
+        criteria (list): Names of the criteria to evaluate
+        whisper_lookup (callable, optional): call_id -> whisper transcription, used when the record
+            has no whisper text. Without it, verified words are only confirmed by whisper text in the record.
+
+    Returns:
+        dict: criterion name -> evaluation data
+    """
+    if not isinstance(record, dict):
+        raise ServiceError(400, "each record must be a JSON object")
+
+    transcription = record.get('transcription')
+    if not isinstance(transcription, str):
+        raise ServiceError(400, "'transcription' must be a string")
+
+    if 'whisper_transcription' in record:
+        # Whisper text supplied by the caller, even null, is used as is
+        whisper_transcription = record['whisper_transcription']
+        whisper_lookup = lambda call_id: whisper_transcription
+    elif whisper_lookup is None:
+        whisper_lookup = lambda call_id: None
+
+    return evaluate_criteria(record.get('call_id'), transcription, record.get('transcription_id'),
+                             criteria=criteria, whisper_lookup=whisper_lookup, verbose=False)
+
+class EvaluationHandler(BaseHTTPRequestHandler):
+    """JSON endpoints of the evaluation service
+
+    GET  /health            ruleset version and available criteria
+    POST /evaluate          one transcript -> {"evaluations": {criterion: evaluation}}
+    POST /evaluate/batch    {"records": [...]} -> {"results": [...]}, one result per record, in order
+    """
+
+    server_version = "SlangEvaluationService/1.0"
+
+    def send_json(self, status, body):
+        """Send a JSON response"""
+        content = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def read_json(self):
+        """Read and parse the JSON body of a request"""
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            raise ServiceError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ServiceError(413, f"request body larger than {MAX_BODY_BYTES} bytes")
+
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ServiceError(400, f"invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise ServiceError(400, "request body must be a JSON object")
+        return body
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok', 'ruleset_version': RULESET_VERSION, 'criteria': list(CRITERIA)})
+        else:
+            self.send_json(404, {'error': f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            if self.path == '/evaluate':
+                body = self.read_json()
+                criteria = parse_criteria(body.get('criteria'))
+                evaluations = evaluate_record(body, criteria, self.server.whisper_lookup)
+                self.send_json(200, {'call_id': body.get('call_id'), 'evaluations': evaluations})
+
+            elif self.path == '/evaluate/batch':
+                body = self.read_json()
+                criteria = parse_criteria(body.get('criteria'))
+                records = body.get('records')
+                if not isinstance(records, list):
+                    raise ServiceError(400, "'records' must be a list")
+
+                # One bad record does not fail the others
+                results = []
+                for record in records:
+                    call_id = record.get('call_id') if isinstance(record, dict) else None
+                    try:
+                        results.append({'call_id': call_id,
+                                        'evaluations': evaluate_record(record, criteria, self.server.whisper_lookup)})
+                    except ServiceError as e:
+                        results.append({'call_id': call_id, 'error': e.message})
+                    except Exception as e:
+                        print(f"Error evaluating call_id {call_id}: {e}")
+                        results.append({'call_id': call_id, 'error': str(e)})
+                self.send_json(200, {'results': results})
+
+            else:
+                raise ServiceError(404, f"unknown endpoint {self.path}")
+
+        except ServiceError as e:
+            self.send_json(e.status, {'error': e.message})
+        except Exception as e:
+            print(f"Error handling {self.path}: {e}")
+            self.send_json(500, {'error': str(e)})
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='Serve slang evaluations over HTTP (nothing is written to the database)')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8085, help='Port to listen on (default: 8085)')
+    parser.add_argument('--whisper-connections', type=int, default=4,
+                        help='Production connections kept open for whisper lookups (default: 4)')
+    parser.add_argument('--no-whisper-db', action='store_true',
+                        help='Never look up whisper transcriptions; only use whisper text sent with the request')
+    return parser.parse_args()
+
+def main():
+    """Run the evaluation service until interrupted"""
+    args = parse_arguments()
+
+    server = ThreadingHTTPServer((args.host, args.port), EvaluationHandler)
+    server.daemon_threads = True
+    server.whisper_lookup = None
+    if not args.no_whisper_db:
+        server.whisper_lookup = pooled_whisper_lookup(get_senna_db_pool(args.whisper_connections),
+                                                      args.whisper_connections)
+        if get_whisper_source() == 'local':
+            # Synced calls are read from the dev database; production only serves calls not synced yet
+            server.whisper_lookup = LocalWhisperLookup(fallback=server.whisper_lookup)
+
+    print(f"Serving slang evaluations on http://{args.host}:{args.port} (ruleset version {RULESET_VERSION})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(server.whisper_lookup, LocalWhisperLookup):
+            server.whisper_lookup.close()
+        close_senna_db_pool()
+        print("Service stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import re
+from functools import lru_cache
+from itertools import groupby
+from slang_matcher import SlangMatcher, TOKEN_PATTERN
+
+# Characters that may join the parts of a word without changing it: "okey dokey", "okey-dokey", "ain't"
+SEPARATORS = frozenset(" -'’")
+
+# Most distinct tokens remembered by VariantMatcher.can_start()
+MAX_CACHED_TOKENS = 100000
+
+# Phonetic keys shorter than this collide with too many ordinary words ("cool" and "call")
+MIN_PHONETIC_KEY = 4
+
+VOWELS = frozenset('aeiouy')
+
+REPEATS = re.compile(r'(.)\1+', re.DOTALL)
+
+@lru_cache(maxsize=1 << 16)
+def collapse_repeats(text):
+    """Collapse every run of a repeated character to one: 'yeaaah' -> 'yeah', 'gonna' -> 'gona'"""
+    return REPEATS.sub(r'\1', text)
+
+def run_lengths(text):
+    """Split text into (character, run length) pairs: 'cooool' -> [('c', 1), ('o', 4), ('l', 1)]"""
+    return [(char, len(list(run))) for char, run in groupby(text)]
+
+def is_elongation(candidate, word):
+    """
+    Check whether candidate is word with some letters held longer ('yeahhh', 'cooool')
+
+    Shortened spellings are not elongations ('col' is not 'cool'), so an ordinary
+    word never matches a slang word just because they collapse to the same letters.
+    """
+    candidate_runs = run_lengths(candidate)
+    word_runs = run_lengths(word)
+    if len(candidate_runs) != len(word_runs):
+        return False
+    return all(c_char == w_char and c_len >= w_len
+               for (c_char, c_len), (w_char, w_len) in zip(candidate_runs, word_runs))
+
+def fold_separators(text):
+    """Lowercase text and drop everything between its word characters: 'Okey-Dokey' -> 'okeydokey'"""
+    return ''.join(TOKEN_PATTERN.findall(text.lower()))
+
+@lru_cache(maxsize=1 << 16)
+def phonetic_key(text):
+    """
+    Rough sound-alike key for ASR misspellings: 'buh-buy' and 'bye-bye' both give 'baba'
+
+    Vowel groups become 'a', an 'h' after a vowel is silent, c/k/q sound alike and
+    repeated sounds count once.
+    """
+    key = []
+    for position, char in enumerate(fold_separators(text)):
+        if char in VOWELS and not (position == 0 and char == 'y'):
+            char = 'a'
+        elif char == 'h' and key and key[-1] == 'a':
+            continue
+        elif char in 'cq':
+            char = 'k'
+        elif char == 'z':
+            char = 's'
+        if key and key[-1] == char:
+            continue
+        key.append(char)
+    return ''.join(key)
+
+
+class VariantMatcher:
+    """Match slang words and their ASR spelling variants in one scan of each line
+
+    Exact matches come from a SlangMatcher, with its exact per-word semantics. On top
+    of them, runs of up to a few consecutive tokens are normalized and looked up in an
+    index of the normalized forms of every word, so spellings like 'yeaah',
+    'okey-dokey' or 'bye bye' cost a hash lookup per token instead of one more
+    pattern (or an edit distance) per word and line. The normalized forms are:
+
+    - separators: spaces, hyphens and apostrophes between the parts of a word are ignored
+    - elongation: letters held longer than in the word ('yeahhh', 'cooool'), never shorter
+    - phonetic: a rough sound-alike key (see phonetic_key), opt-in because it also matches
+      some ordinary words
+
+    Variant matches never overlap an exact match, so adding variants only adds hits.
+    """
+
+    def __init__(self, words, separators=True, elongation=True, phonetic=False, max_gap=2):
+        """
+        Args:
+            words (list): Words or phrases to match
+            separators (bool): Fold spaces, hyphens and apostrophes
+            elongation (bool): Accept letters held longer than in the word
+            phonetic (bool): Also accept spellings with the same phonetic key
+            max_gap (int): Longest run of separators allowed between two tokens of a variant
+        """
+        self.exact = SlangMatcher(words)
+        self.words = self.exact.words
+        self.separators = separators
+        self.elongation = elongation
+        self.phonetic = phonetic
+        self.max_gap = max_gap
+
+        # Normalized key -> words with that key, in word order
+        self.index = {}
+        # Phonetic key -> first word with that key
+        self.phonetic_index = {}
+        # Keys of the first 1..n tokens of every word: a candidate is only extended while
+        # its key is one of these, so most tokens are rejected with one set lookup
+        self.prefixes = set()
+        self.phonetic_prefixes = set()
+
+        for word in self.words:
+            self.index.setdefault(self.key(word), []).append(word)
+            sound = phonetic_key(word) if phonetic else ''
+            if len(sound) >= MIN_PHONETIC_KEY:
+                self.phonetic_index.setdefault(sound, word)
+
+            parts = TOKEN_PATTERN.findall(word)
+            for end in range(1, len(parts) + 1):
+                self.prefixes.add(self.key(' '.join(parts[:end])))
+                if len(sound) >= MIN_PHONETIC_KEY:
+                    self.phonetic_prefixes.add(phonetic_key(' '.join(parts[:end])))
+
+        # Variants may join the parts of a word ('okeydokey') but never split a part
+        self.max_tokens = max((len(TOKEN_PATTERN.findall(word)) for word in self.words), default=0)
+
+        # Token -> whether a variant can start with it, filled as tokens are seen
+        self.starts = {}
+
+    def to_dict(self):
+        """Get the compiled matcher as JSON-serializable data (see from_dict)"""
+        return {
+            'kind': 'variant',
+            'exact': self.exact.to_dict(),
+            'separators': self.separators,
+            'elongation': self.elongation,
+            'phonetic': self.phonetic,
+            'max_gap': self.max_gap,
+            'index': self.index,
+            'phonetic_index': self.phonetic_index,
+            'prefixes': sorted(self.prefixes),
+            'phonetic_prefixes': sorted(self.phonetic_prefixes),
+            'max_tokens': self.max_tokens,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a matcher from to_dict() data without compiling it again"""
+        matcher = cls.__new__(cls)
+        matcher.exact = SlangMatcher.from_dict(data['exact'])
+        matcher.words = matcher.exact.words
+        matcher.separators = bool(data['separators'])
+        matcher.elongation = bool(data['elongation'])
+        matcher.phonetic = bool(data['phonetic'])
+        matcher.max_gap = int(data['max_gap'])
+        matcher.index = {str(key): [str(word) for word in words] for key, words in data['index'].items()}
+        matcher.phonetic_index = {str(key): str(word) for key, word in data['phonetic_index'].items()}
+        matcher.prefixes = {str(key) for key in data['prefixes']}
+        matcher.phonetic_prefixes = {str(key) for key in data['phonetic_prefixes']}
+        matcher.max_tokens = int(data['max_tokens'])
+        matcher.starts = {}
+        return matcher
+
+    def __getstate__(self):
+        # The token cache is rebuilt on use, so it is not worth pickling
+        state = dict(self.__dict__)
+        state['starts'] = {}
+        return state
+
+    def can_start(self, token):
+        """Check whether a (lowercased) token can be the start of a variant, caching the answer"""
+        start = self.starts.get(token)
+        if start is None:
+            folded = token if self.separators else ' '.join(token.split())
+            key = collapse_repeats(folded) if self.elongation else folded
+            start = key in self.prefixes or (self.phonetic and phonetic_key(folded) in self.phonetic_prefixes)
+            # Tokens are mostly ordinary words, so the cache stays small; bound it all the same
+            if len(self.starts) >= MAX_CACHED_TOKENS:
+                self.starts.clear()
+            self.starts[token] = start
+        return start
+
+    def normalize(self, text):
+        """Lowercase text and fold its separators if enabled"""
+        if self.separators:
+            return fold_separators(text)
+        return ' '.join(text.lower().split())
+
+    def key(self, text):
+        """Index key of a word or candidate span"""
+        normalized = self.normalize(text)
+        return collapse_repeats(normalized) if self.elongation else normalized
+
+    def match_variant(self, span, key, sound):
+        """Get the word a candidate span is a variant of, or None"""
+        for word in self.index.get(key, ()):
+            if not self.elongation or is_elongation(self.normalize(span), self.normalize(word)):
+                return word
+        if sound is not None:
+            return self.phonetic_index.get(sound)
+        return None
+
+    def finditer(self, text):
+        """Yield (word, start, end) for every exact and variant match in text, ordered by position"""
+        lowered = text.lower()
+
+        # Most lines have no token a variant could start with: those cost one dict lookup per token
+        starts = self.starts
+        first = None
+        for token in TOKEN_PATTERN.finditer(lowered):
+            start = starts.get(token.group())
+            if start is None:
+                start = self.can_start(token.group())
+            if start:
+                first = token.start()
+                break
+        if first is None:
+            yield from self.exact.finditer(text)
+            return
+
+        tokens = [(token.start(), token.end()) for token in TOKEN_PATTERN.finditer(lowered, first)]
+        exact_hits = None
+
+        variant_hits = []
+        i = 0
+        while i < len(tokens):
+            start = tokens[i][0]
+            if not self.can_start(lowered[start:tokens[i][1]]):
+                i += 1
+                continue
+            if exact_hits is None:
+                exact_hits = list(self.exact.finditer(text))
+            hit = None
+
+            # Grow the candidate one token at a time while it can still become a variant,
+            # so most tokens cost a single lookup. The longest variant wins, like the exact matcher.
+            folded = ''
+            last = min(len(tokens), i + self.max_tokens) - 1
+            for j in range(i, last + 1):
+                if j > i and not self._joinable(text, tokens[j - 1][1], tokens[j][0]):
+                    break
+                if self.separators:
+                    folded += lowered[tokens[j][0]:tokens[j][1]]
+                else:
+                    folded = ' '.join(lowered[start:tokens[j][1]].split())
+
+                key = collapse_repeats(folded) if self.elongation else folded
+                sound = phonetic_key(folded) if self.phonetic else None
+                key_open = key in self.prefixes
+                sound_open = sound is not None and sound in self.phonetic_prefixes
+                if not key_open and not sound_open:
+                    break
+
+                if key in self.index or (sound_open and sound in self.phonetic_index):
+                    end = tokens[j][1]
+                    if not any(start < hit_end and hit_start < end for _, hit_start, hit_end in exact_hits):
+                        word = self.match_variant(text[start:end], key, sound if sound_open else None)
+                        if word is not None:
+                            hit = (word, start, end, j)
+
+            if hit is None:
+                i += 1
+            else:
+                variant_hits.append(hit[:3])
+                i = hit[3] + 1
+
+        if exact_hits is None:
+            yield from self.exact.finditer(text)
+            return
+        if not variant_hits:
+            yield from exact_hits
+            return
+        yield from sorted(exact_hits + variant_hits, key=lambda hit: hit[1])
+
+    def _joinable(self, text, gap_start, gap_end):
+        """Check that two tokens are only separated by a short run of separators"""
+        return gap_end - gap_start <= self.max_gap and SEPARATORS.issuperset(text[gap_start:gap_end])
+
+def build_matcher(words, variants=None):
+    """
+    Build the matcher for a list of words
+
+    Args:
+        words (list): Words or phrases to match
+        variants (dict, optional): Variant settings ('separators', 'elongation', 'phonetic').
+            Without any enabled setting the matcher only finds exact matches.
+
+    Returns:
+        SlangMatcher or VariantMatcher
+    """
+    variants = variants or {}
+    if not any(variants.get(setting) for setting in ('separators', 'elongation', 'phonetic')):
+        return SlangMatcher(words)
+    return VariantMatcher(words, separators=bool(variants.get('separators')),
+                          elongation=bool(variants.get('elongation')),
+                          phonetic=bool(variants.get('phonetic')))
+
+def matcher_from_dict(data):
+    """
+    Rebuild a matcher stored with its to_dict()
+
+    Args:
+        data (dict): Data from SlangMatcher.to_dict() or VariantMatcher.to_dict()
+
+    Returns:
+        SlangMatcher or VariantMatcher
+
+    Raises:
+        ValueError: If the data is not a stored matcher
+    """
+    kind = data.get('kind') if isinstance(data, dict) else None
+    if kind == 'exact':
+        return SlangMatcher.from_dict(data)
+    if kind == 'variant':
+        return VariantMatcher.from_dict(data)
+    raise ValueError(f"Not a stored matcher: {kind!r}")
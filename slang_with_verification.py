@@ -1,155 +1,156 @@
-import re
-from collections import Counter
-from slang_helper import (get_transcription_cursor, insert_evaluation, get_max_transcription_id, 
-                          get_db_connection, get_total_transcription_count, 
-                          get_unprocessed_transcription_cursor, get_unprocessed_count)
 import sys
+import json
 import argparse
-from slang_common import (SLANG_WORDS, SLANG_ALTERNATIVES, extract_agent_lines, 
-                          is_near_question, QUESTION_RESPONSE_SLANG, VERIFIED_SLANG_WORDS)
-from cross_verify_slang import get_whisper_transcription, should_count_slang
+from slang_common import VERIFIED_SLANG_WORDS, RULESET_VERSION
+from slang_criteria import (CRITERIA, new_call, match_criteria, evaluate_criteria, db_whisper_lookup,
+                            get_evaluation_version)
+from slang_alignment import VERIFICATION_MODES, ALIGNMENT_TOLERANCE
+from slang_progress import ProgressTracker
+from slang_profile import add_profile_arguments, create_profiler
+from slang_batching import add_batch_size_arguments, create_batch_sizer
 
 def count_slang_words(agent_lines, call_id=None):
     """Count occurrences of each slang word in the text and track timestamps"""
-    slang_counts = {}
-    found_references = []
-    
-    # Initialize counts for all slang words
-    for word in SLANG_WORDS:
-        slang_counts[word] = 0
-    
-    # Process each agent line
-    for i, line in enumerate(agent_lines):
-        # Extract timestamp (assuming it's at the beginning of the line before AGENT:)
-        parts = line.split('AGENT:', 1)
-        if len(parts) < 2:
-            continue
-            
-        timestamp = parts[0].strip()
-        agent_text = parts[1].strip()
-        agent_text_lower = agent_text.lower()
-        
-        # Check for each slang word in the line
-        for word in SLANG_WORDS:
-            # Create a regex pattern to match the word as a whole word, case insensitive
-            pattern = r'\b' + re.escape(word) + r'\b'
-            
-            # Find all occurrences of this slang word in the line
-            for match in re.finditer(pattern, agent_text_lower):
-                # Special handling for 'yeah', 'yup', etc. near questions
-                if word in QUESTION_RESPONSE_SLANG and is_near_question(agent_lines, i):
-                    # This is an acceptable use of 'yeah', 'yup', etc. near a question
-                    print(f"INFO: '{word}' found near a question - NOT counting it as slang")
-                    print(f"      Context: '{agent_text_lower}'")
-                    continue
-                
-                # Special handling for slang words that need verification with whisper transcriptions
-                if word in VERIFIED_SLANG_WORDS and call_id is not None:
-                    # Check if the word should be counted (appears in both gemini and whisper)
-                    if not should_count_slang(call_id, word):
-                        # Skip this occurrence if it doesn't appear in whisper transcription
-                        continue
-                
-                start_pos = match.start()
-                end_pos = match.end()
-                
-                # Extract some context around the slang word (10 chars before and after if available)
-                start_context = max(0, start_pos - 10)
-                end_context = min(len(agent_text_lower), end_pos + 10)
-                
-                context_text = agent_text_lower[start_context:end_context]
-                
-                # Update counts
-                slang_counts[word] += 1
-                
-                # Add detailed reference with timestamp and context
-                proper_alternative = SLANG_ALTERNATIVES.get(word, "")
-                reference = f"{timestamp} - '{word}' (proper: '{proper_alternative}') in '{context_text}'"
-                found_references.append(reference)
-                
-                # DEBUG: Print slang word occurrence immediately when found
-                print(f"DEBUG: Found slang word '{word}' at {timestamp} - context: '{context_text}'")
-    
-    return slang_counts, found_references
+    # The agent lines are all the slang criterion looks at, so they stand in for the transcription
+    call = new_call(call_id, '\n'.join(agent_lines), agent_lines=agent_lines)
+    return match_criteria(call, ['slang'])['slang']
 
 def evaluate_transcription(call_id, transcription, transcription_id):
     """Evaluate a transcription for slang word usage"""
-    agent_lines = extract_agent_lines(transcription)
-    slang_counts, found_references = count_slang_words(agent_lines, call_id=call_id)  # Pass call_id for verification
+    return evaluate_criteria(call_id, transcription, transcription_id, criteria=['slang'])['slang']
+
+def evaluate_single_call(call_id, criteria, from_stdin=False, as_json=False, verify=True, question_context=True,
+                         verification_mode='call', alignment_tolerance=ALIGNMENT_TOLERANCE):
+    """
+    Score one call and print the result without writing anything (for ad-hoc QA checks)
     
-    # Create context string from agent_lines
-    context = '\n'.join(agent_lines)
+    Opens at most one connection per database: one to read the transcription (none with
+    from_stdin) and one to the production database, only if a word needs whisper verification.
     
-    # DEBUG: Print summary of slang words found
-    print(f"\nDEBUG: Slang word summary for call_id {call_id}:")
-    for word, count in slang_counts.items():
-        if count > 0:
-            print(f"  - '{word}': {count} occurrences")
+    Returns:
+        bool: False if the call has no transcription
+    """
+    if from_stdin:
+        transcription = sys.stdin.read()
+        if call_id is None and verify:
+            # On stderr, so that --json output stays parseable
+            print("WARNING: No --call-id, so verified words cannot be checked against whisper "
+                  "and are counted without verification", file=sys.stderr)
+    else:
+        from cross_verify_slang import get_gemini_transcription
+        transcription = get_gemini_transcription(call_id)
+        if transcription is None:
+            print(f"No transcription found for call_id {call_id}")
+            return False
     
-    # Check if any slang word is used
-    has_slang = any(count > 0 for count in slang_counts.values())
+    evaluations = evaluate_criteria(call_id, transcription, None, criteria=criteria, verbose=False,
+                                    verify=verify, question_context=question_context,
+                                    verification_mode=verification_mode, alignment_tolerance=alignment_tolerance)
     
-    # Score 2 if no slang is used, 0 if any slang is used
-    score = 0 if has_slang else 2
-    passed = score > 0
+    if as_json:
+        print(json.dumps(evaluations, indent=2, default=str))
+        return True
     
-    # Create explanation
-    if has_slang:
-        used_slang = [f"'{word}' ({count} time{'s' if count > 1 else ''})" for word, count in slang_counts.items() if count > 0]
-        explanation = f"Agent used inappropriate slang: {', '.join(used_slang)}"
-        
-        # Add proper alternatives
-        alternatives = []
-        for word in [w for w, c in slang_counts.items() if c > 0]:
-            proper = SLANG_ALTERNATIVES.get(word, "")
-            if proper:
-                alternatives.append(f"'{word}' → '{proper}'")
-        
-        if alternatives:
-            explanation += f"\n\nProper alternatives: {', '.join(alternatives)}"
-            
-        improvement_suggestion = "Use proper English in customer interactions. Avoid casual slang and informal language."
-    else:
-        explanation = "Agent used proper English with no slang words."
-        improvement_suggestion = ""
+    print(f"call_id {call_id} (ruleset version {RULESET_VERSION}):")
+    for evaluation_data in evaluations.values():
+        print(f"{evaluation_data['criteria']}: {'PASSED' if evaluation_data['passed'] else 'FAILED'} "
+              f"(Score: {evaluation_data['score']}/{evaluation_data['max_score']})")
+        for reference in evaluation_data['found_references']:
+            print(f"  - {reference}")
+    return True
+
+def expand_details(criteria, limit=None, batch_size=100, verify=True, question_context=True,
+                   verification_mode='call', alignment_tolerance=ALIGNMENT_TOLERANCE):
+    """
+    Complete the evaluations written with --verdict-only, for when reviewers need every occurrence
     
-    # Prepare evaluation data
-    evaluation_data = {
-        'transcription_id': transcription_id,
-        'call_id': call_id,
-        'intern_ai_grade': 'Yes' if passed else 'No',
-        'score': score,
-        'max_score': 2,
-        'criteria': "No Slang (Using Proper English)",
-        'passed': passed,
-        'explanation': explanation,
-        'improvement_suggestion': improvement_suggestion,
-        'found_references': found_references,
-        'context': context,
-        'original_transcription': transcription
-    }
+    Each failed evaluation that stopped at its first occurrence is evaluated again in
+    full from the transcription stored with it, and replaces itself (same transcription_id)
+    with all its references and occurrences. Passed evaluations are always complete.
     
-    # DEBUG: Print evaluation result
-    print(f"DEBUG: Evaluation result: {'PASSED' if passed else 'FAILED'} (Score: {score}/{evaluation_data['max_score']})")
+    Args:
+        criteria (list): Names of the criteria to complete
+        limit (int, optional): Maximum number of evaluations to complete per criterion
+        batch_size (int): Evaluations written per transaction
+        
+    Returns:
+        int: Number of evaluations completed
+    """
+    from slang_helper import get_incomplete_evaluation_cursor, insert_evaluations
+    from slang_schema import require_schema
     
-    return evaluation_data
+    require_schema(list(dict.fromkeys(CRITERIA[name]['table'] for name in criteria)))
+    expanded = 0
+    for name in criteria:
+        criterion = CRITERIA[name]
+        conn, cursor = get_incomplete_evaluation_cursor(criterion['table'], criterion['label'],
+                                                        get_evaluation_version(verification_mode), limit)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                
+                pending = []
+                for call_id, transcription_id, transcription in rows:
+                    evaluation_data = evaluate_criteria(call_id, transcription or '', transcription_id, criteria=[name],
+                                                        verbose=False, verify=verify, question_context=question_context,
+                                                        verification_mode=verification_mode,
+                                                        alignment_tolerance=alignment_tolerance)[name]
+                    pending.append((criterion['table'], evaluation_data))
+                insert_evaluations(pending)
+                
+                expanded += len(pending)
+                print(f"Expanded {expanded} evaluation(s), last call_id {rows[-1][0]} ({name})")
+        finally:
+            cursor.close()
+            conn.close()
+    return expanded
 
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description='Evaluate transcriptions for slang word usage')
     parser.add_argument('--test', action='store_true', help='Run in test mode with 10 entries')
     parser.add_argument('--limit', type=int, help='Limit the number of entries to process')
-    parser.add_argument('--batch-size', type=int, default=10, help='Number of records to fetch at once (default: 10)')
-    parser.add_argument('--start-id', type=int, help='Starting ID for transcription_id (optional, auto-increments from last used ID if not specified)')
+    parser.add_argument('--start-id', type=int, help='Starting ID for transcription_id, incremented per record (optional; by default ids are allocated from slang.transcription_id_seq)')
     parser.add_argument('--process-all', action='store_true', help='Process all call_ids even if already processed (default: skip processed)')
     parser.add_argument('--no-slang-verification', action='store_true', help='Disable verification of slang words against whisper transcriptions')
     parser.add_argument('--no-question-context', action='store_true', help='Disable contextual analysis for "yeah" near questions')
+    parser.add_argument('--verification-mode', choices=VERIFICATION_MODES, default='call', help='Confirm verified words for the whole call if whisper has them anywhere (call), or each occurrence against whisper occurrences close in time (occurrence, stored under ruleset version <version>+occ) (default: call)')
+    parser.add_argument('--alignment-tolerance', type=float, default=ALIGNMENT_TOLERANCE, help=f'With --verification-mode occurrence, seconds a whisper occurrence may be away from a gemini one (default: {ALIGNMENT_TOLERANCE:g})')
+    parser.add_argument('--copy-stream', action='store_true', help='With --process-all, read transcriptions with COPY ... TO STDOUT instead of cursor fetches')
+    parser.add_argument('--agent-only', action='store_true', help='Read only the agent lines kept in agent_transcription at ingest instead of full transcriptions (same verdicts, references and occurrences; evaluations then store NULL as original_transcription instead of the full text, which stays in slang.transcriptions_gemini)')
+    parser.add_argument('--exact-counts', action='store_true', help='Count total and unprocessed records exactly at startup (scans the tables; default uses planner estimates)')
+    parser.add_argument('--criteria', default='slang', help=f'Comma-separated criteria to evaluate in one pass (default: slang, available: {", ".join(CRITERIA)})')
+    parser.add_argument('--call-id', type=int, help='Score a single call and print the result without writing it')
+    parser.add_argument('--stdin', action='store_true', help='With --call-id (or alone), read the transcription from stdin instead of the database (without --call-id, verified words are not checked against whisper)')
+    parser.add_argument('--json', action='store_true', help='With --call-id or --sample, print the result as JSON')
+    parser.add_argument('--daemon', action='store_true', help='Run continuously, evaluating new transcriptions as they are inserted (LISTEN/NOTIFY)')
+    parser.add_argument('--sweep-interval', type=float, default=300, help='With --daemon, seconds between sweeps for missed transcriptions (default: 300)')
+    parser.add_argument('--sample', type=int, metavar='N', help='Estimate slang rates from a stratified random sample of N calls instead of evaluating everything (nothing is written)')
+    parser.add_argument('--sample-strata', type=int, default=10, help='With --sample, number of call_id strata (default: 10)')
+    parser.add_argument('--seed', type=int, default=0, help='With --sample, seed of the sample; the same seed draws the same calls (default: 0)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='With --sample, confidence level of the intervals (default: 0.95)')
+    parser.add_argument('--verdict-only', action='store_true', help='Stop evaluating a call at its first confirmed occurrence (words needing whisper verification are tried last); failed evaluations keep only that occurrence until --expand-details')
+    parser.add_argument('--expand-details', action='store_true', help='Evaluate again in full the evaluations written with --verdict-only, so they list every occurrence (with --limit, at most that many per criterion)')
+    add_batch_size_arguments(parser)
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 def main():
     """Main function to process transcriptions"""
     args = parse_arguments()
     
+    # Profiles cover the whole run, split into fetch/evaluate/whisper/write stages
+    profiler = create_profiler(args)
+    profiler.start()
+    try:
+        process_transcriptions(args, profiler)
+    finally:
+        profiler.stop()
+
+def process_transcriptions(args, profiler):
+    """Run the mode selected on the command line (single call, daemon or batch)"""
     # Determine the limit based on command line arguments
     target_processed = None  # How many NEW records to process
     if args.test:
@@ -157,18 +158,115 @@ def main():
     elif args.limit:
         target_processed = args.limit
     
-    batch_size = args.batch_size
+    if args.copy_stream and not args.process_all:
+        print("--copy-stream streams the whole table and requires --process-all")
+        return
+    
+    criteria = [name.strip() for name in args.criteria.split(',') if name.strip()]
+    unknown = [name for name in criteria if name not in CRITERIA]
+    if unknown:
+        print(f"Unknown criteria: {', '.join(unknown)} (available: {', '.join(CRITERIA)})")
+        return
+    
+    if args.call_id is not None or args.stdin:
+        # Single-call checks never touch the batch machinery, so the database layer is only
+        # imported if the transcription (or whisper verification) has to come from the database
+        evaluate_single_call(args.call_id, criteria, from_stdin=args.stdin, as_json=args.json,
+                             verify=not args.no_slang_verification,
+                             question_context=not args.no_question_context,
+                             verification_mode=args.verification_mode,
+                             alignment_tolerance=args.alignment_tolerance)
+        return
+    
+    if args.sample:
+        from slang_sample import estimate_slang_rates, print_sample_report
+        
+        # Approximate report: only the sampled calls are read and evaluated
+        report = estimate_slang_rates(args.sample, strata=args.sample_strata, seed=args.seed, criteria=criteria,
+                                      verify=not args.no_slang_verification,
+                                      question_context=not args.no_question_context,
+                                      confidence=args.confidence, verification_mode=args.verification_mode,
+                                      alignment_tolerance=args.alignment_tolerance)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_sample_report(report)
+        return
+    
+    if args.expand_details:
+        # Only the evaluations that stopped early are read and written again
+        expanded = expand_details(criteria, limit=target_processed, batch_size=args.batch_size,
+                                  verify=not args.no_slang_verification,
+                                  question_context=not args.no_question_context,
+                                  verification_mode=args.verification_mode,
+                                  alignment_tolerance=args.alignment_tolerance)
+        print(f"Expanded the details of {expanded} evaluation(s)")
+        return
     
-    # Get the highest existing transcription_id and increment by 1
+    if args.daemon:
+        from slang_daemon import run_daemon
+        
+        # New transcriptions are evaluated as they arrive, so there is no target or progress to report
+        run_daemon(criteria, sweep_interval=args.sweep_interval, batch_size=args.batch_size,
+                   verify=not args.no_slang_verification,
+                   question_context=not args.no_question_context,
+                   verification_mode=args.verification_mode,
+                   alignment_tolerance=args.alignment_tolerance,
+                   verdict_only=args.verdict_only)
+        return
+    
+    from slang_helper import (get_transcription_cursor, insert_evaluations, get_max_transcription_id,
+                              allocate_transcription_ids, TRANSCRIPTION_ID_SEQUENCE,
+                              get_total_transcription_count, prefetch_batches,
+                              stream_transcriptions_copy, iter_batches,
+                              get_estimated_counts, get_call_id_histogram,
+                              get_unprocessed_transcription_cursor, get_unprocessed_count)
+    from slang_schema import require_schema
+    
+    # Evaluations are upserted on (call_id, ruleset_version), so reruns replace instead of duplicating.
+    # The key (and everything else the writes need) is created by slang_schema.py --apply.
+    tables = list(dict.fromkeys(CRITERIA[name]['table'] for name in criteria))
+    require_schema(tables, agent_only=args.agent_only)
+    # Occurrence-mode evaluations are kept apart from call-mode ones, under their own version
+    ruleset_version = get_evaluation_version(args.verification_mode)
+    
+    # Get the highest existing transcription_id for reporting
     max_id = get_max_transcription_id()
-    next_id = max_id + 1
     
-    # Use provided start-id if specified, otherwise use next available ID
-    transcription_id = args.start_id if args.start_id is not None else next_id
+    # Use provided start-id if specified, otherwise allocate each batch's ids from the sequence,
+    # so concurrent runs and the daemon never hand out the same one
+    transcription_id = args.start_id
+    id_desc = f"starting ID: {transcription_id}" if transcription_id is not None else f"IDs from {TRANSCRIPTION_ID_SEQUENCE}"
+    last_id = None
+    
+    # Get counts for reporting. Exact counts scan the tables, so by default they are
+    # only estimated, and targeted runs (--limit/--test) skip them altogether.
+    histogram = None
+    if args.exact_counts:
+        total_records = get_total_transcription_count()
+        unprocessed_count = get_unprocessed_count(tables, ruleset_version) if not args.process_all else total_records
+        total_desc = f"{total_records}"
+        unprocessed_desc = f"{unprocessed_count}"
+    elif target_processed is None:
+        total_records, unprocessed_count = get_estimated_counts(tables, ruleset_version)
+        if args.process_all:
+            unprocessed_count = total_records
+        histogram = get_call_id_histogram()
+        total_desc = f"~{total_records} (planner estimate)" if total_records is not None else "unknown (table not analyzed yet)"
+        unprocessed_desc = f"~{unprocessed_count} (planner estimate)" if unprocessed_count is not None else "unknown"
+    else:
+        total_records = unprocessed_count = None
+        total_desc = unprocessed_desc = "not counted for a targeted run (use --exact-counts)"
     
-    # Get counts for reporting
-    total_records = get_total_transcription_count()
-    unprocessed_count = get_unprocessed_count() if not args.process_all else total_records
+    # The batch size adapts to the throughput measured on this database unless fixed
+    batch_sizer = create_batch_sizer(args)
+    
+    progress_tracker = ProgressTracker(
+        total=unprocessed_count,
+        exact=args.exact_counts,
+        target=target_processed,
+        histogram=histogram
+    )
     
     # Determine mode for display
     mode_desc = "test mode" if args.test else ("limited mode" if args.limit else "full mode")
@@ -182,34 +280,58 @@ def main():
         formatted_words = ["'" + word + "'" for word in VERIFIED_SLANG_WORDS]
         verification_text = ", ".join(formatted_words)
         verification_features.append(f"verifying {verification_text} against whisper transcriptions")
+        if args.verification_mode == 'occurrence':
+            verification_features.append(f"occurrence by occurrence (within {args.alignment_tolerance:g}s)")
     if not args.no_question_context:
         verification_features.append("ignoring responses like 'yeah' near questions")
+    if args.verdict_only:
+        verification_features.append("stopping at the first failing occurrence (verdict only)")
+    if args.agent_only:
+        verification_features.append("reading agent lines only")
     verify_msg = ", " + ", ".join(verification_features) if verification_features else ""
     
-    print(f"Running in {mode_desc}{limit_desc}, batch size: {batch_size}, starting ID: {transcription_id}{skip_msg}{verify_msg}")
+    print(f"Running in {mode_desc}{limit_desc}, batch size: {batch_sizer.describe()}, {id_desc}{skip_msg}{verify_msg}")
+    print(f"Criteria: {', '.join(criteria)}, ruleset version: {ruleset_version}")
     print(f"Highest existing transcription_id: {max_id}")
-    print(f"Total records in database: {total_records}")
-    print(f"Unprocessed records available: {unprocessed_count}")
+    print(f"Total records in database: {total_desc}")
+    print(f"Unprocessed records available: {unprocessed_desc}")
     
     # Variables to track progress
     processed_count = 0
     
     # Keep processing until we've reached the target or processed all records
     try:
+        conn = cursor = rows = None
+        
+        # Full sweeps can stream every transcription with COPY instead of cursor fetches
+        if args.process_all and args.copy_stream:
+            # COPY streams on its own background thread, so batches come straight off the stream
+            rows = stream_transcriptions_copy(limit=target_processed, order_by="call_id", agent_only=args.agent_only)
+            batches = iter_batches(rows, batch_sizer, on_fetch=batch_sizer.record_fetch)
         # If we're processing all records (including already processed ones)
-        if args.process_all:
+        elif args.process_all:
             # Use the original cursor that doesn't filter out processed records
             conn, cursor = get_transcription_cursor(
                 limit=target_processed, 
-                order_by="call_id"
+                order_by="call_id",
+                agent_only=args.agent_only
             )
         else:
             # Use the more efficient cursor that excludes already processed records
             conn, cursor = get_unprocessed_transcription_cursor(
+                tables, ruleset_version,
                 limit=target_processed, 
-                order_by="call_id"
+                order_by="call_id",
+                agent_only=args.agent_only
             )
-            
+        
+        if cursor is not None:
+            # The next batch is fetched in the background while this one is evaluated
+            batches = prefetch_batches(cursor, batch_sizer, on_fetch=batch_sizer.record_fetch)
+        
+        # Whisper lookups are their own stage of the profile, nested in 'evaluate'
+        whisper_lookup = batch_sizer.wrap('verify', profiler.wrap('whisper', db_whisper_lookup))
+        
         try:
             # Process batches of records
             while True:
@@ -217,26 +339,45 @@ def main():
                 if target_processed is not None and processed_count >= target_processed:
                     break
                 
-                # Fetch one batch of records
-                batch = cursor.fetchmany(batch_size)
+                # Take the batch that was fetched while the previous one was processed
+                # (the batch sizer gets the time of the fetch itself from the fetching thread)
+                with profiler.stage('fetch'):
+                    batch = next(batches, None)
                 if not batch:
                     print("No more records available to process.")
                     break
                 
+                # Evaluations for the whole batch are written together
+                pending = []
+                batch_ids = iter(allocate_transcription_ids(len(batch))) if args.start_id is None else None
+                
                 # Process each record in the batch
                 for call_id, transcription in batch:
                     # Skip if transcription is empty
                     if not transcription:
                         continue
+                    if batch_ids is not None:
+                        transcription_id = next(batch_ids)
                     
                     # DEBUG: Print a separator for each new call
                     print("\n" + "="*50)
                     print(f"DEBUG: Processing call_id: {call_id}")
                     print("="*50)
                     
-                    # Process the record
-                    evaluation_data = evaluate_transcription(call_id, transcription, transcription_id)
-                    insert_evaluation(evaluation_data)
+                    # Process the record against every selected criterion in one pass
+                    with profiler.stage('evaluate'), batch_sizer.measure('evaluate'):
+                        evaluations = evaluate_criteria(call_id, transcription, transcription_id, criteria=criteria,
+                                                        whisper_lookup=whisper_lookup,
+                                                        verify=not args.no_slang_verification,
+                                                        question_context=not args.no_question_context,
+                                                        verification_mode=args.verification_mode,
+                                                        alignment_tolerance=args.alignment_tolerance,
+                                                        verdict_only=args.verdict_only)
+                    for name, evaluation_data in evaluations.items():
+                        if args.agent_only:
+                            # Only the agent lines were read: store no transcription rather than them as the original
+                            evaluation_data['original_transcription'] = None
+                        pending.append((CRITERIA[name]['table'], evaluation_data))
                     
                     # Update counters and display progress
                     processed_count += 1
@@ -247,22 +388,41 @@ def main():
                     print(f"Processed call_id {call_id} → transcription_id: {transcription_id} ({progress})")
                     
                     # Increment the transcription_id for the next record
+                    last_id = transcription_id
                     transcription_id += 1
                     
                     # Break if we've reached our target
                     if target_processed is not None and processed_count >= target_processed:
                         break
+                
+                with profiler.stage('write'), batch_sizer.measure('write'):
+                    insert_evaluations(pending)
+                
+                # Fetch, evaluate and write times of the batch decide the size of the next ones
+                batch_sizer.record(batch)
+                
+                # Refine the estimate of what is left from how far through the table we are
+                progress_tracker.update(processed_count, last_call_id=batch[-1][0])
+                print(progress_tracker.describe())
+            
+            progress_tracker.finish()
             
             # Print summary statistics
             print("\nProcessing complete!")
             print(f"Records processed: {processed_count}")
             if processed_count > 0:
-                print(f"Last transcription_id used: {transcription_id - 1}")
+                print(f"Last transcription_id used: {last_id}")
+                print(f"Throughput: {progress_tracker.rate():.1f} records/s")
                 
         finally:
-            # Always close cursor and connection
-            cursor.close()
-            conn.close()
+            # Always stop prefetching or streaming, then close cursor and connection.
+            # Closing iter_batches() does not close the COPY stream it reads from, so that is closed too.
+            batches.close()
+            if rows is not None:
+                rows.close()
+            if cursor is not None:
+                cursor.close()
+                conn.close()
     
     except Exception as e:
         print(f"Error during processing: {e}")
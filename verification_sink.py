@@ -0,0 +1,170 @@
+import os
+import csv
+import json
+
+# Columns of the CSV format; match lists are stored as JSON in their cells
+CSV_FIELDS = ['call_id', 'slang_word', 'status', 'gemini_matches', 'whisper_matches', 'checked']
+
+# Outcomes of checking a gemini hit against the whisper transcription
+STATUS_CONFIRMED = 'confirmed'
+STATUS_FALSE_POSITIVE = 'false_positive'
+STATUS_NO_WHISPER = 'no_whisper'
+
+class VerificationSink:
+    """Stream per-call cross-verification results to a JSONL or CSV file
+
+    Every record is written and flushed as soon as it is produced, so nothing but
+    the open file is kept in memory. The format follows the file extension
+    (.csv for CSV, anything else for JSONL).
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if resume and exists:
+            truncate_partial_line(path)
+        self.file = open(path, 'a' if resume else 'w', newline='' if self.format == 'csv' else None)
+
+        self.writer = None
+        if self.format == 'csv':
+            fields = CSV_FIELDS
+            if resume and exists:
+                # Keep the columns of the file being resumed, which may predate 'checked'
+                with open(path, 'r', newline='') as file:
+                    fields = next(csv.reader(file), None) or CSV_FIELDS
+            self.writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction='ignore')
+            if not (resume and exists):
+                self.writer.writeheader()
+
+    def write(self, call_id, slang_word, status, gemini_matches, whisper_matches=None, checked=None):
+        """
+        Write the result of checking one slang word in one call
+
+        checked is the number of calls scanned up to and including this one, which
+        read_resume_state() restores the total of an interrupted run from.
+        """
+        record = {
+            'call_id': call_id,
+            'slang_word': slang_word,
+            'status': status,
+            'gemini_matches': gemini_matches,
+            'whisper_matches': whisper_matches or [],
+            'checked': checked,
+        }
+
+        if self.format == 'csv':
+            record['gemini_matches'] = json.dumps(record['gemini_matches'])
+            record['whisper_matches'] = json.dumps(record['whisper_matches'])
+            self.writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """Close the output file"""
+        self.file.close()
+
+def truncate_partial_line(path):
+    """Drop an incomplete last record left behind by an interrupted run"""
+    with open(path, 'rb+') as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        if size == 0:
+            return
+
+        file.seek(size - 1)
+        if file.read(1) == b'\n':
+            return
+
+        # Walk back to the last complete line
+        position = size - 1
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            file.seek(position)
+            chunk = file.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                file.truncate(position + newline + 1)
+                return
+        file.truncate(0)
+
+def read_sink_records(path):
+    """Stream the records of a results file written by VerificationSink"""
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', newline='') as file:
+            for record in csv.DictReader(file):
+                if record['whisper_matches'] is None:
+                    # An interrupted run can leave a partial last row behind
+                    continue
+                record['gemini_matches'] = json.loads(record['gemini_matches'])
+                record['whisper_matches'] = json.loads(record['whisper_matches'])
+                yield record
+    else:
+        with open(path, 'r') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # An interrupted run can leave a partial last line behind
+                    continue
+
+def read_resume_state(path, slang_words):
+    """
+    Rebuild the running counters and the last call_id from an existing results file
+
+    The file is streamed, so resuming does not load it into memory.
+
+    Args:
+        path (str): Results file written by VerificationSink
+        slang_words (list): Slang words being verified
+
+    Returns:
+        tuple: (last call_id written or None, slang words already written for that call_id,
+                {slang_word: counters}, calls checked before that call_id or None if the
+                file does not record it)
+    """
+    counters = {word: {'in_gemini': 0, 'in_both': 0, 'only_in_gemini': 0} for word in slang_words}
+    last_call_id = None
+    last_call_words = set()
+    checked = None
+
+    if not os.path.exists(path):
+        return last_call_id, last_call_words, counters, 0
+
+    truncate_partial_line(path)
+    for record in read_sink_records(path):
+        word = record['slang_word']
+        if word not in counters:
+            continue
+
+        counters[word]['in_gemini'] += 1
+        if record['status'] == STATUS_CONFIRMED:
+            counters[word]['in_both'] += 1
+        elif record['status'] == STATUS_FALSE_POSITIVE:
+            counters[word]['only_in_gemini'] += 1
+
+        if record['call_id'] != last_call_id:
+            last_call_id = record['call_id']
+            last_call_words = set()
+        last_call_words.add(word)
+
+        # Files written before the count was recorded have no 'checked' (or an empty CSV cell)
+        if record.get('checked') not in (None, ''):
+            checked = int(record['checked'])
+
+    # CSV cells come back as text; call_ids are numeric in slang.transcriptions_gemini
+    if isinstance(last_call_id, str) and last_call_id.lstrip('-').isdigit():
+        last_call_id = int(last_call_id)
+
+    # The last call is read again on resume, and counted again then
+    if checked is not None:
+        checked -= 1
+    elif last_call_id is None:
+        checked = 0
+
+    return last_call_id, last_call_words, counters, checked
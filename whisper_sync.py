@@ -0,0 +1,337 @@
+import io
+import os
+import time
+import argparse
+import threading
+from psycopg2.pool import ThreadedConnectionPool
+from slang_env import load_environment
+from slang_helper import get_db_connection, get_db_connection_params, get_call_id_type
+from slang_schema import require_schema
+from cross_verify_slang import get_senna_db_connection, get_whisper_transcription
+
+# Row of slang.sync_state holding the last call_id synced
+SYNC_NAME = 'whisper_transcriptions'
+
+# Where verification reads whisper transcriptions from, see get_whisper_source()
+WHISPER_SOURCES = ('production', 'local')
+
+# Shared local lookup, see default_whisper_lookup()
+_local_lookup = None
+
+def get_whisper_source():
+    """Get the configured whisper source: WHISPER_SOURCE=local reads the synced copy, anything else production"""
+    load_environment()
+    source = os.getenv('WHISPER_SOURCE', 'production').strip().lower() or 'production'
+    if source not in WHISPER_SOURCES:
+        raise ValueError(f"WHISPER_SOURCE must be one of {', '.join(WHISPER_SOURCES)}, not '{source}'")
+    return source
+
+def get_high_water_mark(cursor):
+    """Get the last call_id synced (as text), or None before the first sync"""
+    cursor.execute("SELECT high_water_mark FROM slang.sync_state WHERE name = %s", (SYNC_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def set_high_water_mark(cursor, call_id):
+    """Record the last call_id synced, in the caller's transaction"""
+    cursor.execute("""
+    INSERT INTO slang.sync_state (name, high_water_mark, updated_at)
+    VALUES (%s, %s, now())
+    ON CONFLICT (name) DO UPDATE SET high_water_mark = EXCLUDED.high_water_mark, updated_at = EXCLUDED.updated_at
+    """, (SYNC_NAME, None if call_id is None else str(call_id)))
+
+def copy_whisper_batch(senna_conn, dev_conn, call_ids, call_id_type):
+    """
+    Copy the whisper transcriptions of a batch of call_ids from production into the local table
+
+    The transcriptions leave production with one COPY ... TO STDOUT and enter the dev
+    database with one COPY ... FROM STDIN into a staging table, then are upserted.
+    Calls production has no transcription for are stored with a NULL final_transcript,
+    which marks them as synced; lookups still ask production for them, and
+    --recheck-missing copies the ones production has since transcribed. Nothing is
+    committed on dev_conn.
+
+    Args:
+        senna_conn: Open production connection
+        dev_conn: Open dev connection, left in the middle of its transaction
+        call_ids (list): call_ids to sync
+        call_id_type (str): SQL type of call_id in the dev database
+
+    Returns:
+        int: Number of calls production had a whisper transcription for
+    """
+    buffer = io.BytesIO()
+    senna_cursor = senna_conn.cursor()
+    try:
+        query = senna_cursor.mogrify(
+            "SELECT call_id, final_transcript FROM public.audio_file_processing_data WHERE call_id = ANY(%s)",
+            (list(call_ids),)).decode('utf-8')
+        senna_cursor.copy_expert(f"COPY ({query}) TO STDOUT", buffer)
+    finally:
+        senna_cursor.close()
+        senna_conn.rollback()
+    buffer.seek(0)
+
+    cursor = dev_conn.cursor()
+    try:
+        cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS whisper_staging (call_id text, final_transcript text) ON COMMIT DELETE ROWS
+        """)
+        cursor.execute("TRUNCATE whisper_staging")
+        cursor.copy_expert("COPY whisper_staging (call_id, final_transcript) FROM STDIN", buffer)
+
+        # Production may hold several rows for a call: keep one, like get_whisper_transcription()
+        cursor.execute(f"""
+        INSERT INTO slang.transcriptions_whisper (call_id, final_transcript, synced_at)
+        SELECT DISTINCT ON (c.call_id) c.call_id, s.final_transcript, now()
+        FROM unnest(%s::{call_id_type}[]) AS c(call_id)
+        LEFT JOIN whisper_staging s ON s.call_id::{call_id_type} = c.call_id
+        ORDER BY c.call_id, s.final_transcript IS NULL
+        ON CONFLICT (call_id) DO UPDATE
+        SET final_transcript = EXCLUDED.final_transcript, synced_at = EXCLUDED.synced_at
+        """, (list(call_ids),))
+        cursor.execute("SELECT count(DISTINCT call_id) FROM whisper_staging")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+def sync_whisper_transcriptions(batch_size=2000, full=False, recheck_missing=False, limit=None):
+    """
+    Incrementally copy whisper transcriptions from production for the calls in slang.transcriptions_gemini
+
+    Calls are synced in call_id order, batch_size at a time, each batch in its own
+    transaction together with the new high-water mark, so an interrupted sync
+    resumes after the last batch it committed.
+
+    Args:
+        batch_size (int): Number of calls copied per COPY round trip
+        full (bool): Ignore the high-water mark and sync every call again (picks up re-transcribed calls)
+        recheck_missing (bool): Afterwards, retry the calls production had no whisper transcription for
+        limit (int, optional): Stop after this many calls
+
+    Returns:
+        dict: 'synced' calls, 'found' with a whisper transcription, 'high_water_mark'
+    """
+    require_schema([], whisper_tables=True)
+    call_id_type = get_call_id_type()
+
+    dev_conn = get_db_connection()
+    senna_conn = get_senna_db_connection()
+    cursor = dev_conn.cursor()
+    stats = {'synced': 0, 'found': 0, 'high_water_mark': None}
+    start = time.perf_counter()
+
+    try:
+        mark = None if full else get_high_water_mark(cursor)
+        dev_conn.commit()
+        if mark is not None:
+            print(f"Resuming whisper sync after call_id {mark}")
+
+        while limit is None or stats['synced'] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - stats['synced'])
+            cursor.execute(f"""
+            SELECT call_id FROM slang.transcriptions_gemini
+            WHERE %s::{call_id_type} IS NULL OR call_id > %s::{call_id_type}
+            ORDER BY call_id
+            LIMIT %s
+            """, (mark, mark, size))
+            call_ids = [row[0] for row in cursor.fetchall()]
+            if not call_ids:
+                dev_conn.commit()
+                break
+
+            found = copy_whisper_batch(senna_conn, dev_conn, call_ids, call_id_type)
+            mark = call_ids[-1]
+            set_high_water_mark(cursor, mark)
+            dev_conn.commit()
+
+            stats['synced'] += len(call_ids)
+            stats['found'] += found
+            print(f"Synced {stats['synced']} call(s) up to call_id {mark} "
+                  f"({stats['found']} with a whisper transcription)")
+
+        if recheck_missing:
+            stats['rechecked'] = recheck_missing_transcriptions(senna_conn, dev_conn, batch_size, call_id_type)
+    except Exception:
+        dev_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        dev_conn.close()
+        senna_conn.close()
+
+    stats['high_water_mark'] = mark
+    print(f"Whisper sync complete in {time.perf_counter() - start:.1f}s: {stats['synced']} call(s) synced, "
+          f"{stats['found']} with a whisper transcription, high-water mark {mark}")
+    return stats
+
+def recheck_missing_transcriptions(senna_conn, dev_conn, batch_size, call_id_type):
+    """Copy again the calls stored without a whisper transcription, in case production has one now"""
+    cursor = dev_conn.cursor()
+    after = None
+    found_total = 0
+
+    try:
+        while True:
+            cursor.execute(f"""
+            SELECT call_id FROM slang.transcriptions_whisper
+            WHERE final_transcript IS NULL AND (%s::{call_id_type} IS NULL OR call_id > %s::{call_id_type})
+            ORDER BY call_id
+            LIMIT %s
+            """, (after, after, batch_size))
+            call_ids = [row[0] for row in cursor.fetchall()]
+            if not call_ids:
+                dev_conn.commit()
+                break
+
+            found_total += copy_whisper_batch(senna_conn, dev_conn, call_ids, call_id_type)
+            dev_conn.commit()
+            after = call_ids[-1]
+    finally:
+        cursor.close()
+
+    print(f"Rechecked calls without a whisper transcription: {found_total} now have one")
+    return found_total
+
+def get_local_whisper_transcription(call_id, conn):
+    """
+    Look a whisper transcription up in the local copy
+
+    Returns:
+        tuple: (synced, final_transcript) - synced is False if the call has not been synced yet
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT final_transcript FROM slang.transcriptions_whisper WHERE call_id = %s", (call_id,))
+        row = cursor.fetchone()
+        return (True, row[0]) if row else (False, None)
+    finally:
+        cursor.close()
+        conn.commit()
+
+class LocalWhisperLookup:
+    """Whisper provider reading the local copy made by sync_whisper_transcriptions()
+
+    Lookups share a small pool of dev connections kept open between calls, so the
+    provider can be used from several threads. Calls that have not been synced yet,
+    or were synced before production had a whisper transcription for them (NULL
+    final_transcript), fall back to production, so results never depend on how
+    recently the sync ran, only the cost of the lookup does.
+    """
+
+    def __init__(self, fallback=None, connections=4):
+        """
+        Args:
+            fallback (callable, optional): call_id -> whisper transcription for calls not synced yet
+                or synced without one.
+                Default is get_whisper_transcription (production).
+            connections (int): Most dev connections open at once; further lookups wait for a free one
+        """
+        self.fallback = fallback or get_whisper_transcription
+        self.connections = connections
+        self.slots = threading.BoundedSemaphore(connections)
+        self.pool = None
+        self.lock = threading.Lock()
+        self.fallbacks = 0
+
+    def get_pool(self):
+        """Get the pool of dev connections, creating it on first use"""
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadedConnectionPool(1, self.connections, **get_db_connection_params())
+            return self.pool
+
+    def __call__(self, call_id):
+        pool = self.get_pool()
+        with self.slots:
+            conn = pool.getconn()
+            try:
+                synced, transcription = get_local_whisper_transcription(call_id, conn)
+            finally:
+                pool.putconn(conn)
+        if synced and transcription is not None:
+            return transcription
+        with self.lock:
+            self.fallbacks += 1
+        return self.fallback(call_id)
+
+    def close(self):
+        """Close every connection of the pool"""
+        with self.lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
+
+def get_whisper_transcriptions(call_ids):
+    """
+    Fetch the whisper transcriptions of many calls at once, from the source selected by WHISPER_SOURCE
+
+    One query per database instead of one connection per call: with the local source,
+    calls not synced yet or synced without a transcription are fetched from production
+    in a single query as well.
+
+    Returns:
+        dict: call_id -> whisper transcription (None if there is none)
+    """
+    call_ids = list(dict.fromkeys(call_ids))
+    transcriptions = {}
+    if not call_ids:
+        return transcriptions
+
+    missing = call_ids
+    if get_whisper_source() == 'local':
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+            SELECT call_id, final_transcript FROM slang.transcriptions_whisper
+            WHERE call_id = ANY(%s::{get_call_id_type()}[])
+            """, (call_ids,))
+            transcriptions.update(cursor.fetchall())
+        finally:
+            cursor.close()
+            conn.close()
+        missing = [call_id for call_id in call_ids if transcriptions.get(call_id) is None]
+
+    if missing:
+        conn = get_senna_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT call_id, final_transcript FROM public.audio_file_processing_data WHERE call_id = ANY(%s)",
+                           (missing,))
+            for call_id, transcription in cursor.fetchall():
+                # Keep one row per call, preferring one with text
+                if transcriptions.get(call_id) is None:
+                    transcriptions[call_id] = transcription
+        finally:
+            cursor.close()
+            conn.close()
+
+    for call_id in call_ids:
+        transcriptions.setdefault(call_id, None)
+    return transcriptions
+
+def default_whisper_lookup():
+    """Get the whisper provider selected by WHISPER_SOURCE: production lookups or the shared local copy"""
+    global _local_lookup
+    if get_whisper_source() == 'production':
+        return get_whisper_transcription
+    if _local_lookup is None:
+        _local_lookup = LocalWhisperLookup()
+    return _local_lookup
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Copy whisper transcriptions from production into slang.transcriptions_whisper in the dev database')
+    parser.add_argument('--batch-size', type=int, default=2000, help='Calls copied per COPY round trip (default: 2000)')
+    parser.add_argument('--limit', type=int, help='Stop after syncing this many calls')
+    parser.add_argument('--full', action='store_true', help='Ignore the high-water mark and sync every call again')
+    parser.add_argument('--recheck-missing', action='store_true',
+                        help='Also retry the calls production had no whisper transcription for at their last sync')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    sync_whisper_transcriptions(batch_size=args.batch_size, full=args.full,
+                                recheck_missing=args.recheck_missing, limit=args.limit)